@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+import gspread
+import requests
+import config
+import metricas
+
+# Códigos HTTP que indicam falta de cota ou falha temporária do Google
+STATUS_TEMPORARIOS = {429, 500, 502, 503, 504}
+
+class BaldeDeFichas:
+    """Balde de fichas reposto continuamente: `por_minuto` fichas a cada 60 segundos."""
+
+    def __init__(self, por_minuto, capacidade=None):
+        self.por_minuto = por_minuto
+        self.capacidade = capacidade or por_minuto
+        self._fichas = float(self.capacidade)
+        self._atualizado_em = time.monotonic()
+        self._condicao = threading.Condition()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado_em) * self.por_minuto / 60)
+        self._atualizado_em = agora
+
+    def disponiveis(self):
+        with self._condicao:
+            self._repor()
+            return self._fichas
+
+    def retirar(self, quantidade=1):
+        """Retira fichas, dormindo o tempo necessário para que sejam repostas."""
+        with self._condicao:
+            while True:
+                self._repor()
+                if self._fichas >= quantidade:
+                    self._fichas -= quantidade
+                    return
+                espera = (quantidade - self._fichas) * 60 / self.por_minuto
+                self._condicao.wait(espera)
+
+    def esvaziar(self):
+        """Zera o balde após um 429: o Google já considerou a cota esgotada."""
+        with self._condicao:
+            self._repor()
+            self._fichas = min(self._fichas, 0.0)
+
+class AgendadorSheets:
+    """Ponto único por onde passam as chamadas ao Google Sheets.
+
+    Cada chamada retira uma ficha do balde de leitura ou de escrita (as cotas
+    do Google são por minuto e separadas para leitura e escrita), e erros de
+    cota (429) ou do servidor (5xx) são repetidos com espera exponencial com
+    jitter, respeitando o Retry-After quando o Google o envia.
+
+    Chamadas que não podem ser repetidas sem efeito (anexar linhas) só são
+    repetidas após um 429, que garante que nada foi gravado; um 5xx ou uma
+    conexão perdida podem ter chegado a gravar, e quem chamou decide o que
+    fazer (veja `falha_ambigua`).
+    """
+
+    LEITURA, ESCRITA = 'leitura', 'escrita'
+
+    def __init__(self, leituras_por_minuto=config.SHEETS_LEITURAS_POR_MINUTO,
+                 escritas_por_minuto=config.SHEETS_ESCRITAS_POR_MINUTO,
+                 tentativas=config.SHEETS_TENTATIVAS, espera_base=config.SHEETS_ESPERA_BASE,
+                 espera_maxima=config.SHEETS_ESPERA_MAXIMA):
+        self.baldes = {
+            self.LEITURA: BaldeDeFichas(leituras_por_minuto),
+            self.ESCRITA: BaldeDeFichas(escritas_por_minuto),
+        }
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    def _espera(self, tentativa, erro):
+        """Espera antes da próxima tentativa: Retry-After ou exponencial com jitter completo."""
+        resposta = getattr(erro, "response", None)
+        retry_after = resposta.headers.get("Retry-After") if resposta is not None else None
+        if retry_after and str(retry_after).isdigit():
+            return float(retry_after)
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+
+    @staticmethod
+    def _temporario(erro):
+        if isinstance(erro, gspread.exceptions.APIError):
+            return erro.response.status_code in STATUS_TEMPORARIOS
+        return isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    @staticmethod
+    def _sem_cota(erro):
+        return isinstance(erro, gspread.exceptions.APIError) and erro.response.status_code == 429
+
+    @staticmethod
+    def _status(erro):
+        if isinstance(erro, gspread.exceptions.APIError):
+            return erro.response.status_code
+        return type(erro).__name__
+
+    def executar(self, tipo, funcao, *args, idempotente=True, **kwargs):
+        """Executa a chamada respeitando a cota do tipo e repetindo falhas temporárias.
+
+        Com idempotente=False só o 429 é repetido.
+        """
+        balde = self.baldes[tipo]
+        operacao = getattr(funcao, "__name__", "desconhecida")
+        for tentativa in range(self.tentativas):
+            with metricas.cronometrar(metricas.SHEETS_ESPERA_COTA, tipo=tipo):
+                balde.retirar()
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except Exception as e:
+                metricas.SHEETS_SEGUNDOS.observar(time.perf_counter() - inicio, operacao=operacao, tipo=tipo)
+                metricas.SHEETS_ERROS.inc(operacao=operacao, status=self._status(e))
+                repetir = self._temporario(e) if idempotente else self._sem_cota(e)
+                if not repetir or tentativa == self.tentativas - 1:
+                    raise
+                if self._sem_cota(e):
+                    balde.esvaziar()
+                espera = self._espera(tentativa, e)
+                print(f"⏳ Falha temporária no Google Sheets ({str(e)[:80]}), nova tentativa em {espera:.1f}s")
+                time.sleep(espera)
+            else:
+                metricas.SHEETS_SEGUNDOS.observar(time.perf_counter() - inicio, operacao=operacao, tipo=tipo)
+                return resultado
+
+    def escrita_apertada(self):
+        """Indica que a cota de escrita está no fim; quem escreve deve juntar lotes maiores."""
+        balde = self.baldes[self.ESCRITA]
+        return balde.disponiveis() < balde.capacidade * config.SHEETS_LIMIAR_LOTE_GRANDE
+
+    def aguardar_escrita(self):
+        """Bloqueia até haver ao menos uma ficha de escrita, sem consumi-la."""
+        balde = self.baldes[self.ESCRITA]
+        falta = 1 - balde.disponiveis()
+        if falta > 0:
+            time.sleep(falta * 60 / balde.por_minuto)
+
+# Agendador compartilhado por todo o processo
+agendador = AgendadorSheets()
+for _tipo, _balde in agendador.baldes.items():
+    metricas.registro.medidor(f"sheets_fichas_{_tipo}", f"Fichas de cota de {_tipo} disponíveis agora", _balde.disponiveis)
+
+def leitura(funcao, *args, **kwargs):
+    """Executa uma chamada de leitura ao Sheets pelo agendador compartilhado."""
+    return agendador.executar(AgendadorSheets.LEITURA, funcao, *args, **kwargs)
+
+def escrita(funcao, *args, **kwargs):
+    """Executa uma chamada de escrita ao Sheets pelo agendador compartilhado."""
+    return agendador.executar(AgendadorSheets.ESCRITA, funcao, *args, **kwargs)
+
+def anexar(funcao, *args, **kwargs):
+    """Executa um append (append_row/append_rows), que só é repetido após um 429."""
+    return agendador.executar(AgendadorSheets.ESCRITA, funcao, *args, idempotente=False, **kwargs)
+
+def falha_ambigua(erro):
+    """Indica se a chamada que falhou com `erro` pode ter sido aplicada mesmo assim (5xx, timeout, conexão)."""
+    return AgendadorSheets._temporario(erro) and not AgendadorSheets._sem_cota(erro)
@@ -0,0 +1,152 @@
+import numpy as np
+import livro_caixa
+
+class TabelaTransacoes:
+    """Transações em colunas tipadas para agregações vetorizadas.
+
+    Base do Resumo Mensal e dos relatórios do bot (/resumo, /categorias,
+    /grafico, /orcamento). As colunas nunca são alteradas no lugar: filtrar
+    e concatenar devolvem tabelas novas, então uma tabela já entregue pode
+    ser lida por qualquer thread.
+
+    - dias: data como dias desde 1970-01-01 (int64)
+    - centavos: valor em centavos, positivo para receitas e negativo para despesas (int64)
+    - categorias: código da categoria (int32), índice em `nomes_categorias` (em ordem alfabética)
+    """
+
+    def __init__(self, dias, centavos, categorias, nomes_categorias):
+        self.dias = dias
+        self.centavos = centavos
+        self.categorias = categorias
+        self.nomes_categorias = [str(nome) for nome in nomes_categorias]
+        # Meses desde 1970-01 (0 = jan/1970), base de todos os agrupamentos por mês
+        self.meses = dias.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+    def __len__(self):
+        return len(self.dias)
+
+    @classmethod
+    def de_colunas(cls, dias, centavos, categorias):
+        """Monta a tabela codificando as categorias em inteiros."""
+        nomes, codigos = np.unique(np.asarray(categorias, dtype=str), return_inverse=True)
+        return cls(np.asarray(dias, dtype=np.int64), np.asarray(centavos, dtype=np.int64), codigos.astype(np.int32), nomes)
+
+    @classmethod
+    def de_linhas(cls, linhas):
+        """Monta a tabela a partir de (data AAAA-MM-DD, valor_centavos, categoria) do livro-caixa."""
+        if not linhas:
+            return cls.vazia()
+        datas, centavos, categorias = zip(*linhas)
+        dias = np.array(datas, dtype='datetime64[D]').astype(np.int64)
+        return cls.de_colunas(dias, centavos, categorias)
+
+    @classmethod
+    def do_livro_caixa(cls, somente_sincronizadas=False, planilha=None):
+        """Carrega as colunas do livro-caixa local (de uma planilha; por padrão, a principal)."""
+        return cls.de_linhas(livro_caixa.colunas_para_agregacao(somente_sincronizadas, planilha))
+
+    @classmethod
+    def vazia(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), [])
+
+    def concatenar(self, outra):
+        """Junta duas tabelas (ex.: a carregada e as transações novas) recodificando as categorias.
+
+        Só os nomes das categorias passam pelo np.unique; os códigos de cada
+        tabela são remapeados por indexação.
+        """
+        if len(outra) == 0:
+            return self
+        if len(self) == 0:
+            return outra
+        nomes = np.union1d(np.asarray(self.nomes_categorias, dtype=str), np.asarray(outra.nomes_categorias, dtype=str))
+        mapa_self = np.searchsorted(nomes, np.asarray(self.nomes_categorias, dtype=str)).astype(np.int32)
+        mapa_outra = np.searchsorted(nomes, np.asarray(outra.nomes_categorias, dtype=str)).astype(np.int32)
+        return TabelaTransacoes(
+            np.concatenate([self.dias, outra.dias]),
+            np.concatenate([self.centavos, outra.centavos]),
+            np.concatenate([mapa_self[self.categorias], mapa_outra[outra.categorias]]),
+            nomes
+        )
+
+    def _selecionar(self, mascara):
+        return TabelaTransacoes(self.dias[mascara], self.centavos[mascara], self.categorias[mascara], self.nomes_categorias)
+
+    def filtrar(self, inicio=None, fim=None):
+        """Retorna só as transações entre as datas (datetime.date) inclusive."""
+        mascara = np.ones(len(self), dtype=bool)
+        if inicio is not None:
+            mascara &= self.dias >= np.datetime64(inicio, 'D').astype(np.int64)
+        if fim is not None:
+            mascara &= self.dias <= np.datetime64(fim, 'D').astype(np.int64)
+        return self._selecionar(mascara)
+
+    def do_mes(self, mes):
+        """Retorna só as transações do mês AAAA-MM."""
+        return self._selecionar(self.meses == _numero_mes(mes))
+
+    def _centavos_do_tipo(self, tipo):
+        if tipo == 'receita':
+            return np.where(self.centavos > 0, self.centavos, 0)
+        return np.where(self.centavos < 0, -self.centavos, 0)
+
+    def _somas_por_mes(self):
+        meses, indices = np.unique(self.meses, return_inverse=True)
+        receitas = np.bincount(indices, weights=self._centavos_do_tipo('receita'), minlength=len(meses))
+        despesas = np.bincount(indices, weights=self._centavos_do_tipo('despesa'), minlength=len(meses))
+        return meses, receitas, despesas
+
+    def por_mes(self):
+        """Totais por mês para o Resumo Mensal: {"MM/YYYY": {"receitas": float, "despesas": float}}."""
+        if len(self) == 0:
+            return {}
+        return {
+            _rotulo_mes(mes): {"receitas": round(float(receita) / 100, 2), "despesas": round(float(despesa) / 100, 2)}
+            for mes, receita, despesa in zip(*self._somas_por_mes())
+        }
+
+    def totais_por_mes(self):
+        """Totais por mês em centavos: {"AAAA-MM": {"receita": int, "despesa": int}} (despesas positivas)."""
+        if len(self) == 0:
+            return {}
+        return {
+            _chave_mes(mes): {"receita": int(receita), "despesa": int(despesa)}
+            for mes, receita, despesa in zip(*self._somas_por_mes())
+        }
+
+    def por_categoria(self, tipo='despesa'):
+        """Totais do tipo por categoria em centavos: {categoria: int}, só categorias com movimento."""
+        if len(self) == 0:
+            return {}
+        totais = np.bincount(self.categorias, weights=self._centavos_do_tipo(tipo), minlength=len(self.nomes_categorias))
+        return {self.nomes_categorias[i]: int(totais[i]) for i in np.flatnonzero(totais)}
+
+    def por_mes_categoria(self, tipo='despesa'):
+        """Totais do tipo por mês e categoria em centavos: {"AAAA-MM": {categoria: int}}."""
+        if len(self) == 0:
+            return {}
+        meses, indices = np.unique(self.meses, return_inverse=True)
+        quantidade = len(self.nomes_categorias)
+        chave = indices.astype(np.int64) * quantidade + self.categorias
+        totais = np.bincount(chave, weights=self._centavos_do_tipo(tipo), minlength=len(meses) * quantidade)
+        totais = totais.reshape(len(meses), quantidade)
+        resultado = {}
+        for i, mes in enumerate(meses):
+            categorias = np.flatnonzero(totais[i])
+            if len(categorias):
+                resultado[_chave_mes(mes)] = {self.nomes_categorias[j]: int(totais[i, j]) for j in categorias}
+        return resultado
+
+def _numero_mes(mes):
+    """Converte AAAA-MM em meses desde 1970-01."""
+    return (int(mes[:4]) - 1970) * 12 + int(mes[5:7]) - 1
+
+def _chave_mes(mes):
+    """Converte meses desde 1970-01 na chave AAAA-MM usada pelos relatórios."""
+    ano, mes = divmod(int(mes), 12)
+    return f"{ano + 1970:04d}-{mes + 1:02d}"
+
+def _rotulo_mes(mes):
+    """Converte meses desde 1970-01 no rótulo MM/YYYY usado na planilha."""
+    ano, mes = divmod(int(mes), 12)
+    return f"{mes + 1:02d}/{ano + 1970}"
@@ -0,0 +1,389 @@
+"""Gerador de carga: simula conversas completas de N chats contra o webhook do bot_server.
+
+Uso (na raiz do projeto):
+
+    python -m benchmarks.carga_webhook --chats 200 --taxa 100
+    python -m benchmarks.carga_webhook --chats 1000 --conversas 3 --taxa 500 --latencia-sheets 0.2
+
+Sobe o bot_server em um subprocesso com a API do Telegram apontando para um
+stub local (servido por este processo) e o Google Sheets trocado pela planilha
+falsa em memória. Cada chat faz /start → tipo → valor → descrição → categoria
+(nas conversas seguintes, "📝 Nova Transação" no menu final no lugar do /start),
+e as atualizações são enviadas ao webhook na taxa pedida (atualizações/s).
+No fim mostra a vazão e os percentis p50/p95/p99 de:
+
+- webhook: do POST até a resposta HTTP (o que o Telegram espera);
+- resposta do bot: do POST até a mensagem do bot chegar ao stub;
+- registro: do POST da categoria até a confirmação "registrada com sucesso".
+
+Termina com código 1 se algum passo ficar sem resposta, algum registro sem
+confirmação ou alguma atualização for recusada até a desistência.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+TOKEN = "123456:CARGA"
+ID_DO_BOT = 123456
+
+NOVA_TRANSACAO = '📝 Nova Transação'
+PASSOS_DESPESA = ['💸 Registrar Despesa']
+PASSOS_RECEITA = ['💰 Registrar Receita']
+CATEGORIAS_DESPESAS = ['🍽️ Alimentação', '🚗 Transporte', '💊 Saúde', '🏠 Moradia', '🎭 Lazer', '💰 Outros']
+CATEGORIAS_RECEITAS = ['💼 Salário', '💵 Renda Extra', '🎁 Outros Ganhos']
+DESCRICOES = ['Mercado', 'Uber', 'Farmácia', 'Aluguel', 'Cinema', 'Padaria', 'Freela', 'Presente']
+
+# Mensagens do bot que não respondem a um passo da conversa
+PREFIXOS_CONFIRMACAO = ('✅', '❌ Erro ao registrar')
+
+def percentis(valores):
+    """Retorna (p50, p95, p99, máximo) em milissegundos pelo método do posto mais próximo."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+
+    def posto(fracao):
+        return ordenados[min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados))) - 1))] * 1000
+
+    return posto(0.50), posto(0.95), posto(0.99), ordenados[-1] * 1000
+
+def conversa(gerador, primeira=True):
+    """Textos de uma conversa completa, com tipo, valor e categoria sorteados.
+
+    A primeira conversa do chat começa com /start; as seguintes continuam do
+    menu final da anterior, como faz o usuário.
+    """
+    despesa = gerador.random() < 0.8
+    return [
+        '/start' if primeira else NOVA_TRANSACAO,
+        PASSOS_DESPESA[0] if despesa else PASSOS_RECEITA[0],
+        f"{gerador.uniform(1, 500):.2f}",
+        gerador.choice(DESCRICOES),
+        gerador.choice(CATEGORIAS_DESPESAS if despesa else CATEGORIAS_RECEITAS),
+    ]
+
+def atualizacao(update_id, chat_id, message_id, texto):
+    """JSON de um Update com uma mensagem de texto em chat privado."""
+    mensagem = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "Carga"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Carga"},
+        "text": texto,
+    }
+    if texto.startswith('/'):
+        mensagem["entities"] = [{"type": "bot_command", "offset": 0, "length": len(texto)}]
+    return {"update_id": update_id, "message": mensagem}
+
+class ApiTelegramFalsa:
+    """Stub da Bot API: responde getMe/setWebhook/sendMessage e anota quando cada mensagem chegou."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.mensagens = defaultdict(list)  # chat_id -> [(instante, texto)]
+        self.chamadas = Counter()
+        self._proximo_id = 0
+        self.app = Starlette(routes=[Route('/bot{token}/{metodo}', self.responder, methods=['GET', 'POST'])])
+
+    async def _parametros(self, request):
+        # O python-telegram-bot envia os parâmetros como formulário (ou JSON); arquivos não são usados aqui
+        corpo = (await request.body()).decode()
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return json.loads(corpo or "{}")
+        return dict(parse_qsl(corpo))
+
+    async def responder(self, request: Request):
+        metodo = request.path_params["metodo"]
+        self.chamadas[metodo] += 1
+        parametros = await self._parametros(request)
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        if metodo == "getMe":
+            return JSONResponse({"ok": True, "result": {
+                "id": ID_DO_BOT, "is_bot": True, "first_name": "Bot", "username": "bot_carga"
+            }})
+        if metodo == "sendMessage":
+            chat_id = int(parametros["chat_id"])
+            texto = parametros.get("text", "")
+            self.mensagens[chat_id].append((time.perf_counter(), texto))
+            self._proximo_id += 1
+            return JSONResponse({"ok": True, "result": {
+                "message_id": self._proximo_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": texto,
+            }})
+        return JSONResponse({"ok": True, "result": True})
+
+class Limitador:
+    """Libera envios em uma taxa fixa (por segundo), compartilhada por todos os chats."""
+
+    def __init__(self, taxa):
+        self.intervalo = 1 / taxa if taxa else 0
+        self._proximo = None
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self):
+        if not self.intervalo:
+            return
+        async with self._lock:
+            agora = time.perf_counter()
+            self._proximo = max(self._proximo or agora, agora)
+            espera = self._proximo - agora
+            self._proximo += self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+class Carga:
+    """Envia as conversas e guarda, por chat, o instante de cada passo enviado."""
+
+    def __init__(self, url, chats, conversas, taxa, semente, tentativas=5):
+        self.url = url
+        self.chats = chats
+        self.conversas = conversas
+        self.limitador = Limitador(taxa)
+        self.gerador = random.Random(semente)
+        self.tentativas = tentativas
+        self.enviados = defaultdict(list)  # chat_id -> [(instante, passo)]
+        self.latencias_webhook = []
+        self.status = Counter()
+        self.falhas = Counter()
+        self._update_id = 0
+
+    def _novo_update_id(self):
+        self._update_id += 1
+        return self._update_id
+
+    async def _chat(self, cliente, chat_id):
+        message_id = 0
+        for numero in range(self.conversas):
+            for passo, texto in enumerate(conversa(self.gerador, primeira=numero == 0)):
+                message_id += 1
+                corpo = atualizacao(self._novo_update_id(), chat_id, message_id, texto)
+                await self.limitador.aguardar()
+                self.enviados[chat_id].append((time.perf_counter(), passo))
+                # Como o Telegram: reenvia a mesma atualização enquanto o webhook não aceitar
+                for tentativa in range(self.tentativas):
+                    inicio = time.perf_counter()
+                    try:
+                        resposta = await cliente.post(self.url, json=corpo)
+                        status = resposta.status_code
+                    except httpx.HTTPError as e:
+                        status = type(e).__name__
+                    self.latencias_webhook.append(time.perf_counter() - inicio)
+                    self.status[status] += 1
+                    if status == 200:
+                        break
+                    await asyncio.sleep(min(2 ** tentativa * 0.1, 2))
+                else:
+                    self.falhas[passo] += 1
+
+    async def executar(self):
+        limites = httpx.Limits(max_connections=200, max_keepalive_connections=200)
+        async with httpx.AsyncClient(timeout=30, limits=limites) as cliente:
+            inicio = time.perf_counter()
+            await asyncio.gather(*(self._chat(cliente, 1_000_000 + indice) for indice in range(self.chats)))
+            return time.perf_counter() - inicio
+
+def casar_respostas(carga, api):
+    """Casa cada passo enviado com a resposta do bot no mesmo chat, em ordem.
+
+    Retorna (latências de resposta, latências de registro, passos sem resposta).
+    """
+    respostas, registros, sem_resposta = [], [], 0
+    for chat_id, enviados in carga.enviados.items():
+        mensagens = api.mensagens.get(chat_id, [])
+        passos = [instante for instante, texto in mensagens if not texto.startswith(PREFIXOS_CONFIRMACAO)]
+        confirmacoes = [instante for instante, texto in mensagens if texto.startswith('✅')]
+        for indice, (instante, _) in enumerate(enviados):
+            if indice < len(passos):
+                respostas.append(passos[indice] - instante)
+            else:
+                sem_resposta += 1
+        categorias = [instante for instante, passo in enviados if passo == 4]
+        for instante, confirmado in zip(categorias, confirmacoes):
+            registros.append(confirmado - instante)
+    return respostas, registros, sem_resposta
+
+def _linha_percentis(nome, valores):
+    resultado = percentis(valores)
+    if resultado is None:
+        return f"{nome:<34} sem amostras"
+    p50, p95, p99, maximo = resultado
+    return f"{nome:<34} p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   p99 {p99:8.1f} ms   máx {maximo:8.1f} ms"
+
+def relatorio(carga, api, duracao_envio, duracao_total):
+    """Mostra os resultados da rodada e retorna o número de falhas (sem resposta, sem confirmação ou desistência)."""
+    total_enviado = sum(len(enviados) for enviados in carga.enviados.values())
+    respostas, registros, sem_resposta = casar_respostas(carga, api)
+    esperados_registros = sum(1 for enviados in carga.enviados.values() for _, passo in enviados if passo == 4)
+    rejeicoes = sum(quantidade for status, quantidade in carga.status.items() if status != 200)
+
+    print()
+    print(f"Chats: {carga.chats}   conversas por chat: {carga.conversas}   atualizações: {total_enviado}")
+    print(f"Envio: {duracao_envio:.2f} s ({total_enviado / duracao_envio:.1f} atualizações/s)")
+    print(f"Processadas: {len(respostas)} respostas em {duracao_total:.2f} s "
+          f"({len(respostas) / duracao_total:.1f} atualizações/s)")
+    print(_linha_percentis("Webhook (POST → HTTP 200)", carga.latencias_webhook))
+    print(_linha_percentis("Resposta do bot (POST → mensagem)", respostas))
+    print(_linha_percentis("Registro (categoria → confirmação)", registros))
+    print(f"Status HTTP: {dict(carga.status)}   taxa de erro: {rejeicoes / max(sum(carga.status.values()), 1):.2%}")
+    print(f"Sem resposta: {sem_resposta}   registros não confirmados: {esperados_registros - len(registros)}   "
+          f"desistências: {sum(carga.falhas.values())}")
+    print(f"Chamadas à API do Telegram: {dict(api.chamadas)}")
+    return sem_resposta + esperados_registros - len(registros) + sum(carga.falhas.values())
+
+async def aguardar_servidor(url_saude, processo, limite=60):
+    async with httpx.AsyncClient(timeout=2) as cliente:
+        fim = time.perf_counter() + limite
+        while time.perf_counter() < fim:
+            if processo is not None and processo.poll() is not None:
+                raise RuntimeError(f"o bot_server terminou com código {processo.returncode}")
+            try:
+                if (await cliente.get(url_saude)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("o bot_server não respondeu a tempo")
+
+async def aguardar_respostas(carga, api, limite):
+    """Espera o bot responder todos os passos (e confirmar os registros) ou o tempo acabar."""
+    esperado = sum(len(enviados) for enviados in carga.enviados.values())
+    fim = time.perf_counter() + limite
+    while time.perf_counter() < fim:
+        respostas, _, _ = casar_respostas(carga, api)
+        confirmadas = sum(
+            1 for mensagens in api.mensagens.values() for _, texto in mensagens if texto.startswith(PREFIXOS_CONFIRMACAO)
+        )
+        if len(respostas) >= esperado and confirmadas >= carga.chats * carga.conversas:
+            return
+        await asyncio.sleep(0.2)
+
+def iniciar_bot(argumentos, diretorio):
+    """Sobe o bot_server em um subprocesso apontando para o stub e para a planilha falsa."""
+    ambiente = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN=TOKEN,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{argumentos.porta_telegram}/bot",
+        RAILWAY_STATIC_URL=f"127.0.0.1:{argumentos.porta}",
+        LIVRO_CAIXA_ARQUIVO=os.path.join(diretorio, "livro_caixa.db"),
+        PERSISTENCIA_ARQUIVO=os.path.join(diretorio, "estado_bot.db"),
+        PORT=str(argumentos.porta),
+        # Os processos de trabalho (WEBHOOK_PROCESSOS > 1) também trocam o Sheets pela planilha falsa
+        WEBHOOK_INICIALIZADOR="benchmarks.carga_webhook:preparar_processo",
+        CARGA_LATENCIA_SHEETS=str(argumentos.latencia_sheets),
+        CARGA_SEM_COTA="1" if argumentos.sem_cota else "",
+    )
+    ambiente.pop("WEBHOOK_SECRET", None)
+    log = open(os.path.join(diretorio, "bot_server.log"), "w")
+    comando = [sys.executable, "-m", "benchmarks.carga_webhook", "--servidor"]
+    return subprocess.Popen(comando, env=ambiente, stdout=log, stderr=subprocess.STDOUT,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def preparar_processo():
+    """Troca o Google Sheets pela planilha falsa neste processo (o do webhook e cada processo de trabalho).
+
+    Lê a latência e a cota do ambiente montado por `iniciar_bot`, já que os
+    processos de trabalho não recebem os argumentos da linha de comando.
+    """
+    import agendador_sheets
+    import config
+    import google_sheets
+    from benchmarks.planilha_falsa import ClienteFalso, ContadorChamadas
+
+    cabecalho = ['Data', 'Descrição', 'Valor', 'Categoria']
+    abas = {
+        config.DESPESAS_SHEET_NAME: [list(cabecalho)],
+        config.RECEITAS_SHEET_NAME: [list(cabecalho)],
+        config.RESUMO_SHEET_NAME: [['Mês/Ano', 'Total Receitas', 'Total Despesas', 'Saldo']],
+    }
+    latencia = float(os.environ.get("CARGA_LATENCIA_SHEETS") or 0)
+    google_sheets._cliente = ClienteFalso(ContadorChamadas(latencia), lambda: abas)
+    if os.environ.get("CARGA_SEM_COTA"):
+        agendador_sheets.agendador = agendador_sheets.AgendadorSheets(
+            leituras_por_minuto=10 ** 9, escritas_por_minuto=10 ** 9
+        )
+
+def executar_servidor(argumentos):
+    """Modo --servidor: o bot_server com o Google Sheets trocado pela planilha falsa."""
+    import bot_server
+
+    preparar_processo()
+    uvicorn.run(bot_server.app, host="127.0.0.1", port=int(os.environ["PORT"]), log_level="warning")
+
+async def executar_carga(argumentos):
+    api = ApiTelegramFalsa(argumentos.latencia_telegram)
+    servidor_api = uvicorn.Server(uvicorn.Config(
+        api.app, host="127.0.0.1", port=argumentos.porta_telegram, log_level="warning"
+    ))
+    tarefa_api = asyncio.create_task(servidor_api.serve())
+
+    processo = None
+    diretorio = tempfile.mkdtemp(prefix="carga_webhook_")
+    url = argumentos.url
+    try:
+        if url is None:
+            processo = iniciar_bot(argumentos, diretorio)
+            url = f"http://127.0.0.1:{argumentos.porta}/{TOKEN}"
+            print(f"bot_server iniciado (log em {diretorio}/bot_server.log)")
+        await aguardar_servidor(url.rsplit("/", 1)[0] + "/", processo)
+
+        carga = Carga(url, argumentos.chats, argumentos.conversas, argumentos.taxa, argumentos.semente)
+        inicio = time.perf_counter()
+        duracao_envio = await carga.executar()
+        await aguardar_respostas(carga, api, argumentos.tempo_limite)
+        return relatorio(carga, api, duracao_envio, time.perf_counter() - inicio)
+    finally:
+        if processo is not None:
+            # SIGINT: o uvicorn encerra o lifespan e a fila grava o que faltar
+            processo.send_signal(signal.SIGINT)
+            try:
+                processo.wait(30)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+        servidor_api.should_exit = True
+        await tarefa_api
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=100, help="Chats simulados em paralelo")
+    parser.add_argument("--conversas", type=int, default=1, help="Conversas completas por chat")
+    parser.add_argument("--taxa", type=float, default=50, help="Atualizações por segundo enviadas ao webhook (0 = sem limite)")
+    parser.add_argument("--url", help="Webhook de um bot_server já rodando (com TELEGRAM_API_URL apontando para o stub)")
+    parser.add_argument("--porta", type=int, default=8080, help="Porta do bot_server iniciado pelo gerador")
+    parser.add_argument("--porta-telegram", type=int, default=8081, help="Porta do stub da API do Telegram")
+    parser.add_argument("--latencia-telegram", type=float, default=0.0, help="Segundos simulados por chamada à API do Telegram")
+    parser.add_argument("--latencia-sheets", type=float, default=0.0, help="Segundos simulados por chamada ao Google Sheets")
+    parser.add_argument("--sem-cota", action="store_true", help="Desliga o limite de cota do Google Sheets no bot")
+    parser.add_argument("--tempo-limite", type=float, default=60, help="Segundos esperando as respostas depois do envio")
+    parser.add_argument("--semente", type=int, default=1, help="Semente dos valores e categorias sorteados")
+    parser.add_argument("--servidor", action="store_true", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.servidor:
+        executar_servidor(argumentos)
+    else:
+        falhas = asyncio.run(executar_carga(argumentos))
+        if falhas:
+            print(f"❌ {falhas} falha(s) na rodada")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Mede os caminhos quentes do google_sheets.py contra a planilha falsa em memória.
+
+Uso (na raiz do projeto):
+
+    python -m benchmarks.medir_sheets
+    python -m benchmarks.medir_sheets --linhas 1000 100000 --operacoes 50 --latencia 0.05
+
+Para cada tamanho de aba, mostra o tempo de parede e as chamadas à API por
+operação de: importação inicial da planilha para o livro-caixa,
+`registrar_gasto_telegram`, os dois caminhos de `atualizar_resumo_mensal`
+(mês que já tem linha no resumo e mês novo) e a reconciliação periódica do
+resumo (`reconciliar_resumo_mensal`).
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O livro-caixa de cada rodada fica em um arquivo temporário, nunca no do bot
+_diretorio = tempfile.mkdtemp(prefix="bench_livro_caixa_")
+os.environ["LIVRO_CAIXA_ARQUIVO"] = os.path.join(_diretorio, "inicial.db")
+
+import agendador_sheets
+import config
+import google_sheets
+import livro_caixa
+from benchmarks.planilha_falsa import ClienteFalso, ContadorChamadas
+
+CABECALHO = ['Data', 'Descrição', 'Valor', 'Categoria']
+CATEGORIAS = ['Alimentação', 'Transporte', 'Saúde', 'Moradia', 'Educação', 'Lazer', 'Vestuário', 'Utilidades', 'Outros']
+DESCRICOES = ['Mercado', 'Uber', 'Farmácia', 'Aluguel', 'Curso', 'Cinema', 'Camiseta', 'Luz', 'Diversos', 'Padaria']
+MESES_DE_HISTORICO = 36
+
+def gerar_abas(linhas):
+    """Monta as três abas com `linhas` despesas (e 1/10 disso em receitas) em ordem de data.
+
+    Os valores se repetem a partir de listas pequenas, então 1 milhão de
+    linhas ocupa poucas centenas de MB.
+    """
+    inicio = datetime(2024, 1, 1)
+    dias = [(inicio + timedelta(days=dia)).strftime("%d/%m/%Y") for dia in range(MESES_DE_HISTORICO * 30)]
+    valores = [-round(5 + indice * 1.37, 2) for indice in range(50)]
+
+    def aba(quantidade, sinal, categorias):
+        linhas_aba = [list(CABECALHO)]
+        for indice in range(quantidade):
+            linhas_aba.append([
+                dias[indice * len(dias) // quantidade],
+                DESCRICOES[indice % len(DESCRICOES)],
+                sinal * valores[indice % len(valores)],
+                categorias[indice % len(categorias)],
+            ])
+        return linhas_aba
+
+    despesas = aba(linhas, 1, CATEGORIAS)
+    receitas = aba(max(linhas // 10, 1), -1, ['Salário', 'Renda Extra', 'Outros Ganhos'])
+    meses = sorted({dia[3:] for dia in dias}, key=lambda mes: mes.split("/")[::-1], reverse=True)
+    resumo = [['Mês/Ano', 'Total Receitas', 'Total Despesas', 'Saldo']] + [[mes, 0.0, 0.0, 0.0] for mes in meses]
+    return {
+        config.DESPESAS_SHEET_NAME: despesas,
+        config.RECEITAS_SHEET_NAME: receitas,
+        config.RESUMO_SHEET_NAME: resumo,
+    }
+
+def preparar(linhas, latencia, rodada):
+    """Liga o google_sheets a uma planilha falsa nova e a um livro-caixa vazio."""
+    contador = ContadorChamadas(latencia)
+    abas = gerar_abas(linhas)
+    cliente = ClienteFalso(contador, lambda: abas)
+
+    livro_caixa._conexao = None
+    livro_caixa._leitores = threading.local()
+    config.LIVRO_CAIXA_ARQUIVO = os.path.join(_diretorio, f"rodada_{rodada}.db")
+    google_sheets.limpar_cache_planilhas()
+    google_sheets._estados.clear()
+    google_sheets._cliente = cliente
+    # Sem limite de cota: mede o bot e a planilha, não a espera pelo Google
+    agendador_sheets.agendador = agendador_sheets.AgendadorSheets(
+        leituras_por_minuto=10 ** 9, escritas_por_minuto=10 ** 9
+    )
+    return contador
+
+def medir(contador, funcao, repeticoes):
+    """Executa `funcao(i)` `repeticoes` vezes e retorna (segundos, chamadas por método)."""
+    contador.zerar()
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        for indice in range(repeticoes):
+            funcao(indice)
+        segundos = time.perf_counter() - inicio
+    return segundos, dict(contador.chamadas)
+
+def _data_existente(indice):
+    return f"{1 + indice % 28:02d}/06/2025"
+
+def _data_nova(indice):
+    # Um mês ainda sem linha no resumo a cada operação
+    return f"01/{indice % 12 + 1:02d}/{2100 + indice // 12}"
+
+def cenarios(operacoes):
+    """(nome, função, repetições); a importação roda antes e aquece o estado em memória."""
+    return [
+        ("importacao inicial", lambda indice: google_sheets.garantir_livro_caixa_importado(), 1),
+        ("registrar_gasto_telegram (1a)", lambda indice: google_sheets.registrar_gasto_telegram(
+            12.5, "Bench", "Lazer", "despesa"), 1),
+        ("registrar_gasto_telegram", lambda indice: google_sheets.registrar_gasto_telegram(
+            12.5, "Bench", "Lazer", "despesa"), operacoes),
+        ("resumo: mes existente", lambda indice: google_sheets.atualizar_resumo_mensal(
+            9.9, "Lazer", "despesa", _data_existente(indice)), operacoes),
+        ("resumo: mes novo", lambda indice: google_sheets.atualizar_resumo_mensal(
+            9.9, "Lazer", "despesa", _data_nova(indice)), operacoes),
+        ("reconciliar resumo", lambda indice: google_sheets.reconciliar_resumo_mensal(), 1),
+        ("reconciliar resumo (em dia)", lambda indice: google_sheets.reconciliar_resumo_mensal(), 1),
+    ]
+
+def _formatar_chamadas(chamadas, repeticoes):
+    return ", ".join(f"{metodo}={quantidade / repeticoes:g}" for metodo, quantidade in sorted(chamadas.items())) or "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="Linhas da aba de despesas em cada rodada")
+    parser.add_argument("--operacoes", type=int, default=20, help="Repetições de cada operação")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos simulados por chamada à API")
+    argumentos = parser.parse_args()
+
+    print(f"{'linhas':>9}  {'cenário':<30} {'ops':>4} {'total (s)':>10} {'ms/op':>9} {'API/op':>7}  chamadas por op")
+    for rodada, linhas in enumerate(argumentos.linhas):
+        contador = preparar(linhas, argumentos.latencia, rodada)
+        for nome, funcao, repeticoes in cenarios(argumentos.operacoes):
+            segundos, chamadas = medir(contador, funcao, repeticoes)
+            print(
+                f"{linhas:>9}  {nome:<30} {repeticoes:>4} {segundos:>10.3f} {segundos * 1000 / repeticoes:>9.2f} "
+                f"{sum(chamadas.values()) / repeticoes:>7g}  {_formatar_chamadas(chamadas, repeticoes)}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Substituto em memória do gspread para medir o bot sem chamar o Google.
+
+Implementa só a parte da API de `Client` / `Spreadsheet` / `Worksheet` que o
+`google_sheets.py` usa. Cada chamada é contada por nome de método e pode
+esperar uma latência configurável, para simular a ida e volta até o Google.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import gspread
+
+PADRAO_A1 = re.compile(r"^([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?$")
+
+def _coluna(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero
+
+def _letras(coluna):
+    letras = ""
+    while coluna:
+        coluna, resto = divmod(coluna - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def interpretar_a1(intervalo):
+    """Converte 'B2:D9', 'A2:D' ou 'A5' em (linha_ini, col_ini, linha_fim, col_fim); None = até o fim."""
+    intervalo = intervalo.split("!")[-1].replace("$", "")
+    encontrado = PADRAO_A1.match(intervalo)
+    if encontrado is None:
+        raise ValueError(f"intervalo inválido: {intervalo}")
+    col_ini, linha_ini, col_fim, linha_fim = encontrado.groups()
+    linha_ini = int(linha_ini) if linha_ini else 1
+    col_ini = _coluna(col_ini) if col_ini else 1
+    if ":" not in intervalo:
+        return linha_ini, col_ini, linha_ini, col_ini
+    return (
+        linha_ini, col_ini,
+        int(linha_fim) if linha_fim else None,
+        _coluna(col_fim) if col_fim else None,
+    )
+
+class ContadorChamadas:
+    """Conta as chamadas por método e aplica a latência simulada."""
+
+    def __init__(self, latencia=0.0, latencias=None):
+        self.latencia = latencia
+        self.latencias = latencias or {}
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+
+    def registrar(self, metodo):
+        with self._lock:
+            self.chamadas[metodo] += 1
+        espera = self.latencias.get(metodo, self.latencia)
+        if espera:
+            time.sleep(espera)
+
+    def total(self):
+        return sum(self.chamadas.values())
+
+    def zerar(self):
+        with self._lock:
+            self.chamadas.clear()
+
+class CelulaFalsa:
+    def __init__(self, linha, coluna, valor):
+        self.row = linha
+        self.col = coluna
+        self.value = valor
+
+class CredenciaisFalsas:
+    """Token que nunca expira, para o cliente nunca tentar renová-lo."""
+    token = "falso"
+    expiry = datetime.utcnow() + timedelta(days=3650)
+    service_account_email = "bot@planilha-falsa.local"
+
+class AbaFalsa:
+    """Uma aba guardada como lista de linhas (listas de valores)."""
+
+    def __init__(self, planilha, titulo, linhas=None, id_aba=0):
+        self.spreadsheet = planilha
+        self.title = titulo
+        self.id = id_aba
+        self.linhas = linhas if linhas is not None else []
+        self._contador = planilha.contador
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return max(len(self.linhas), 1000)
+
+    def _chamada(self, metodo):
+        self._contador.registrar(metodo)
+
+    def _escrever(self, linha, coluna, valores):
+        """Grava uma matriz de valores a partir de (linha, coluna), crescendo a aba se preciso."""
+        for deslocamento, linha_valores in enumerate(valores):
+            numero = linha + deslocamento
+            while len(self.linhas) < numero:
+                self.linhas.append([])
+            destino = self.linhas[numero - 1]
+            if len(destino) < coluna - 1 + len(linha_valores):
+                destino.extend([""] * (coluna - 1 + len(linha_valores) - len(destino)))
+            destino[coluna - 1:coluna - 1 + len(linha_valores)] = linha_valores
+
+    def _intervalo_anexado(self, primeira, quantidade, largura):
+        return {
+            "spreadsheetId": self.spreadsheet.id,
+            "updates": {
+                "updatedRange": f"'{self.title}'!A{primeira}:{_letras(max(largura, 1))}{primeira + quantidade - 1}",
+                "updatedRows": quantidade,
+            },
+        }
+
+    def get_all_values(self, **kwargs):
+        self._chamada("get_all_values")
+        with self._lock:
+            return [[str(valor) for valor in linha] for linha in self.linhas]
+
+    def get(self, intervalo, **kwargs):
+        self._chamada("get")
+        linha_ini, col_ini, linha_fim, col_fim = interpretar_a1(intervalo)
+        with self._lock:
+            linhas = self.linhas[linha_ini - 1:linha_fim]
+            return [[str(valor) for valor in linha[col_ini - 1:col_fim]] for linha in linhas]
+
+    def col_values(self, coluna, **kwargs):
+        self._chamada("col_values")
+        with self._lock:
+            valores = [str(linha[coluna - 1]) if len(linha) >= coluna else "" for linha in self.linhas]
+        # Como a API: as células vazias no fim da coluna não voltam
+        while valores and valores[-1] == "":
+            valores.pop()
+        return valores
+
+    def cell(self, linha, coluna, **kwargs):
+        self._chamada("cell")
+        with self._lock:
+            valores = self.linhas[linha - 1] if linha <= len(self.linhas) else []
+            return CelulaFalsa(linha, coluna, str(valores[coluna - 1]) if len(valores) >= coluna else None)
+
+    def find(self, consulta, in_row=None, in_column=None, case_sensitive=True):
+        self._chamada("find")
+        with self._lock:
+            for numero, linha in enumerate(self.linhas, start=1):
+                if in_row is not None and numero != in_row:
+                    continue
+                for coluna, valor in enumerate(linha, start=1):
+                    if in_column is not None and coluna != in_column:
+                        continue
+                    texto = str(valor)
+                    if texto == consulta if case_sensitive else texto.lower() == str(consulta).lower():
+                        return CelulaFalsa(numero, coluna, texto)
+        return None
+
+    def append_row(self, valores, **kwargs):
+        self._chamada("append_row")
+        return self._anexar([valores])
+
+    def append_rows(self, valores, **kwargs):
+        self._chamada("append_rows")
+        return self._anexar(valores)
+
+    def _anexar(self, valores):
+        with self._lock:
+            # Como a API: anexa depois da última linha com conteúdo
+            while self.linhas and not any(str(valor) for valor in self.linhas[-1]):
+                self.linhas.pop()
+            primeira = len(self.linhas) + 1
+            self.linhas.extend(list(linha) for linha in valores)
+            return self._intervalo_anexado(primeira, len(valores), max((len(linha) for linha in valores), default=1))
+
+    def update_cell(self, linha, coluna, valor):
+        self._chamada("update_cell")
+        with self._lock:
+            self._escrever(linha, coluna, [[valor]])
+
+    def update(self, intervalo, valores=None, **kwargs):
+        self._chamada("update")
+        linha, coluna, _, _ = interpretar_a1(intervalo)
+        with self._lock:
+            self._escrever(linha, coluna, valores or [])
+
+    def batch_update(self, dados, **kwargs):
+        self._chamada("batch_update")
+        with self._lock:
+            for item in dados:
+                linha, coluna, _, _ = interpretar_a1(item["range"])
+                self._escrever(linha, coluna, item["values"])
+
+    def batch_clear(self, intervalos):
+        self._chamada("batch_clear")
+        with self._lock:
+            for intervalo in intervalos:
+                linha_ini, col_ini, linha_fim, col_fim = interpretar_a1(intervalo)
+                for linha in self.linhas[linha_ini - 1:linha_fim]:
+                    fim = len(linha) if col_fim is None else min(col_fim, len(linha))
+                    for coluna in range(col_ini - 1, fim):
+                        linha[coluna] = ""
+
+    def delete_rows(self, inicio, fim=None):
+        self._chamada("delete_rows")
+        with self._lock:
+            del self.linhas[inicio - 1:(fim or inicio)]
+
+    def format(self, intervalos, formato=None, **kwargs):
+        self._chamada("format")
+
+    def _redimensionar(self, linhas):
+        with self._lock:
+            del self.linhas[linhas:]
+
+    def _apagar(self, inicio, fim):
+        with self._lock:
+            del self.linhas[inicio:fim]
+
+class PlanilhaFalsa:
+    """Planilha com as abas do bot; `batch_update` entende redimensionar e apagar linhas."""
+
+    def __init__(self, id_planilha, contador, abas=None):
+        self.id = id_planilha
+        self.title = id_planilha
+        self.contador = contador
+        self._abas = {}
+        for titulo, linhas in (abas or {}).items():
+            self.adicionar_aba(titulo, linhas)
+
+    def adicionar_aba(self, titulo, linhas=None):
+        aba = AbaFalsa(self, titulo, linhas, id_aba=len(self._abas))
+        self._abas[titulo] = aba
+        return aba
+
+    def worksheet(self, titulo):
+        self.contador.registrar("worksheet")
+        if titulo not in self._abas:
+            raise gspread.exceptions.WorksheetNotFound(titulo)
+        return self._abas[titulo]
+
+    def worksheets(self):
+        self.contador.registrar("worksheets")
+        return list(self._abas.values())
+
+    def batch_update(self, corpo):
+        self.contador.registrar("spreadsheet.batch_update")
+        abas = {aba.id: aba for aba in self._abas.values()}
+        for requisicao in corpo.get("requests", []):
+            if "updateSheetProperties" in requisicao:
+                propriedades = requisicao["updateSheetProperties"]["properties"]
+                linhas = propriedades.get("gridProperties", {}).get("rowCount")
+                if linhas is not None:
+                    abas[propriedades["sheetId"]]._redimensionar(linhas)
+            elif "deleteDimension" in requisicao:
+                faixa = requisicao["deleteDimension"]["range"]
+                abas[faixa["sheetId"]]._apagar(faixa["startIndex"], faixa["endIndex"])
+        return {"spreadsheetId": self.id, "replies": []}
+
+class ClienteFalso:
+    """Substitui o `gspread.Client`: `open_by_key` devolve planilhas em memória."""
+
+    def __init__(self, contador=None, abas_iniciais=None):
+        self.contador = contador or ContadorChamadas()
+        self.auth = CredenciaisFalsas()
+        self.session = None
+        self._abas_iniciais = abas_iniciais or (lambda: {})
+        self._planilhas = {}
+
+    def open_by_key(self, chave):
+        self.contador.registrar("open_by_key")
+        if chave not in self._planilhas:
+            self._planilhas[chave] = PlanilhaFalsa(chave, self.contador, self._abas_iniciais())
+        return self._planilhas[chave]
+
+    def planilha(self, chave):
+        """Acesso direto (sem contar chamada) para preparar ou conferir dados."""
+        if chave not in self._planilhas:
+            self._planilhas[chave] = PlanilhaFalsa(chave, self.contador, self._abas_iniciais())
+        return self._planilhas[chave]
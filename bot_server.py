@@ -1,12 +1,35 @@
-from flask import Flask, request, jsonify
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from google_sheets import registrar_gasto_telegram
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
+from processador_chats import ProcessadorPorChat
+from ingestao import Ingestao
+import config
+import fila_registros
+import google_sheets
+import livro_caixa
+import metricas
+import trabalhadores
+from persistencia import PersistenciaSQLite
+from entrada_rapida import EntradaRapida
+import importacao
+import exportacao
+import planilhas
+import relatorios
+import graficos
+import orcamentos
+import busca
 import os
 from dotenv import load_dotenv
 import logging
 import asyncio
+import contextlib
+import secrets
 import sys
+import time
+import uvicorn
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -55,40 +78,75 @@ CATEGORIAS_RECEITAS = [
     ['🎁 Outros Ganhos']
 ]
 
-# Criar o aplicativo Flask
-app = Flask(__name__)
+# Registro em uma mensagem só: "-50,90 almoço alimentação" ou "+3000 salário"
+entrada_rapida = EntradaRapida(CATEGORIAS_DESPESAS, CATEGORIAS_RECEITAS)
 
 # Criar o aplicativo Telegram sem updater para evitar polling
 application = (
     Application.builder()
     .token(os.getenv('TELEGRAM_BOT_TOKEN'))
+    .base_url(config.TELEGRAM_API_URL)
     .updater(None)  # Desabilita explicitamente o updater
-    .arbitrary_callback_data(True)  # Permite dados de callback arbitrários
+    .concurrent_updates(ProcessadorPorChat(config.MAX_ATUALIZACOES_CONCORRENTES))  # Chats em paralelo, cada chat em ordem
+    .persistence(PersistenciaSQLite())  # Conversas em andamento sobrevivem a reinícios
     .build()
 )
 
+# Recebe, deduplica e enfileira as atualizações; um pool de workers processa depois
+ingestao = Ingestao(application)
+
+# Quem recebe o webhook: a ingestão local ou, com vários processos, o roteador por chat
+receptor = ingestao
+
+# Profundidade das filas e cota restante, lidas na hora da coleta
+metricas.registro.medidor("bot_fila_atualizacoes", "Atualizações aguardando processamento", lambda: receptor.tamanho_fila())
+metricas.registro.medidor("bot_fila_registros", "Registros aguardando gravação no livro-caixa", fila_registros.fila.tamanho_fila)
+metricas.registro.medidor(
+    "livro_caixa_planilhas_pendentes", "Planilhas com transações ainda não replicadas",
+    lambda: len(livro_caixa.planilhas_com_pendentes())
+)
+
 # Configurar webhook
-@app.route(f"/{os.getenv('TELEGRAM_BOT_TOKEN')}", methods=['POST'])
-def webhook():
+async def webhook(request: Request):
     """Endpoint para receber atualizações do Telegram."""
+    inicio = time.perf_counter()
+    resposta = await _receber_atualizacao(request)
+    metricas.WEBHOOK_SEGUNDOS.observar(time.perf_counter() - inicio, status=resposta.status_code)
+    return resposta
+
+async def _receber_atualizacao(request: Request):
     try:
-        if request.method == "POST":
-            logger.info("Recebida atualização do Telegram")
-            # Criar uma nova task para processar a atualização
-            update = Update.de_json(request.get_json(), application.bot)
-            asyncio.run(application.process_update(update))
-            logger.info("Atualização processada com sucesso")
-            return jsonify({"status": "ok"})
+        if config.WEBHOOK_SECRET and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), config.WEBHOOK_SECRET
+        ):
+            logger.warning("Atualização recusada: secret token inválido")
+            return JSONResponse({"status": "forbidden"}, status_code=403)
+        
+        logger.info("Recebida atualização do Telegram")
+        # Confirmar na hora: o processamento não segura a resposta ao Telegram
+        situacao = receptor.receber(await request.json())
+        if situacao == Ingestao.CHEIA:
+            logger.warning("Fila de atualizações cheia, pedindo reenvio ao Telegram")
+            return JSONResponse({"status": "busy"}, status_code=503)
+        return JSONResponse({"status": "ok", "update": situacao})
     except Exception as e:
         logger.error(f"Erro no webhook: {str(e)}", exc_info=True)
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+# Métricas no formato do Prometheus
+async def metrics(request: Request):
+    """Endpoint com contadores e histogramas de latência do processo."""
+    if config.METRICAS_TOKEN and not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {config.METRICAS_TOKEN}"
+    ):
+        return PlainTextResponse("forbidden\n", status_code=403)
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
 
 # Rota de healthcheck
-@app.route('/')
-def health():
+async def health(request: Request):
     """Endpoint para healthcheck do Railway."""
     try:
-        return jsonify({
+        return JSONResponse({
             "status": "healthy",
             "message": "Bot está rodando!",
             "service": os.getenv("RAILWAY_SERVICE_NAME", "local"),
@@ -96,58 +154,127 @@ def health():
         })
     except Exception as e:
         logger.error(f"Erro no healthcheck: {str(e)}", exc_info=True)
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Inicializa o Application uma única vez e o mantém no loop do servidor."""
+    if config.WEBHOOK_PROCESSOS > 1:
+        async with _processos_de_trabalho():
+            yield
+        return
+    await setup()
+    await application.start()
+    ingestao.iniciar()
+    logger.info('🤖 Bot iniciado!')
+    try:
+        yield
+    finally:
+        await ingestao.encerrar()
+        await application.stop()
+        await fila_registros.encerrar()
+        await application.shutdown()
+        graficos.encerrar()
+
+@contextlib.asynccontextmanager
+async def _processos_de_trabalho():
+    """Este processo só recebe o webhook e replica na planilha; os handlers rodam nos processos de trabalho."""
+    global receptor
+    # Antes dos processos de trabalho: eles gravam no livro-caixa sem nunca ler a planilha
+    await asyncio.to_thread(google_sheets.importar_planilhas_conhecidas)
+    roteador = trabalhadores.Roteador()
+    roteador.iniciar()
+    receptor = roteador
+    await fila_registros.iniciar()
+    avisos = asyncio.create_task(trabalhadores.repassar_avisos(roteador))
+    metricas_trabalhadores = asyncio.create_task(trabalhadores.receber_metricas(roteador))
+    await application.bot.initialize()
+    await configurar_webhook()
+    logger.info(f'🤖 Bot iniciado com {config.WEBHOOK_PROCESSOS} processos de trabalho!')
+    try:
+        yield
+    finally:
+        # As métricas continuam chegando até o fim: quem encerra ainda manda o último retrato
+        await roteador.encerrar()
+        avisos.cancel()
+        metricas_trabalhadores.cancel()
+        await fila_registros.encerrar()
+        await application.bot.shutdown()
+
+# Criar o aplicativo ASGI
+app = Starlette(
+    routes=[
+        Route(f"/{os.getenv('TELEGRAM_BOT_TOKEN')}", webhook, methods=['POST']),
+        Route('/metrics', metrics),
+        Route('/', health),
+    ],
+    lifespan=lifespan
+)
 
 async def setup():
     """Configura o bot e seus handlers."""
     try:
-        # Configurar handlers
-        conv_handler = ConversationHandler(
-            entry_points=[CommandHandler('start', start)],
-            states={
-                ESCOLHA_TIPO: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolher_tipo)],
-                VALOR: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolher_valor)],
-                DESCRICAO: [MessageHandler(filters.TEXT & ~filters.COMMAND, descricao)],
-                CATEGORIA: [MessageHandler(filters.TEXT & ~filters.COMMAND, categoria)],
-                MENU_FINAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, menu_final)],
-            },
-            fallbacks=[CommandHandler('cancel', cancel)]
-        )
-        
-        application.add_handler(conv_handler)
+        registrar_handlers()
+        await application.initialize()
+        await fila_registros.iniciar()
         logger.info("Handlers configurados com sucesso")
-        
-        # Configurar webhook
-        webhook_url = f"https://{os.getenv('RAILWAY_STATIC_URL')}/{os.getenv('TELEGRAM_BOT_TOKEN')}"
-        await application.bot.set_webhook(webhook_url)
-        logger.info(f"Webhook configurado: {webhook_url}")
+        await configurar_webhook()
         
     except Exception as e:
         logger.error(f"Erro na configuração do bot: {str(e)}", exc_info=True)
         raise
 
+def registrar_handlers():
+    """Registra os handlers no Application (também usado pelos processos de trabalho)."""
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler('start', start)],
+        states={
+            ESCOLHA_TIPO: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolher_tipo)],
+            VALOR: [MessageHandler(filters.TEXT & ~filters.COMMAND, escolher_valor)],
+            DESCRICAO: [MessageHandler(filters.TEXT & ~filters.COMMAND, descricao)],
+            CATEGORIA: [MessageHandler(filters.TEXT & ~filters.COMMAND, categoria)],
+            MENU_FINAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, menu_final)],
+        },
+        fallbacks=[CommandHandler('cancel', cancel)],
+        name='transacao',
+        persistent=True
+    )
+    
+    application.add_handler(conv_handler)
+    # Depois da conversa: nos passos de digitação a mensagem é a resposta do passo (ex.: a descrição "-10 desconto");
+    # nos menus (escolha do tipo e menu final) é a própria conversa que repassa a entrada rápida
+    application.add_handler(MessageHandler(filters.Regex(entrada_rapida.padrao) & ~filters.COMMAND, entrada_rapida.registrar))
+    application.add_handler(CommandHandler('importar', importacao.comando_importar))
+    application.add_handler(CommandHandler('exportar', exportacao.comando_exportar))
+    application.add_handler(CommandHandler('planilha', planilhas.comando_planilha))
+    application.add_handler(CommandHandler('resumo', relatorios.comando_resumo))
+    application.add_handler(CommandHandler('categorias', relatorios.comando_categorias))
+    application.add_handler(CommandHandler('grafico', graficos.comando_grafico))
+    application.add_handler(CommandHandler('orcamento', orcamentos.comando_orcamento))
+    application.add_handler(CommandHandler('buscar', busca.comando_buscar))
+    application.add_handler(CallbackQueryHandler(busca.paginar_busca, pattern=r'^buscar:\d+:\d+$'))
+    extratos = filters.Document.FileExtension('csv') | filters.Document.FileExtension('ofx') | filters.Document.FileExtension('qfx')
+    application.add_handler(MessageHandler(extratos, importacao.receber_extrato))
+
+async def configurar_webhook():
+    """Aponta o webhook do Telegram para este servidor."""
+    webhook_url = f"https://{os.getenv('RAILWAY_STATIC_URL')}/{os.getenv('TELEGRAM_BOT_TOKEN')}"
+    await application.bot.set_webhook(webhook_url, secret_token=config.WEBHOOK_SECRET)
+    logger.info(f"Webhook configurado: {webhook_url}")
+
 def main():
     """Função principal para iniciar o bot e o servidor."""
     try:
-        # Configurar o bot de forma assíncrona
-        asyncio.run(setup())
-        
-        # Iniciar o servidor Flask
+        # Iniciar o servidor ASGI; o bot é configurado no lifespan, dentro do loop do servidor
         port = int(os.getenv("PORT", 5000))
-        logger.info('🤖 Bot iniciado!')
         logger.info(f'Port: {port}')
-        
-        # Usar Gunicorn para produção (configurado no railway.toml)
-        if os.getenv("RAILWAY_ENVIRONMENT_NAME"):
-            app.run(host="0.0.0.0", port=port)
-        else:
-            # Para desenvolvimento local
-            app.run(host="0.0.0.0", port=port, debug=True)
+        uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
         
     except Exception as e:
         logger.error(f"Erro ao iniciar o bot: {str(e)}", exc_info=True)
         raise
 
+@metricas.medir_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Inicia o bot e mostra os botões principais."""
     if update.message is None:
@@ -156,11 +283,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = ReplyKeyboardMarkup(BOTOES_INICIAIS, resize_keyboard=True)
     await update.message.reply_text(
         'Olá! 👋 Vou ajudar você a registrar suas finanças.\n\n'
+        'Dica: registre direto em uma mensagem, ex.: -50,90 almoço alimentação ou +3000 salário\n\n'
         'Escolha uma opção:',
         reply_markup=reply_markup
     )
     return ESCOLHA_TIPO
 
+@metricas.medir_handler
 async def escolher_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Processa a escolha do tipo de registro (receita ou despesa)."""
     escolha = update.message.text
@@ -183,6 +312,10 @@ async def escolher_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
+    elif entrada_rapida.padrao.match(escolha or ""):
+        # Entrada rápida no menu: registra e continua esperando a escolha
+        await entrada_rapida.registrar(update, context)
+        return ESCOLHA_TIPO
     else:
         reply_markup = ReplyKeyboardMarkup(BOTOES_INICIAIS, resize_keyboard=True)
         await update.message.reply_text(
@@ -193,6 +326,7 @@ async def escolher_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return VALOR
 
+@metricas.medir_handler
 async def escolher_valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Processa o valor digitado pelo usuário."""
     try:
@@ -226,6 +360,7 @@ async def escolher_valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return VALOR
 
+@metricas.medir_handler
 async def descricao(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Processa a descrição e solicita a categoria."""
     context.user_data['descricao'] = update.message.text
@@ -246,6 +381,7 @@ async def descricao(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return CATEGORIA
 
+@metricas.medir_handler
 async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Finaliza o registro e mostra o menu final."""
     categoria_texto = update.message.text
@@ -255,21 +391,29 @@ async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['categoria'] = categoria_texto
     
-    # Registrar no Google Sheets
+    # Enfileirar o registro no Google Sheets sem bloquear o bot
     try:
-        registrar_gasto_telegram(
+        futuro = fila_registros.enfileirar(
             context.user_data['valor'],
             context.user_data['descricao'],
             context.user_data['categoria'],
-            context.user_data.get('tipo', 'despesa')  # Passa o tipo (receita ou despesa)
+            context.user_data.get('tipo', 'despesa'),  # Passa o tipo (receita ou despesa)
+            planilhas.planilha_do_chat(update.effective_chat.id),
+            update.effective_chat.id
         )
         
         tipo = '💰 Receita' if context.user_data.get('tipo') == 'receita' else '💸 Despesa'
         
-        # Mostrar mensagem de sucesso e menu final
+        # Avisar o resultado da gravação quando o lote for salvo
+        context.application.create_task(
+            fila_registros.confirmar_registro(futuro, context.bot, update.effective_chat.id, tipo),
+            update=update
+        )
+        
+        # Mostrar mensagem de confirmação e menu final
         reply_markup = ReplyKeyboardMarkup(BOTOES_FINAIS, resize_keyboard=True)
         await update.message.reply_text(
-            f'✅ {tipo} registrada com sucesso!\n\n'
+            f'⏳ {tipo} recebida! Salvando na planilha...\n\n'
             f'💰 Valor: R$ {context.user_data["valor"]:.2f}\n'
             f'📝 Descrição: {context.user_data["descricao"]}\n'
             f'📂 Categoria: {context.user_data["categoria"]}\n\n'
@@ -287,6 +431,7 @@ async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
     return MENU_FINAL
 
+@metricas.medir_handler
 async def menu_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Processa a escolha do menu final."""
     escolha = update.message.text
@@ -304,6 +449,10 @@ async def menu_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
+    elif entrada_rapida.padrao.match(escolha or ""):
+        # Entrada rápida no menu final: registra e continua no menu
+        await entrada_rapida.registrar(update, context)
+        return MENU_FINAL
     else:
         reply_markup = ReplyKeyboardMarkup(BOTOES_FINAIS, resize_keyboard=True)
         await update.message.reply_text(
@@ -312,6 +461,7 @@ async def menu_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return MENU_FINAL
 
+@metricas.medir_handler
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancela a operação atual."""
     await update.message.reply_text(
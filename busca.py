@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import shlex
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+import config
+import exportacao
+import livro_caixa
+import metricas
+import planilhas
+from texto import normalizar
+
+logger = logging.getLogger(__name__)
+
+# Menor pedaço de texto que o índice de trigramas consegue procurar
+TAMANHO_MINIMO = 3
+
+def _frase(texto):
+    return '"' + texto.replace('"', '""') + '"'
+
+def montar_consulta(termo, categoria=None):
+    """Monta a consulta MATCH: todas as palavras do termo na descrição e, opcionalmente, a categoria.
+
+    Palavras com menos de 3 letras são ignoradas (o índice é de trigramas);
+    levanta ValueError se não sobrar nenhuma.
+    """
+    palavras = [palavra for palavra in normalizar(termo).split() if len(palavra) >= TAMANHO_MINIMO]
+    if not palavras:
+        raise ValueError(f"o termo precisa ter pelo menos {TAMANHO_MINIMO} letras")
+    partes = [f"descricao : {_frase(palavra)}" for palavra in palavras]
+    if categoria:
+        categoria = normalizar(categoria).strip()
+        if len(categoria) < TAMANHO_MINIMO:
+            raise ValueError(f"a categoria precisa ter pelo menos {TAMANHO_MINIMO} letras")
+        partes.append(f"categoria : {_frase(categoria)}")
+    return " AND ".join(partes)
+
+def interpretar_argumentos(texto):
+    """Separa `<termo> [período] [categoria]` em (termo, início, fim, categoria).
+
+    O termo pode ter várias palavras entre aspas; o período aceita os mesmos
+    formatos do /exportar. Levanta ValueError se não houver termo.
+    """
+    try:
+        partes = shlex.split(texto)
+    except ValueError:
+        partes = texto.split()
+    if not partes:
+        raise ValueError("informe o que procurar")
+    termo, resto = partes[0], partes[1:]
+    inicio = fim = None
+    # `01/2026 a 03/2026` ocupa três pedaços; os demais formatos, um só
+    for tamanho in (3, 1):
+        if len(resto) >= tamanho:
+            try:
+                inicio, fim = exportacao.interpretar_periodo(" ".join(resto[:tamanho]))
+            except ValueError:
+                continue
+            resto = resto[tamanho:]
+            break
+    return termo, inicio, fim, " ".join(resto) or None
+
+def atualizar_indice():
+    """Indexa as transações gravadas desde a última atualização (por qualquer processo)."""
+    return livro_caixa.indexar_busca(normalizar)
+
+def buscar(consulta, planilha=None, inicio=None, fim=None, pagina=0):
+    """Atualiza o índice com o que for novo e retorna (totais, transações da página)."""
+    atualizar_indice()
+    return livro_caixa.buscar_transacoes(
+        consulta, planilha, inicio, fim,
+        limite=config.BUSCA_RESULTADOS_POR_PAGINA, deslocamento=pagina * config.BUSCA_RESULTADOS_POR_PAGINA
+    )
+
+def _reais(centavos):
+    return f"R$ {centavos / 100:.2f}"
+
+def texto_resultados(termo, totais, transacoes, pagina):
+    """Mensagem com os totais da busca e as transações da página."""
+    quantidade = sum(total[0] for total in totais.values())
+    if not quantidade:
+        return f'🔍 Nada encontrado para "{termo}".', 0
+    paginas = -(-quantidade // config.BUSCA_RESULTADOS_POR_PAGINA)
+    linhas = [f'🔍 {quantidade} transação(ões) com "{termo}" (página {pagina + 1}/{paginas})']
+    if 'despesa' in totais:
+        linhas.append(f'💸 Despesas: {totais["despesa"][0]} · {_reais(-totais["despesa"][1])}')
+    if 'receita' in totais:
+        linhas.append(f'💰 Receitas: {totais["receita"][0]} · {_reais(totais["receita"][1])}')
+    linhas.append('')
+    for data, descricao, centavos, categoria, tipo in transacoes:
+        sinal = '+' if tipo == 'receita' else '-'
+        linhas.append(f'{data[8:10]}/{data[5:7]}/{data[:4]} {sinal}{_reais(abs(centavos))} {descricao} · {categoria}')
+    return "\n".join(linhas), paginas
+
+def _teclado(busca_id, pagina, paginas):
+    botoes = []
+    if pagina > 0:
+        botoes.append(InlineKeyboardButton('◀️ Anteriores', callback_data=f'buscar:{busca_id}:{pagina - 1}'))
+    if pagina + 1 < paginas:
+        botoes.append(InlineKeyboardButton('Próximas ▶️', callback_data=f'buscar:{busca_id}:{pagina + 1}'))
+    return InlineKeyboardMarkup([botoes]) if botoes else None
+
+async def _pesquisar(busca_id, busca, pagina):
+    termo, consulta, inicio, fim, planilha = busca
+    totais, transacoes = await asyncio.to_thread(buscar, consulta, planilha, inicio, fim, pagina)
+    texto, paginas = texto_resultados(termo, totais, transacoes, pagina)
+    return texto, _teclado(busca_id, pagina, paginas)
+
+@metricas.medir_handler
+async def comando_buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Procura transações pela descrição: /buscar <termo> [período] [categoria]."""
+    try:
+        termo, inicio, fim, categoria = interpretar_argumentos(" ".join(context.args))
+        consulta = montar_consulta(termo, categoria)
+    except ValueError as e:
+        await update.message.reply_text(
+            f'❌ {str(e)}\n\n'
+            'Use: /buscar <termo> [período] [categoria] (ex.: /buscar mercado, /buscar uber 10/2026, '
+            '/buscar "posto shell" 2026 transporte)'
+        )
+        return
+
+    # A busca fica no livro-caixa: os botões de página só levam o id e continuam valendo após um reinício
+    chat_id = update.effective_chat.id
+    busca = (termo, consulta, inicio, fim, planilhas.planilha_do_chat(chat_id))
+    try:
+        busca_id = await asyncio.to_thread(livro_caixa.salvar_busca, chat_id, *busca)
+        texto, teclado = await _pesquisar(busca_id, busca, 0)
+    except Exception as e:
+        logger.error(f"Erro na busca: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro na busca: {str(e)}')
+        return
+    await update.message.reply_text(texto, reply_markup=teclado)
+
+@metricas.medir_handler
+async def paginar_busca(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botões de página de uma busca (callback_data "buscar:<id>:<página>")."""
+    consulta = update.callback_query
+    await consulta.answer()
+    _, busca_id, pagina = consulta.data.split(':')
+    busca = await asyncio.to_thread(livro_caixa.obter_busca, int(busca_id), update.effective_chat.id)
+    if busca is None:
+        await consulta.edit_message_text('⌛ Essa busca expirou. Use /buscar de novo.')
+        return
+    try:
+        texto, teclado = await _pesquisar(int(busca_id), busca, int(pagina))
+    except Exception as e:
+        logger.error(f"Erro na busca: {str(e)}", exc_info=True)
+        await consulta.edit_message_text(f'❌ Erro na busca: {str(e)}')
+        return
+    await consulta.edit_message_text(texto, reply_markup=teclado)
@@ -5,8 +5,77 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")  # Trocado só em testes de carga
 GOOGLE_SHEETS_CREDENTIALS = "bot-financeiro-454714-8a6fe14bfdfc.json"
 SHEET_NAME = "1jLDVo94XDgPbk6eO7vhgjTw62f5EkNO-MrQp7ppZjD0"  # ID da planilha
 DESPESAS_SHEET_NAME = "Despesas"  # Nome da aba de despesas
 RECEITAS_SHEET_NAME = "Receitas"  # Nome da aba de receitas
 RESUMO_SHEET_NAME = "Resumo Mensal"  # Nome da aba de resumo
+
+# Conexão com o Google Sheets
+SHEETS_POOL_CONEXOES = 10  # Conexões keep-alive mantidas no pool HTTP
+SHEETS_MARGEM_RENOVACAO_TOKEN = 300  # Segundos antes da expiração para renovar o token
+SHEETS_CACHE_PLANILHAS = 256  # Planilhas abertas mantidas em cache (as menos usadas saem primeiro)
+SHEETS_CACHE_VALIDADE = 1800  # Segundos até reabrir uma planilha/aba em cache
+
+# Cotas do Google Sheets (por minuto, por usuário/conta de serviço)
+SHEETS_LEITURAS_POR_MINUTO = 60  # Requisições de leitura por minuto
+SHEETS_ESCRITAS_POR_MINUTO = 60  # Requisições de escrita por minuto
+SHEETS_TENTATIVAS = 6  # Tentativas em erros 429/5xx antes de desistir
+SHEETS_ESPERA_BASE = 1.0  # Segundos da primeira espera (dobra a cada tentativa, com jitter)
+SHEETS_ESPERA_MAXIMA = 64.0  # Teto da espera entre tentativas
+SHEETS_LIMIAR_LOTE_GRANDE = 0.2  # Abaixo desta fração da cota de escrita, junta lotes maiores
+
+# Resumo Mensal
+RESUMO_VALIDADE_MAPA = 300  # Segundos até reler a coluna A do resumo (pega linhas movidas à mão)
+RESUMO_INTERVALO_RECONCILIACAO = int(os.getenv("RESUMO_INTERVALO_RECONCILIACAO", 60))  # Segundos entre acertos do resumo fora do registro (0 = atualizar a cada registro)
+RESUMO_INTERVALO_VERIFICACAO = 3600  # Segundos entre conferências do resumo de planilhas sem registros novos (pega edições à mão)
+
+# Livro-caixa local (fonte da verdade; a planilha é o espelho)
+LIVRO_CAIXA_ARQUIVO = os.getenv("LIVRO_CAIXA_ARQUIVO", "livro_caixa.db")
+
+# Fila de escrita assíncrona
+FILA_INTERVALO_FLUSH = 1.0  # Segundos para agrupar registros antes de replicar na planilha
+FILA_TAMANHO_LOTE = 500  # Máximo de linhas enviadas por aba em cada append_rows
+FILA_INTERVALO_RETENTATIVA = 30  # Segundos entre novas tentativas de replicar o que ficou pendente
+
+# Importação de extratos (CSV/OFX)
+IMPORTACAO_TAMANHO_LOTE = 2000  # Linhas por append_rows em importações ou com a cota de escrita no fim
+IMPORTACAO_LINHAS_POR_TRANSACAO = 1000  # Linhas do arquivo gravadas por transação no livro-caixa
+IMPORTACAO_JANELA_REPETIDAS = 10000  # Linhas distintas (data, descrição, valor) lembradas para numerar as repetidas de um CSV
+
+# Exportação
+EXPORTACAO_TAMANHO_PAGINA = 1000  # Linhas lidas do livro-caixa por vez ao exportar
+
+# Relatórios (/resumo, /categorias e /grafico)
+RELATORIO_MESES = 6  # Meses mostrados por padrão no /resumo
+RELATORIO_MAXIMO_MESES = 24  # Máximo de meses aceito em /resumo <meses> e /grafico <meses>
+
+# Orçamentos (/orcamento)
+ORCAMENTO_ALERTAS = [int(p) for p in os.getenv("ORCAMENTO_ALERTAS", "80,100").split(",")]  # Percentuais do orçamento que disparam aviso
+
+# Busca (/buscar)
+BUSCA_RESULTADOS_POR_PAGINA = 10  # Transações mostradas em cada página da busca
+BUSCA_TAMANHO_LOTE = 5000  # Transações indexadas por transação SQLite ao atualizar o índice de busca
+BUSCA_VALIDADE_DIAS = 30  # Dias em que os botões de página de uma busca continuam funcionando
+
+# Gráficos (/grafico)
+GRAFICO_PROCESSOS = int(os.getenv("GRAFICO_PROCESSOS", 2))  # Processos do pool que desenha os gráficos
+GRAFICO_CACHE_TAMANHO = 1000  # file_id de gráficos já enviados guardados para reenvio
+GRAFICO_MAXIMO_FATIAS = 8  # Fatias da pizza de categorias; as menores viram "Demais"
+
+# Servidor webhook
+MAX_ATUALIZACOES_CONCORRENTES = 64  # Atualizações processadas ao mesmo tempo (um chat por vez)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Conferido no header X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_WORKERS = 32  # Workers que consomem a fila de atualizações recebidas
+WEBHOOK_TAMANHO_FILA = 10000  # Acima disso o webhook responde 503 e o Telegram reenvia depois
+WEBHOOK_JANELA_DEDUPLICACAO = 10000  # Quantidade de update_id lembrados para descartar reenvios
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")  # Se definido, /metrics exige o header Authorization: Bearer <token>
+WEBHOOK_PROCESSOS = int(os.getenv("WEBHOOK_PROCESSOS", 1))  # Processos que rodam os handlers (cada chat fica sempre no mesmo)
+METRICAS_INTERVALO_PROCESSOS = 5  # Segundos entre os envios das métricas de cada processo de trabalho ao do webhook
+WEBHOOK_INICIALIZADOR = os.getenv("WEBHOOK_INICIALIZADOR")  # "modulo:funcao" chamada no início de cada processo de trabalho (ex.: benchmarks)
+
+# Persistência das conversas
+PERSISTENCIA_ARQUIVO = os.getenv("PERSISTENCIA_ARQUIVO", "estado_bot.db")
+PERSISTENCIA_INTERVALO = 5  # Segundos entre gravações agrupadas do estado das conversas
+PERSISTENCIA_USUARIOS_CARREGADOS = 10000  # Usuários cujo user_data já foi lido do disco lembrados em memória (LRU)
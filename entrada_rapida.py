@@ -0,0 +1,115 @@
+import re
+from telegram import Update
+from telegram.ext import ContextTypes
+import fila_registros
+import metricas
+import planilhas
+from texto import normalizar
+
+# Sinal, valor (1.234,56 | 1234,56 | 1234.56 | 1234, com R$ opcional) e o resto da mensagem
+PADRAO_ENTRADA = re.compile(
+    r"^\s*(?P<sinal>[+-])\s*(?:R\$\s*)?"
+    r"(?P<valor>\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)"
+    r"\s+(?P<resto>\S.*?)\s*$",
+    re.IGNORECASE
+)
+
+# Mesma resposta do formulário para um valor que não serve
+MENSAGEM_VALOR_INVALIDO = '❌ Por favor, digite um valor numérico válido!'
+
+def converter_valor_brasileiro(texto):
+    """Converte 1.234,56 / 1234,56 / 1234.56 / 1234 em float."""
+    if "," in texto:
+        return float(texto.replace(".", "").replace(",", "."))
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", texto):
+        # Só pontos de milhar: 1.234 = mil duzentos e trinta e quatro
+        return float(texto.replace(".", ""))
+    return float(texto)
+
+def _nomes_do_teclado(teclado):
+    """Extrai os nomes das categorias dos botões (sem o emoji)."""
+    return [botao.split(" ", 1)[1] if " " in botao else botao for linha in teclado for botao in linha]
+
+class EntradaRapida:
+    """Registra uma transação inteira em uma mensagem, ex.: `-50,90 almoço alimentação` ou `+3000 salário`.
+
+    `-` indica despesa e `+` receita. A categoria é procurada no fim da
+    mensagem (ignorando acentos e maiúsculas, e aceitando um prefixo único
+    como `alim`); o restante vira a descrição. Sem categoria reconhecida,
+    usa a última categoria do teclado (Outros / Outros Ganhos).
+    """
+
+    def __init__(self, categorias_despesas, categorias_receitas):
+        self.padrao = PADRAO_ENTRADA
+        self._categorias = {
+            'despesa': {normalizar(nome): nome for nome in _nomes_do_teclado(categorias_despesas)},
+            'receita': {normalizar(nome): nome for nome in _nomes_do_teclado(categorias_receitas)},
+        }
+        self._padrao = {tipo: list(categorias.values())[-1] for tipo, categorias in self._categorias.items()}
+
+    def _encontrar_categoria(self, tipo, palavras):
+        """Retorna (categoria, quantidade de palavras usadas) olhando o fim da mensagem."""
+        categorias = self._categorias[tipo]
+        for tamanho in (3, 2, 1):
+            if len(palavras) < tamanho:
+                continue
+            candidata = normalizar(" ".join(palavras[-tamanho:]))
+            if candidata in categorias:
+                return categorias[candidata], tamanho
+            if tamanho == 1 and len(candidata) >= 3:
+                prefixos = [nome for chave, nome in categorias.items() if chave.startswith(candidata)]
+                if len(prefixos) == 1:
+                    return prefixos[0], 1
+        return None, 0
+
+    def interpretar(self, texto):
+        """Retorna dict com valor, descricao, categoria e tipo, ou None se não for uma entrada rápida.
+
+        Levanta ValueError se a mensagem tem o formato da entrada rápida mas o valor é zero.
+        """
+        encontrado = self.padrao.match(texto or "")
+        if encontrado is None:
+            return None
+        tipo = 'receita' if encontrado.group("sinal") == "+" else 'despesa'
+        valor = converter_valor_brasileiro(encontrado.group("valor"))
+        if valor <= 0:
+            raise ValueError("valor zerado")
+
+        palavras = encontrado.group("resto").split()
+        categoria, usadas = self._encontrar_categoria(tipo, palavras)
+        if categoria is None:
+            categoria = self._padrao[tipo]
+        elif usadas < len(palavras):
+            palavras = palavras[:-usadas]
+        # Se a mensagem só tem a categoria (ex.: "+3000 salário"), ela também é a descrição
+        return {"valor": valor, "descricao": " ".join(palavras), "categoria": categoria, "tipo": tipo}
+
+    @metricas.medir_handler
+    async def registrar(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler: registra a transação e responde só com a confirmação da gravação."""
+        try:
+            transacao = self.interpretar(update.message.text)
+        except ValueError:
+            await update.message.reply_text(MENSAGEM_VALOR_INVALIDO)
+            return
+        if transacao is None:
+            return
+
+        futuro = fila_registros.enfileirar(
+            transacao["valor"],
+            transacao["descricao"],
+            transacao["categoria"],
+            transacao["tipo"],
+            planilhas.planilha_do_chat(update.effective_chat.id),
+            update.effective_chat.id
+        )
+        tipo = '💰 Receita' if transacao["tipo"] == 'receita' else '💸 Despesa'
+        context.application.create_task(
+            fila_registros.confirmar_registro(
+                futuro,
+                context.bot,
+                update.effective_chat.id,
+                f'{tipo} de R$ {transacao["valor"]:.2f} ({transacao["descricao"]} · {transacao["categoria"]})'
+            ),
+            update=update
+        )
@@ -0,0 +1,119 @@
+import asyncio
+import calendar
+import csv
+import gzip
+import heapq
+import logging
+import os
+import re
+import tempfile
+from telegram import Update
+from telegram.ext import ContextTypes
+import config
+import google_sheets
+import livro_caixa
+import metricas
+import planilhas
+
+logger = logging.getLogger(__name__)
+
+CABECALHO = ['Data', 'Descrição', 'Valor', 'Categoria', 'Tipo']
+
+def _limites(texto, fim):
+    """Converte AAAA, MM/AAAA ou DD/MM/AAAA no primeiro (ou último) dia em AAAA-MM-DD."""
+    partes = [int(parte) for parte in texto.split("/")]
+    if len(partes) == 1:
+        ano, = partes
+        return f"{ano:04d}-12-31" if fim else f"{ano:04d}-01-01"
+    if len(partes) == 2:
+        mes, ano = partes
+        if not 1 <= mes <= 12:
+            raise ValueError(f"mês inválido: {texto}")
+        dia = calendar.monthrange(ano, mes)[1] if fim else 1
+        return f"{ano:04d}-{mes:02d}-{dia:02d}"
+    dia, mes, ano = partes
+    if not 1 <= mes <= 12 or not 1 <= dia <= calendar.monthrange(ano, mes)[1]:
+        raise ValueError(f"dia inválido: {texto}")
+    return f"{ano:04d}-{mes:02d}-{dia:02d}"
+
+def interpretar_periodo(texto):
+    """Interpreta o período de um comando e retorna (inicio, fim) em AAAA-MM-DD.
+
+    Aceita vazio (tudo), `2026`, `10/2026`, `15/10/2026` ou um intervalo
+    `01/2026-03/2026` / `01/2026 a 03/2026`. Levanta ValueError se inválido.
+    """
+    texto = (texto or "").strip()
+    if not texto:
+        return None, None
+    data = r"(?:\d{1,2}/)?(?:\d{1,2}/)?\d{4}"
+    encontrado = re.fullmatch(rf"({data})\s*(?:-|a|até)\s*({data})", texto, re.IGNORECASE)
+    if encontrado:
+        inicio, fim = _limites(encontrado.group(1), False), _limites(encontrado.group(2), True)
+    elif re.fullmatch(data, texto):
+        inicio, fim = _limites(texto, False), _limites(texto, True)
+    else:
+        raise ValueError(f"período inválido: {texto}")
+    if inicio > fim:
+        raise ValueError(f"período invertido: {texto}")
+    return inicio, fim
+
+def linhas_em_ordem(inicio=None, fim=None, tamanho_pagina=config.EXPORTACAO_TAMANHO_PAGINA, planilha=None):
+    """Junta receitas e despesas em ordem de data lendo as duas em páginas."""
+    return heapq.merge(
+        livro_caixa.iterar_transacoes('receita', inicio, fim, tamanho_pagina, planilha),
+        livro_caixa.iterar_transacoes('despesa', inicio, fim, tamanho_pagina, planilha)
+    )
+
+def _linha_csv(transacao):
+    data_iso, _, descricao, valor_centavos, categoria, tipo = transacao
+    ano, mes, dia = data_iso.split("-")
+    # Vírgula decimal e ";" como separador, como o Excel em português espera
+    valor = f"{valor_centavos / 100:.2f}".replace(".", ",")
+    return [f"{dia}/{mes}/{ano}", descricao, valor, categoria, tipo]
+
+def exportar_csv_gz(caminho, inicio=None, fim=None, planilha=None):
+    """Grava as transações do período em um CSV compactado (gzip) e retorna quantas linhas foram escritas."""
+    google_sheets.garantir_livro_caixa_importado(planilha)
+    total = 0
+    with gzip.open(caminho, "wt", encoding="utf-8-sig", newline="") as arquivo:
+        escritor = csv.writer(arquivo, delimiter=";")
+        escritor.writerow(CABECALHO)
+        for transacao in linhas_em_ordem(inicio, fim, planilha=planilha):
+            escritor.writerow(_linha_csv(transacao))
+            total += 1
+    return total
+
+@metricas.medir_handler
+async def comando_exportar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Envia as transações do período como CSV compactado: /exportar [período]."""
+    try:
+        inicio, fim = interpretar_periodo(" ".join(context.args))
+    except ValueError as e:
+        await update.message.reply_text(
+            f'❌ {str(e)}\n\n'
+            'Use: /exportar, /exportar 2026, /exportar 10/2026 ou /exportar 01/2026-03/2026'
+        )
+        return
+
+    nome = "transacoes" + (f"_{inicio}_a_{fim}" if inicio else "") + ".csv.gz"
+    await update.message.reply_text('⏳ Gerando exportação...')
+    descritor, caminho = tempfile.mkstemp(suffix=".csv.gz")
+    os.close(descritor)
+    try:
+        total = await asyncio.to_thread(
+            exportar_csv_gz, caminho, inicio, fim, planilhas.planilha_do_chat(update.effective_chat.id)
+        )
+        if total == 0:
+            await update.message.reply_text('📭 Nenhuma transação no período.')
+            return
+        with open(caminho, "rb") as arquivo:
+            await update.message.reply_document(
+                document=arquivo,
+                filename=nome,
+                caption=f'📤 {total} transação(ões) exportada(s)'
+            )
+    except Exception as e:
+        logger.error(f"Erro ao exportar: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao exportar: {str(e)}')
+    finally:
+        os.remove(caminho)
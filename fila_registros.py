@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import busca
+import config
+import google_sheets
+import livro_caixa
+import orcamentos
+
+logger = logging.getLogger(__name__)
+
+class Registro:
+    """Transação aguardando gravação no livro-caixa."""
+
+    def __init__(self, transacao, futuro):
+        self.transacao = transacao
+        self.futuro = futuro
+
+class FilaRegistros:
+    """Fila write-behind: grava no livro-caixa local e replica na planilha em lotes.
+
+    Cada transação é confirmada assim que entra no livro-caixa. A replicação
+    no Google Sheets roda em segundo plano, agrupando por aba tudo o que
+    chegou dentro do intervalo de flush em um único append_rows; o que falhar
+    fica abaixo da marca d'água e é reenviado na próxima rodada. O Resumo
+    Mensal é acertado por uma terceira tarefa, a cada intervalo de
+    reconciliação, fora do caminho dos registros.
+    """
+
+    def __init__(self, intervalo_flush=config.FILA_INTERVALO_FLUSH, intervalo_retentativa=config.FILA_INTERVALO_RETENTATIVA,
+                 intervalo_reconciliacao=config.RESUMO_INTERVALO_RECONCILIACAO):
+        self.intervalo_flush = intervalo_flush
+        self.intervalo_retentativa = intervalo_retentativa
+        self.intervalo_reconciliacao = intervalo_reconciliacao
+        # Nos processos de trabalho só um processo replica; os demais só gravam e avisam
+        self.replicar = True
+        self.ao_gravar = None
+        self._fila = None
+        self._pendente = None
+        self._gravacao = None
+        self._sincronizacao = None
+        self._reconciliacao = None
+
+    def iniciar(self):
+        """Cria a fila e os workers no loop de eventos em execução."""
+        if self._gravacao is None or self._gravacao.done():
+            loop = asyncio.get_running_loop()
+            self._fila = self._fila or asyncio.Queue()
+            self._pendente = self._pendente or asyncio.Event()
+            # Replica o que tiver ficado pendente de uma execução anterior
+            self._pendente.set()
+            self._gravacao = loop.create_task(self._gravar_no_livro_caixa())
+            if self.replicar:
+                self._sincronizacao = loop.create_task(self._sincronizar_periodicamente())
+                if self.intervalo_reconciliacao > 0:
+                    self._reconciliacao = loop.create_task(self._reconciliar_periodicamente())
+
+    def avisar_pendente(self):
+        """Avisa que há transações novas no livro-caixa (gravadas por outro processo)."""
+        if self._pendente is not None:
+            self._pendente.set()
+
+    def enfileirar(self, valor, descricao, categoria, tipo='despesa', planilha=None, chat_id=None):
+        """Enfileira uma transação e retorna um Future com (id, transação) depois de gravada."""
+        self.iniciar()
+        futuro = asyncio.get_running_loop().create_future()
+        transacao = livro_caixa.nova_transacao(valor, descricao, categoria, tipo, planilha=planilha, chat_id=chat_id)
+        self._fila.put_nowait(Registro(transacao, futuro))
+        return futuro
+
+    async def _gravar_no_livro_caixa(self):
+        """Grava no livro-caixa tudo o que estiver na fila, em uma transação SQLite por vez."""
+        while True:
+            lote = [await self._fila.get()]
+            while not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+            encerrar = None in lote
+            registros = [registro for registro in lote if registro is not None]
+
+            if registros:
+                try:
+                    ids = await asyncio.to_thread(google_sheets.gravar_no_livro_caixa, [registro.transacao for registro in registros])
+                except Exception as e:
+                    logger.error(f"Erro ao gravar {len(registros)} registro(s) no livro-caixa: {str(e)}")
+                    for registro in registros:
+                        if not registro.futuro.done():
+                            registro.futuro.set_exception(e)
+                else:
+                    for registro, transacao_id in zip(registros, ids):
+                        if not registro.futuro.done():
+                            registro.futuro.set_result((transacao_id, registro.transacao))
+                    self._pendente.set()
+                    if self.ao_gravar is not None:
+                        self.ao_gravar()
+                    try:
+                        # O índice de busca acompanha cada lote gravado
+                        await asyncio.to_thread(busca.atualizar_indice)
+                    except Exception as e:
+                        logger.error(f"Erro ao atualizar o índice de busca: {str(e)}")
+
+            if encerrar:
+                return
+
+    async def _sincronizar_periodicamente(self):
+        """Replica o livro-caixa na planilha a cada lote novo ou no intervalo de retentativa."""
+        while True:
+            try:
+                await asyncio.wait_for(self._pendente.wait(), self.intervalo_retentativa)
+            except asyncio.TimeoutError:
+                pass
+            # Aguarda o intervalo de flush para juntar mais transações no mesmo append_rows
+            await asyncio.sleep(self.intervalo_flush)
+            self._pendente.clear()
+            await self.sincronizar()
+
+    async def sincronizar(self):
+        """Replica as transações pendentes sem bloquear o loop de eventos."""
+        if not self.replicar:
+            # Quem replica é outro processo: só avisa que há pendências
+            if self.ao_gravar is not None:
+                self.ao_gravar()
+            return
+        try:
+            replicadas = await asyncio.to_thread(google_sheets.sincronizar_livro_caixa)
+            if replicadas:
+                logger.info(f"{replicadas} transação(ões) replicada(s) na planilha")
+        except Exception as e:
+            logger.error(f"Erro ao replicar o livro-caixa na planilha: {str(e)}")
+
+    async def _reconciliar_periodicamente(self):
+        """Acerta o Resumo Mensal das planilhas com registros novos a cada intervalo de reconciliação."""
+        while True:
+            await asyncio.sleep(self.intervalo_reconciliacao)
+            await self.reconciliar()
+
+    async def reconciliar(self):
+        """Reconcilia o Resumo Mensal sem bloquear o loop de eventos."""
+        try:
+            corrigidas = await asyncio.to_thread(google_sheets.reconciliar_resumos)
+            if corrigidas:
+                logger.info(f"{corrigidas} linha(s) do resumo mensal acertada(s)")
+        except Exception as e:
+            logger.error(f"Erro ao reconciliar o resumo mensal: {str(e)}")
+
+    def tamanho_fila(self):
+        """Registros aguardando gravação no livro-caixa."""
+        return self._fila.qsize() if self._fila is not None else 0
+
+    async def encerrar(self):
+        """Grava o que ainda estiver na fila, faz uma última sincronização e para os workers."""
+        if self._gravacao is None or self._gravacao.done():
+            return
+        self._fila.put_nowait(None)
+        await self._gravacao
+        if self._sincronizacao is not None:
+            self._sincronizacao.cancel()
+            await self.sincronizar()
+        if self._reconciliacao is not None:
+            # Deixa o resumo em dia antes de sair
+            self._reconciliacao.cancel()
+            await self.reconciliar()
+        self._gravacao = None
+        self._sincronizacao = None
+        self._reconciliacao = None
+
+# Fila compartilhada pelos handlers do bot
+fila = FilaRegistros()
+
+def enfileirar(valor, descricao, categoria, tipo='despesa', planilha=None, chat_id=None):
+    """Enfileira uma transação na fila compartilhada (planilha None = planilha padrão)."""
+    return fila.enfileirar(valor, descricao, categoria, tipo, planilha, chat_id)
+
+async def iniciar(application=None):
+    """Inicia a fila compartilhada (usado no post_init do Application)."""
+    fila.iniciar()
+
+async def encerrar(application=None):
+    """Esvazia a fila compartilhada (usado no post_shutdown do Application)."""
+    await fila.encerrar()
+
+def configurar_sem_replicacao(ao_gravar):
+    """Faz a fila compartilhada só gravar no livro-caixa, chamando `ao_gravar` a cada lote gravado."""
+    fila.replicar = False
+    fila.ao_gravar = ao_gravar
+
+def avisar_pendente():
+    """Avisa a fila compartilhada de transações gravadas por outro processo."""
+    fila.avisar_pendente()
+
+async def sincronizar():
+    """Replica agora o que estiver pendente (usado após importações em massa)."""
+    await fila.sincronizar()
+
+async def confirmar_registro(futuro, bot, chat_id, descricao):
+    """Aguarda a gravação, avisa o usuário do resultado e confere o orçamento da categoria."""
+    try:
+        transacao_id, transacao = await futuro
+        await bot.send_message(chat_id, f'✅ {descricao} registrada com sucesso!')
+    except Exception as e:
+        await bot.send_message(chat_id, f'❌ Erro ao registrar {descricao}: {str(e)}')
+        return
+    await orcamentos.avisar_orcamento(bot, chat_id, transacao_id, transacao)
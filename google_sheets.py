@@ -1,43 +1,219 @@
 import gspread
+import requests
 from oauth2client.service_account import ServiceAccountCredentials
+from google.auth.transport.requests import Request
+from requests.adapters import HTTPAdapter
 import config
-from datetime import datetime
+import agregacao
+import agendador_sheets
+import livro_caixa
+import metricas
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
-def conectar_google_sheets():
-    """Estabelece a conexão com o Google Sheets usando a API e retorna o cliente."""
-    try:
-        print("🔄 Tentando conectar ao Google Sheets...")
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        print(f"📁 Usando arquivo de credenciais: {config.GOOGLE_SHEETS_CREDENTIALS}")
+class CacheLRU:
+    """Cache com limite de tamanho (descarta o menos usado) e validade por entrada."""
+
+    def __init__(self, tamanho, validade):
+        self.tamanho = tamanho
+        self.validade = validade
+        self._itens = OrderedDict()  # chave -> (valor, guardado_em)
+
+    def obter(self, chave):
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        valor, guardado_em = item
+        if time.monotonic() - guardado_em > self.validade:
+            del self._itens[chave]
+            return None
+        self._itens.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._itens[chave] = (valor, time.monotonic())
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.tamanho:
+            self._itens.popitem(last=False)
+
+    def limpar(self):
+        self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+class EstadoPlanilha:
+    """Estado em memória de uma planilha (um inquilino): totais do resumo, fim das abas e mapa do resumo."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.importado = False
+        # Totais do resumo mensal mantidos em memória e atualizados por delta
+        self.totais_mensais = None  # "MM/YYYY" -> {"receitas": float, "despesas": float}
+        self.ultima_linha = {}  # Nome da aba -> última linha com dados conhecida
+        # Linha de cada mês na aba Resumo Mensal, lida da coluna A e atualizada localmente
+        self.linhas_resumo = None  # "MM/YYYY" -> número da linha
+        self.total_linhas_resumo = 0
+        self.mapa_resumo_carregado_em = 0.0
+        # Resumo adiado: marcado a cada lote replicado e acertado pela reconciliação periódica
+        self.resumo_pendente = False
+        self.resumo_verificado_em = 0.0
+
+# Cliente compartilhado por todo o processo; planilhas e abas abertas ficam em cache LRU
+# (_lock_cliente só protege o cliente e os caches; as chamadas de rede ficam fora dele)
+_lock_cliente = threading.RLock()
+_cliente = None
+# Renovação do token: uma thread por vez, por uma sessão HTTP simples (sem autenticação) e só dela
+_lock_token = threading.Lock()
+_requisicao_token = None
+_planilhas = CacheLRU(config.SHEETS_CACHE_PLANILHAS, config.SHEETS_CACHE_VALIDADE)  # ID -> Spreadsheet
+_abas = CacheLRU(config.SHEETS_CACHE_PLANILHAS * 3, config.SHEETS_CACHE_VALIDADE)  # (ID, aba) -> Worksheet
+
+# Estado de cada planilha (inquilino)
+_lock_estados = threading.Lock()
+_estados = {}  # ID da planilha -> EstadoPlanilha
+
+# Impede que duas threads repliquem as mesmas linhas ao mesmo tempo
+_lock_sincronizacao = threading.Lock()
+
+# Nos processos de trabalho a importação inicial fica com o processo do webhook
+_importar_no_primeiro_uso = True
+
+# Formato de moeda aplicado às colunas de valores do resumo
+FORMATO_MOEDA = {
+    "numberFormat": {
+        "type": "CURRENCY",
+        "pattern": "R$#,##0.00"
+    }
+}
+
+def _criar_cliente():
+    """Autoriza uma única vez e prepara a sessão HTTP com pool de conexões."""
+    print("🔄 Tentando conectar ao Google Sheets...")
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    print(f"📁 Usando arquivo de credenciais: {config.GOOGLE_SHEETS_CREDENTIALS}")
+    with metricas.cronometrar(metricas.SHEETS_SEGUNDOS, operacao="conectar", tipo="autenticacao"):
         creds = ServiceAccountCredentials.from_json_keyfile_name(config.GOOGLE_SHEETS_CREDENTIALS, scope)
         client = gspread.authorize(creds)
-        print("✅ Conexão com Google Sheets estabelecida com sucesso!")
+    # A sessão já é keep-alive; só aumentamos o pool para as threads de escrita
+    adaptador = HTTPAdapter(
+        pool_connections=config.SHEETS_POOL_CONEXOES,
+        pool_maxsize=config.SHEETS_POOL_CONEXOES
+    )
+    client.session.mount("https://", adaptador)
+    print("✅ Conexão com Google Sheets estabelecida com sucesso!")
+    return client
+
+def _token_expirando(creds):
+    margem = timedelta(seconds=config.SHEETS_MARGEM_RENOVACAO_TOKEN)
+    return creds.token is None or creds.expiry is None or creds.expiry - datetime.utcnow() < margem
+
+def _renovar_token(client):
+    """Renova o token de acesso antes que ele expire.
+
+    A renovação não passa pela sessão autorizada do gspread (que tentaria
+    autenticar a própria chamada de renovação) e não segura _lock_cliente,
+    então as threads que só precisam de uma aba em cache não esperam por ela.
+    """
+    global _requisicao_token
+    creds = client.auth
+    if not _token_expirando(creds):
+        return
+    with _lock_token:
+        if not _token_expirando(creds):
+            # Outra thread renovou enquanto esta esperava
+            return
+        if _requisicao_token is None:
+            _requisicao_token = Request(requests.Session())
+        with metricas.cronometrar(metricas.SHEETS_SEGUNDOS, operacao="renovar_token", tipo="autenticacao"):
+            creds.refresh(_requisicao_token)
+
+def conectar_google_sheets():
+    """Retorna o cliente do Google Sheets compartilhado pelo processo."""
+    global _cliente
+    try:
+        with _lock_cliente:
+            if _cliente is None:
+                _cliente = _criar_cliente()
+            client = _cliente
+        _renovar_token(client)
         return client
     except Exception as e:
         print(f"❌ Erro ao conectar ao Google Sheets: {str(e)}")
         return None
 
-def obter_planilha(nome_aba):
-    """Obtém uma aba específica da planilha."""
+def limpar_cache_planilhas():
+    """Descarta o cliente e as abas em cache (ex.: após renomear uma aba)."""
+    global _cliente
+    with _lock_cliente:
+        _cliente = None
+        _planilhas.limpar()
+        _abas.limpar()
+
+def _estado(planilha=None):
+    """Retorna o estado em memória da planilha (a padrão quando None)."""
+    planilha = planilha or config.SHEET_NAME
+    with _lock_estados:
+        estado = _estados.get(planilha)
+        if estado is None:
+            estado = _estados[planilha] = EstadoPlanilha()
+        return estado
+
+def obter_planilha(nome_aba, planilha=None):
+    """Obtém uma aba da planilha (a padrão quando None), reaproveitando o handle em cache."""
+    planilha = planilha or config.SHEET_NAME
     try:
-        print(f"🔄 Tentando obter a aba '{nome_aba}'...")
+        # Também garante que o token em uso ainda está longe de expirar
         client = conectar_google_sheets()
         if client is None:
             return None
         
-        print(f"📊 Tentando abrir planilha com ID: {config.SHEET_NAME}")
-        spreadsheet = client.open_by_key(config.SHEET_NAME)
-        try:
-            worksheet = spreadsheet.worksheet(nome_aba)
-            print(f"✅ Aba '{nome_aba}' obtida com sucesso!")
+        chave = (planilha, nome_aba)
+        with _lock_cliente:
+            worksheet = _abas.obter(chave)
+            spreadsheet = _planilhas.obter(planilha) if worksheet is None else None
+        if worksheet is not None:
             return worksheet
+        
+        # As chamadas à API ficam fora do lock: uma planilha lenta não trava as abas já em cache
+        print(f"🔄 Tentando obter a aba '{nome_aba}'...")
+        if spreadsheet is None:
+            print(f"📊 Tentando abrir planilha com ID: {planilha}")
+            spreadsheet = agendador_sheets.leitura(client.open_by_key, planilha)
+            with _lock_cliente:
+                _planilhas.guardar(planilha, spreadsheet)
+        try:
+            worksheet = agendador_sheets.leitura(spreadsheet.worksheet, nome_aba)
         except gspread.exceptions.WorksheetNotFound:
             print(f"❌ Aba '{nome_aba}' não encontrada!")
             return None
+        with _lock_cliente:
+            _abas.guardar(chave, worksheet)
+        print(f"✅ Aba '{nome_aba}' obtida com sucesso!")
+        return worksheet
     except Exception as e:
         print(f"❌ Erro ao obter planilha: {str(e)}")
         return None
 
+def verificar_planilha(planilha):
+    """Confere se a conta de serviço abre a planilha e se ela tem as três abas do bot.
+
+    Retorna a lista de abas que faltam (vazia se está tudo certo).
+    """
+    return [
+        nome_aba
+        for nome_aba in (config.RECEITAS_SHEET_NAME, config.DESPESAS_SHEET_NAME, config.RESUMO_SHEET_NAME)
+        if obter_planilha(nome_aba, planilha) is None
+    ]
+
+def email_da_conta_de_servico():
+    """E-mail com o qual as planilhas precisam ser compartilhadas."""
+    client = conectar_google_sheets()
+    return getattr(client.auth, "service_account_email", None) if client else None
+
 def registrar_gasto():
     """Solicita os dados do usuário e registra um gasto na planilha."""
     sheet = obter_planilha(config.TRANSACOES_SHEET_NAME)
@@ -61,122 +237,382 @@ def registrar_gasto():
         return
     
     try:
-        sheet.append_row([data_atual, descricao, -abs(valor), categoria])
+        agendador_sheets.anexar(sheet.append_row, [data_atual, descricao, -abs(valor), categoria])
         print("\n✅ Gasto registrado com sucesso!")
         print(f"📝 Data: {data_atual}\n💰 Valor: R$ {valor:.2f}\n📌 Descrição: {descricao}\n📂 Categoria: {categoria}")
-        atualizar_resumo_mensal()
+        reconstruir_resumo_mensal()
     except Exception as e:
         print(f"❌ Erro ao registrar gasto: {e}")
 
-def obter_total_gastos():
-    """Calcula o total de gastos na planilha."""
-    sheet = obter_planilha(config.TRANSACOES_SHEET_NAME)
-    if sheet is None:
-        return 0
-    
+def obter_total_gastos(planilha=None):
+    """Calcula o total de gastos a partir do livro-caixa local."""
     try:
-        data = sheet.get_all_values()
-        total = sum(float(row[2]) for row in data[1:] if len(row) > 2 and row[2].replace('.', '', 1).isdigit())
-        print(f"\n💸 Total de gastos registrados: R$ {abs(total):.2f}")
-        return abs(total)
+        garantir_livro_caixa_importado(planilha)
+        total = livro_caixa.total_despesas(planilha)
+        print(f"\n💸 Total de gastos registrados: R$ {total:.2f}")
+        return total
     except Exception as e:
         print(f"❌ Erro ao calcular total de gastos: {e}")
         return 0
 
-def atualizar_resumo_mensal():
-    """Atualiza automaticamente o resumo mensal na aba 'Resumo Mensal'."""
-    transacoes_sheet = obter_planilha(config.TRANSACOES_SHEET_NAME)
-    resumo_sheet = obter_planilha(config.RESUMO_SHEET_NAME)
-    
-    if transacoes_sheet is None or resumo_sheet is None:
+def _tabela_resumo(resumo):
+    """Linhas Mês/Ano | Receitas | Despesas | Saldo, do mês mais recente para o mais antigo."""
+    meses_ordenados = sorted(resumo.keys(), key=lambda x: [int(i) for i in x.split("/")[::-1]], reverse=True)
+    return [
+        [mes, resumo[mes]["receitas"], resumo[mes]["despesas"], round(resumo[mes]["receitas"] - resumo[mes]["despesas"], 2)]
+        for mes in meses_ordenados
+    ]
+
+def _reescrever_resumo(resumo_sheet, tabela, planilha=None):
+    """Grava a tabela inteira no Resumo Mensal, ajustando o tamanho da aba e o formato de moeda."""
+    if not tabela:
+        agendador_sheets.escrita(resumo_sheet.batch_clear, ["A2:D"])
+        _definir_mapa_resumo(planilha, {}, 1)
         return
     
+    # Ajustar o tamanho da aba e formatar números como moeda em uma só requisição
+    ultima_linha = len(tabela) + 1
+    agendador_sheets.escrita(resumo_sheet.spreadsheet.batch_update, {"requests": [
+        {
+            "updateSheetProperties": {
+                "properties": {"sheetId": resumo_sheet.id, "gridProperties": {"rowCount": ultima_linha}},
+                "fields": "gridProperties.rowCount"
+            }
+        },
+        {
+            "repeatCell": {
+                "range": {
+                    "sheetId": resumo_sheet.id,
+                    "startRowIndex": 1,
+                    "endRowIndex": ultima_linha,
+                    "startColumnIndex": 1,
+                    "endColumnIndex": 4
+                },
+                "cell": {"userEnteredFormat": FORMATO_MOEDA},
+                "fields": "userEnteredFormat.numberFormat"
+            }
+        }
+    ]})
+    
+    # Gravar a tabela inteira de uma vez
+    agendador_sheets.escrita(resumo_sheet.update, f'A2:D{ultima_linha}', tabela)
+    _definir_mapa_resumo(planilha, {linha[0]: numero for numero, linha in enumerate(tabela, start=2)}, ultima_linha)
+
+def reconstruir_resumo_mensal(planilha=None):
+    """Reescreve a aba 'Resumo Mensal' inteira a partir do livro-caixa local.
+
+    A tabela é montada localmente e enviada com uma única escrita de valores,
+    precedida de uma única requisição que ajusta o tamanho da aba (descartando
+    apenas as linhas que sobrarem) e aplica a formatação de moeda.
+    """
+    resumo_sheet = obter_planilha(config.RESUMO_SHEET_NAME, planilha)
+    if resumo_sheet is None:
+        return False
+    
     try:
-        # Obter dados da planilha de transações
-        data = transacoes_sheet.get_all_values()[1:]  # Pula o cabeçalho
-        resumo = {}
-        
-        for row in data:
-            if len(row) < 4:
-                continue
-            
-            data_gasto, _, valor, categoria = row
-            try:
-                valor = float(valor)
-            except ValueError:
-                continue
-            
-            mes_ano = "/".join(data_gasto.split("/")[1:])  # Formato: MM/YYYY
-            if mes_ano not in resumo:
-                resumo[mes_ano] = {"receitas": 0, "despesas": 0}
-            
-            # Se o valor for positivo é receita, se for negativo é despesa
-            if valor > 0:
-                resumo[mes_ano]["receitas"] += valor
-            else:
-                resumo[mes_ano]["despesas"] += abs(valor)  # Usa valor absoluto para despesas
-        
-        # Limpar conteúdo existente mantendo o cabeçalho
-        if resumo_sheet.row_count > 1:
-            resumo_sheet.delete_rows(2, resumo_sheet.row_count)
-        
-        # Ordenar os meses em ordem cronológica reversa (mais recente primeiro)
-        meses_ordenados = sorted(resumo.keys(), key=lambda x: [int(i) for i in x.split("/")[::-1]], reverse=True)
-        
-        # Adicionar dados ordenados
-        for mes in meses_ordenados:
-            valores = resumo[mes]
-            saldo = valores["receitas"] - valores["despesas"]
-            resumo_sheet.append_row([
-                mes,
-                valores["receitas"],
-                valores["despesas"],
-                saldo
-            ])
-        
-        # Formatar células
-        if len(meses_ordenados) > 0:
-            ultima_linha = len(meses_ordenados) + 1
-            # Formatar números como moeda
-            resumo_sheet.format(f'B2:D{ultima_linha}', {
-                "numberFormat": {
-                    "type": "CURRENCY",
-                    "pattern": "R$#,##0.00"
-                }
-            })
+        with _estado(planilha).lock:
+            _reescrever_resumo(resumo_sheet, _tabela_resumo(reconstruir_totais_mensais(planilha)), planilha)
         
         print("\n📊 Resumo mensal atualizado com sucesso!")
+        return True
     except Exception as e:
         print(f"❌ Erro ao atualizar resumo mensal: {e}")
+        return False
+
+def _linha_confere(atual, esperada):
+    """Compara uma linha lida do Resumo Mensal com a calculada (valores com 2 casas)."""
+    atual = list(atual) + [""] * (4 - len(atual))
+    if str(atual[0]) != esperada[0]:
+        return False
+    return all(round(converter_valor(valor), 2) == round(alvo, 2) for valor, alvo in zip(atual[1:4], esperada[1:]))
 
-def registrar_gasto_telegram(valor, descricao, categoria, tipo='despesa'):
-    """Registra um gasto na planilha a partir de uma mensagem do Telegram."""
+def reconciliar_resumo_mensal(planilha=None):
+    """Confere o Resumo Mensal com os totais do livro-caixa e corrige o que divergir.
+
+    Uma leitura de A2:D. Se a coluna de meses bate com a calculada, só as
+    linhas com valores diferentes são reescritas em um batch_update; se faltam,
+    sobram ou mudaram de ordem meses, a aba é reescrita de uma vez (com o
+    formato de moeda aplicado uma única vez para todas as linhas).
+
+    Retorna o número de linhas corrigidas, ou None se não foi possível conferir.
+    """
+    resumo_sheet = obter_planilha(config.RESUMO_SHEET_NAME, planilha)
+    if resumo_sheet is None:
+        return None
+    
+    estado = _estado(planilha)
     try:
-        print(f"🔄 Tentando registrar {tipo} no Google Sheets...")
+        # Sem replicação em paralelo: os totais não podem andar durante a conferência
+        with _lock_sincronizacao, estado.lock:
+            estado.resumo_pendente = False
+            tabela = _tabela_resumo(reconstruir_totais_mensais(planilha))
+            atual = agendador_sheets.leitura(resumo_sheet.get, 'A2:D', value_render_option='UNFORMATTED_VALUE')
+            while atual and not any(str(valor) for valor in atual[-1]):
+                atual.pop()
+            estado.resumo_verificado_em = time.monotonic()
+            
+            if [str(linha[0]) if linha else "" for linha in atual] != [linha[0] for linha in tabela]:
+                _reescrever_resumo(resumo_sheet, tabela, planilha)
+                _marcar_resumo_pendente(planilha, False)
+                print(f"📊 Resumo mensal reescrito ({len(tabela)} meses)")
+                return len(tabela)
+            
+            divergentes = [
+                (numero, esperada)
+                for numero, (linha, esperada) in enumerate(zip(atual, tabela), start=2)
+                if not _linha_confere(linha, esperada)
+            ]
+            if divergentes:
+                agendador_sheets.escrita(resumo_sheet.batch_update, [
+                    {"range": f"A{numero}:D{numero}", "values": [esperada]} for numero, esperada in divergentes
+                ])
+                print(f"📊 Resumo mensal: {len(divergentes)} mês(es) corrigido(s)")
+            _definir_mapa_resumo(planilha, {linha[0]: numero for numero, linha in enumerate(tabela, start=2)}, len(tabela) + 1)
+            _marcar_resumo_pendente(planilha, False)
+            return len(divergentes)
+    except Exception as e:
+        # Tenta de novo na próxima rodada
+        _marcar_resumo_pendente(planilha, True)
+        invalidar_mapa_resumo(planilha)
+        print(f"❌ Erro ao reconciliar resumo mensal: {e}")
+        return None
+
+def _marcar_resumo_pendente(planilha, pendente):
+    """Marca (ou desmarca) o resumo da planilha para a reconciliação, também no livro-caixa.
+
+    A marca gravada sobrevive a um reinício entre a replicação e a reconciliação.
+    """
+    planilha = planilha or config.SHEET_NAME
+    _estado(planilha).resumo_pendente = pendente
+    livro_caixa.definir_metadado(f"resumo_pendente:{planilha}", "1" if pendente else "0")
+
+def reconciliar_resumos():
+    """Reconcilia o resumo das planilhas com registros desde a última rodada.
+
+    Além das planilhas já em memória, entram as que o livro-caixa aponta:
+    com transações ainda não replicadas ou com o resumo marcado como
+    pendente (ex.: por uma execução anterior que parou antes de reconciliar).
+    As planilhas sem registros novos também são conferidas, mas só a cada
+    RESUMO_INTERVALO_VERIFICACAO segundos, para pegar edições feitas à mão.
+    Retorna o número de linhas corrigidas.
+    """
+    agora = time.monotonic()
+    do_livro_caixa = set(livro_caixa.planilhas_com_pendentes()) | set(livro_caixa.planilhas_com_resumo_pendente())
+    for planilha in do_livro_caixa:
+        _estado(planilha)
+    with _lock_estados:
+        estados = list(_estados.items())
+    total = 0
+    for planilha, estado in estados:
+        if (estado.resumo_pendente or planilha in do_livro_caixa
+                or agora - estado.resumo_verificado_em >= config.RESUMO_INTERVALO_VERIFICACAO):
+            total += reconciliar_resumo_mensal(planilha) or 0
+    return total
+
+def aba_da_transacao(tipo):
+    """Retorna o nome da aba onde a transação deve ser registrada."""
+    return config.RECEITAS_SHEET_NAME if tipo == 'receita' else config.DESPESAS_SHEET_NAME
+
+def montar_linha_transacao(valor, descricao, categoria, tipo='despesa', data=None):
+    """Monta a linha Data | Descrição | Valor | Categoria de uma transação."""
+    # Formatar o valor (positivo para receitas, negativo para despesas)
+    valor_formatado = abs(valor) if tipo == 'receita' else -abs(valor)
+    data = data or datetime.now().strftime("%d/%m/%Y")
+    return [data, descricao, valor_formatado, categoria]
+
+def registrar_transacoes_em_lote(sheet_name, linhas, planilha=None):
+    """Registra várias linhas de uma vez na aba com uma única chamada append_rows."""
+    sheet = obter_planilha(sheet_name, planilha)
+    if sheet is None:
+        raise Exception(f"Não foi possível acessar a aba '{sheet_name}'")
+    
+    print(f"📊 Registrando {len(linhas)} linha(s) na planilha: {sheet_name}")
+    try:
+        return agendador_sheets.anexar(sheet.append_rows, linhas)
+    except Exception as e:
+        # Um 5xx ou uma conexão perdida não dizem se o Google gravou: confere o fim da aba
+        if not agendador_sheets.falha_ambigua(e) or not _lote_ja_anexado(sheet, linhas):
+            raise
+        print(f"♻️ O append falhou ({str(e)[:80]}), mas as linhas já estão na aba '{sheet_name}'")
+        return None
+
+def _lote_ja_anexado(sheet, linhas):
+    """Confere se as últimas linhas da aba são as do lote (data e descrição)."""
+    total = len(agendador_sheets.leitura(sheet.col_values, 1))
+    if total <= len(linhas):
+        return False
+    ultimas = agendador_sheets.leitura(sheet.get, f"A{total - len(linhas) + 1}:B{total}")
+    return [(list(linha) + ["", ""])[:2] for linha in ultimas] == [[str(linha[0]), str(linha[1])] for linha in linhas]
+
+def _linha_do_livro_caixa(data_iso, descricao, valor_centavos, categoria):
+    """Converte uma transação do livro-caixa para a linha da planilha."""
+    ano, mes, dia = data_iso.split("-")
+    return [f"{dia}/{mes}/{ano}", descricao, valor_centavos / 100, categoria]
+
+def _chave_importacao(planilha):
+    planilha = planilha or config.SHEET_NAME
+    # A planilha padrão mantém a chave de antes do suporte a várias planilhas
+    return "importado_da_planilha" if planilha == config.SHEET_NAME else f"importado_da_planilha:{planilha}"
+
+def configurar_sem_importacao():
+    """Faz este processo nunca ler a planilha por conta própria para a importação inicial.
+
+    Usado nos processos de trabalho: o processo do webhook importa as
+    planilhas conhecidas antes de iniciá-los (`importar_planilhas_conhecidas`)
+    e uma planilha nova só é lida ao ser vinculada pelo /planilha.
+    """
+    global _importar_no_primeiro_uso
+    _importar_no_primeiro_uso = False
+
+def garantir_livro_caixa_importado(planilha=None, vinculando=False):
+    """No primeiro uso da planilha, copia para o livro-caixa as linhas que já estão nela.
+
+    Com `configurar_sem_importacao`, só lê a planilha quando `vinculando`;
+    fora isso, uma planilha ainda não importada levanta exceção.
+    """
+    estado = _estado(planilha)
+    if estado.importado:
+        return
+    with estado.lock:
+        if livro_caixa.obter_metadado(_chave_importacao(planilha)):
+            estado.importado = True
+            return
+        if not _importar_no_primeiro_uso and not vinculando:
+            raise Exception(
+                f"A planilha {planilha or config.SHEET_NAME} ainda não foi importada para o livro-caixa; "
+                "envie /planilha <ID> para importá-la"
+            )
+        print("🔄 Importando transações existentes da planilha para o livro-caixa...")
+        transacoes = []
+        contagem = {}
+        for tipo in ('receita', 'despesa'):
+            nome_aba = aba_da_transacao(tipo)
+            aba = obter_planilha(nome_aba, planilha)
+            if aba is None:
+                raise Exception(f"Não foi possível acessar a aba '{nome_aba}'")
+            
+            valores = agendador_sheets.leitura(aba.get_all_values)
+            contagem[nome_aba] = len(transacoes)
+            for linha in valores[1:]:  # Pula o cabeçalho
+                if len(linha) < 4:
+                    continue
+                try:
+                    data = datetime.strptime(linha[0], "%d/%m/%Y")
+                except ValueError:
+                    continue
+                transacoes.append(livro_caixa.nova_transacao(converter_valor(linha[2]), linha[1], linha[3], tipo, data, planilha))
+            contagem[nome_aba] = len(transacoes) - contagem[nome_aba]
+            estado.ultima_linha[nome_aba] = len(valores)
+        # Já estão na planilha: entram marcadas como sincronizadas, junto com a marca de importação
+        # (se outro processo importou antes, nada é gravado)
+        if livro_caixa.importar_da_planilha(transacoes, _chave_importacao(planilha)):
+            for nome_aba, quantidade in contagem.items():
+                print(f"✅ {quantidade} linha(s) importadas da aba '{nome_aba}'")
+        estado.importado = True
+
+def importar_planilhas_conhecidas():
+    """Importa de uma vez as planilhas conhecidas (antes de iniciar os processos de trabalho)."""
+    for planilha in livro_caixa.planilhas_conhecidas():
+        try:
+            garantir_livro_caixa_importado(planilha)
+        except Exception as e:
+            print(f"❌ Erro ao importar a planilha {planilha}: {str(e)}")
+
+def gravar_no_livro_caixa(transacoes):
+    """Grava transações novas no livro-caixa, importando a planilha antes se preciso.
+
+    A importação precisa vir primeiro: as linhas importadas entram como já
+    sincronizadas e a marca d'água não pode passar por cima de transações novas.
+    """
+    for planilha in {transacao[5] for transacao in transacoes}:
+        garantir_livro_caixa_importado(planilha)
+    return livro_caixa.inserir_transacoes(transacoes)
+
+def sincronizar_livro_caixa():
+    """Replica na planilha de cada inquilino, em lotes, as transações ainda não sincronizadas.
+
+    Retorna o número de linhas replicadas.
+    """
+    total = 0
+    for planilha in livro_caixa.planilhas_com_pendentes():
+        try:
+            total += sincronizar_planilha(planilha)
+        except Exception as e:
+            # Uma planilha inacessível não impede as demais; fica pendente para a próxima rodada
+            print(f"❌ Erro ao replicar na planilha {planilha}: {str(e)}")
+    return total
+
+def sincronizar_planilha(planilha=None):
+    """Replica em uma planilha, em lotes, as transações do livro-caixa ainda não sincronizadas.
+
+    Antes de cada lote espera haver cota de escrita, para que o que chegar
+    nesse meio-tempo vá no mesmo append_rows; com a cota no fim, os lotes
+    crescem. Com mais de um lote pendente (importação de extrato, planilha
+    fora do ar por um tempo) entra em modo em massa: lotes maiores e o Resumo
+    Mensal reconstruído uma única vez no final em vez de a cada lote.
+
+    Com RESUMO_INTERVALO_RECONCILIACAO > 0 o registro só anexa as linhas: o
+    Resumo Mensal fica marcado como pendente e é acertado por
+    `reconciliar_resumos`, fora do caminho de quem registrou.
+
+    Retorna o número de linhas replicadas.
+    """
+    garantir_livro_caixa_importado(planilha)
+    adiar_resumo = config.RESUMO_INTERVALO_RECONCILIACAO > 0
+    total = 0
+    with _lock_sincronizacao:
+        em_massa = livro_caixa.contar_pendentes(planilha) > config.FILA_TAMANHO_LOTE
+        for tipo in ('receita', 'despesa'):
+            nome_aba = aba_da_transacao(tipo)
+            while True:
+                agendador_sheets.agendador.aguardar_escrita()
+                if em_massa or agendador_sheets.agendador.escrita_apertada():
+                    tamanho_lote = config.IMPORTACAO_TAMANHO_LOTE
+                else:
+                    tamanho_lote = config.FILA_TAMANHO_LOTE
+                pendentes = livro_caixa.pendentes(tipo, tamanho_lote, planilha)
+                if not pendentes:
+                    break
+                linhas = [_linha_do_livro_caixa(*transacao[1:]) for transacao in pendentes]
+                resposta = registrar_transacoes_em_lote(nome_aba, linhas, planilha)
+                livro_caixa.marcar_sincronizado(nome_aba, pendentes[-1][0], planilha)
+                if em_massa or adiar_resumo:
+                    _avancar_ultima_linha(nome_aba, linhas, resposta, planilha)
+                else:
+                    # As linhas já estão salvas; uma falha no resumo não desfaz o registro
+                    atualizar_resumo_com_linhas(tipo, linhas, resposta, planilha)
+                total += len(linhas)
+                if len(pendentes) < tamanho_lote:
+                    break
+        if total and adiar_resumo:
+            _marcar_resumo_pendente(planilha, True)
+        elif em_massa and total:
+            reconstruir_resumo_mensal(planilha)
+    return total
+
+def _avancar_ultima_linha(nome_aba, linhas, resposta, planilha=None):
+    """Acompanha o fim da aba durante a sincronização em massa (sem atualizar o resumo)."""
+    estado = _estado(planilha)
+    with estado.lock:
+        esperado = estado.ultima_linha.get(nome_aba)
+        intervalo = _linhas_do_intervalo(resposta)
+        quantidade = len(linhas)
+        if intervalo is not None:
+            estado.ultima_linha[nome_aba] = intervalo[1]
+        elif esperado is not None:
+            estado.ultima_linha[nome_aba] = esperado + quantidade
+
+def registrar_gasto_telegram(valor, descricao, categoria, tipo='despesa', planilha=None):
+    """Registra um gasto no livro-caixa e o replica na planilha (a padrão quando None)."""
+    try:
+        print(f"🔄 Tentando registrar {tipo}...")
         print(f"💰 Valor: {valor}")
         print(f"📝 Descrição: {descricao}")
         print(f"📂 Categoria: {categoria}")
         
-        # Conectar ao Google Sheets
-        client = conectar_google_sheets()
-        if client is None:
-            raise Exception("Não foi possível conectar ao Google Sheets")
-        
-        # Abrir a planilha correta baseado no tipo
-        sheet_name = config.RECEITAS_SHEET_NAME if tipo == 'receita' else config.DESPESAS_SHEET_NAME
-        sheet = obter_planilha(sheet_name)
-        if sheet is None:
-            raise Exception(f"Não foi possível acessar a aba '{sheet_name}'")
-        
-        # Formatar o valor (positivo para receitas, negativo para despesas)
-        valor_formatado = abs(valor) if tipo == 'receita' else -abs(valor)
-        
-        # Obter a data atual
-        data_atual = datetime.now().strftime("%d/%m/%Y")
-        
-        # Registrar na planilha
-        print(f"📊 Registrando na planilha: {sheet_name}")
-        sheet.append_row([data_atual, descricao, valor_formatado, categoria])
+        # O livro-caixa local é a fonte da verdade; a planilha é o espelho
+        gravar_no_livro_caixa([livro_caixa.nova_transacao(valor, descricao, categoria, tipo, planilha=planilha)])
+        sincronizar_planilha(planilha)
         
         print("✅ Registro concluído com sucesso!")
         return True
@@ -185,91 +621,169 @@ def registrar_gasto_telegram(valor, descricao, categoria, tipo='despesa'):
         print(f"❌ Erro ao registrar {tipo}: {str(e)}")
         raise
 
-def atualizar_resumo_mensal(valor, categoria, tipo):
-    """Atualiza o resumo mensal com a nova transação."""
+def converter_valor(valor_str):
+    """Converte um valor da planilha (número ou moeda formatada) em float."""
+    if isinstance(valor_str, (int, float)):
+        return float(valor_str)
+    valor_str = str(valor_str).replace('R$', '').replace(' ', '')
+    if ',' in valor_str:
+        # Formato brasileiro: 1.234,56
+        valor_str = valor_str.replace('.', '').replace(',', '.')
     try:
-        sheet = obter_planilha(config.RESUMO_SHEET_NAME)
-        if sheet is None:
-            return False
-        
-        # Obtém o mês e ano atual
-        data_atual = datetime.now()
-        mes_ano = data_atual.strftime("%m/%Y")
-        
-        # Procura a linha do mês atual
-        celula = sheet.find(mes_ano)
-        if celula is None:
-            # Se não encontrar, cria uma nova linha
-            linha = [mes_ano, 0, 0, 0]  # [Mês/Ano, Total Receitas, Total Despesas, Saldo]
-            sheet.append_row(linha)
-            celula = sheet.find(mes_ano)
-        
-        linha = celula.row
-        
-        # Função auxiliar para converter valor formatado em moeda para float
-        def converter_valor(valor_str):
-            if isinstance(valor_str, (int, float)):
-                return float(valor_str)
-            # Remove R$, espaços e troca vírgula por ponto
-            valor_str = str(valor_str).replace('R$', '').replace(' ', '').replace('.', '').replace(',', '.')
-            try:
-                return float(valor_str)
-            except ValueError:
-                return 0.0
-
-        # Função para somar valores do mês atual
-        def somar_valores_do_mes(sheet_name):
-            try:
-                aba = obter_planilha(sheet_name)
-                if aba is None:
-                    return 0
-                
-                # Pega todos os valores
-                valores = aba.get_all_values()
-                if len(valores) <= 1:  # Se só tem cabeçalho ou está vazia
-                    return 0
-                
-                total = 0
-                mes_atual = data_atual.strftime("%m/%Y")
-                
-                # Soma apenas os valores do mês atual
-                for linha in valores[1:]:  # Pula o cabeçalho
-                    try:
-                        data_linha = datetime.strptime(linha[0], "%d/%m/%Y")
-                        if data_linha.strftime("%m/%Y") == mes_atual:
-                            valor_linha = converter_valor(linha[3])  # Coluna do valor
-                            total += valor_linha
-                    except (ValueError, IndexError):
-                        continue
-                
-                return total
-            except Exception as e:
-                print(f"Erro ao somar valores: {str(e)}")
-                return 0
+        return float(valor_str)
+    except ValueError:
+        return 0.0
+
+def mes_ano_da_data(data_str):
+    """Extrai o MM/YYYY de uma data DD/MM/YYYY sem passar pelo strptime."""
+    partes = str(data_str).split("/")
+    if len(partes) != 3 or not partes[1].isdigit() or not partes[2].isdigit():
+        return None
+    return f"{int(partes[1]):02d}/{partes[2]}"
+
+def _linhas_do_intervalo(resposta):
+    """Retorna (primeira, última) linha escrita a partir da resposta de um append."""
+    try:
+        intervalo = resposta["updates"]["updatedRange"]
+    except (KeyError, TypeError):
+        return None
+    encontrado = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$", intervalo.replace("$", ""))
+    if encontrado is None:
+        return None
+    primeira = int(encontrado.group(1))
+    return primeira, int(encontrado.group(2) or primeira)
+
+def reconstruir_totais_mensais(planilha=None):
+    """Recalcula do zero os totais mensais a partir do livro-caixa local.
+
+    Só entram as transações já replicadas na planilha, para que os totais
+    continuem batendo com o que as abas mostram.
+    """
+    estado = _estado(planilha)
+    with estado.lock:
+        garantir_livro_caixa_importado(planilha)
+        totais = agregacao.TabelaTransacoes.do_livro_caixa(somente_sincronizadas=True, planilha=planilha).por_mes()
+        estado.totais_mensais = totais
+        print(f"📊 Totais mensais reconstruídos ({len(totais)} meses)")
+        return totais
+
+def _aplicar_linhas_nos_totais(tipo, linhas, resposta, planilha=None):
+    """Aplica as linhas recém-gravadas como delta; reconstrói se detectar divergência.
+
+    Retorna os meses afetados.
+    """
+    nome_aba = aba_da_transacao(tipo)
+    chave = 'receitas' if tipo == 'receita' else 'despesas'
+    meses = {mes_ano_da_data(linha[0]) for linha in linhas} - {None}
+    estado = _estado(planilha)
+    with estado.lock:
+        esperado = estado.ultima_linha.get(nome_aba)
+        intervalo = _linhas_do_intervalo(resposta)
+        if intervalo is None and esperado is not None:
+            # Sem a resposta do append, assume que as linhas foram para o fim da aba
+            intervalo = (esperado + 1, esperado + len(linhas))
+        if estado.totais_mensais is None or intervalo is None or esperado is None or intervalo[0] != esperado + 1:
+            # Primeira carga ou a aba mudou por fora do bot (linhas inseridas/apagadas à mão)
+            if estado.totais_mensais is not None:
+                print(f"⚠️ Divergência detectada na aba '{nome_aba}', reconstruindo totais...")
+            reconstruir_totais_mensais(planilha)
+            if intervalo is not None:
+                estado.ultima_linha[nome_aba] = intervalo[1]
+            return meses
         
-        # Atualiza os totais
-        if tipo == 'receita':
-            total_receitas = somar_valores_do_mes(config.RECEITAS_SHEET_NAME)
-            sheet.update_cell(linha, 2, total_receitas)
-        elif tipo == 'despesa':
-            total_despesas = somar_valores_do_mes(config.DESPESAS_SHEET_NAME)
-            sheet.update_cell(linha, 3, total_despesas)
+        for linha in linhas:
+            mes_ano = mes_ano_da_data(linha[0])
+            if mes_ano is None:
+                continue
+            mes = estado.totais_mensais.setdefault(mes_ano, {"receitas": 0.0, "despesas": 0.0})
+            mes[chave] = round(mes[chave] + abs(converter_valor(linha[2])), 2)
+        estado.ultima_linha[nome_aba] = intervalo[1]
+        return meses
+
+def _definir_mapa_resumo(planilha, linhas, total_linhas):
+    estado = _estado(planilha)
+    with estado.lock:
+        estado.linhas_resumo = linhas
+        estado.total_linhas_resumo = total_linhas
+        estado.mapa_resumo_carregado_em = time.monotonic()
+
+def invalidar_mapa_resumo(planilha=None):
+    """Descarta o mapa mês -> linha do Resumo Mensal; a próxima atualização relê a coluna A."""
+    estado = _estado(planilha)
+    with estado.lock:
+        estado.linhas_resumo = None
+
+def _mapa_resumo(sheet, planilha=None):
+    """Retorna o mapa mês -> linha do Resumo Mensal, relendo a coluna A se preciso."""
+    estado = _estado(planilha)
+    with estado.lock:
+        if estado.linhas_resumo is None or time.monotonic() - estado.mapa_resumo_carregado_em > config.RESUMO_VALIDADE_MAPA:
+            coluna = agendador_sheets.leitura(sheet.col_values, 1)
+            _definir_mapa_resumo(
+                planilha,
+                {valor: numero for numero, valor in enumerate(coluna, start=1) if numero > 1 and valor},
+                len(coluna)
+            )
+        return estado.linhas_resumo
+
+def _linha_resumo(mes_ano, planilha=None):
+    valores = _estado(planilha).totais_mensais.get(mes_ano, {"receitas": 0.0, "despesas": 0.0})
+    return [mes_ano, valores["receitas"], valores["despesas"], round(valores["receitas"] - valores["despesas"], 2)]
+
+def atualizar_resumo_com_linhas(tipo, linhas, resposta=None, planilha=None):
+    """Atualiza o Resumo Mensal com as linhas recém-gravadas, sem reler as abas.
+
+    As linhas de cada mês vêm de um mapa em memória (sem `find`): meses novos
+    entram com um único append_rows e os já existentes são reescritos com um
+    único batch_update.
+    """
+    estado = _estado(planilha)
+    try:
+        meses = _aplicar_linhas_nos_totais(tipo, linhas, resposta, planilha)
+        if not meses:
+            return True
         
-        # Atualiza o saldo (Receitas - Despesas)
-        total_receitas = converter_valor(sheet.cell(linha, 2).value)
-        total_despesas = converter_valor(sheet.cell(linha, 3).value)
-        saldo = total_receitas - total_despesas
-        sheet.update_cell(linha, 4, saldo)
+        sheet = obter_planilha(config.RESUMO_SHEET_NAME, planilha)
+        if sheet is None:
+            return False
         
-        # Formata as células como moeda
-        sheet.format(f'B{linha}:D{linha}', {
-            "numberFormat": {
-                "type": "CURRENCY",
-                "pattern": "R$#,##0.00"
-            }
-        })
+        with estado.lock:
+            mapa = _mapa_resumo(sheet, planilha)
+            novos = [mes_ano for mes_ano in sorted(meses) if mes_ano not in mapa]
+            existentes = [mes_ano for mes_ano in sorted(meses) if mes_ano in mapa]
+            
+            if novos:
+                # Meses que ainda não têm linha entram já com os totais
+                intervalo = _linhas_do_intervalo(agendador_sheets.anexar(
+                    sheet.append_rows, [_linha_resumo(mes_ano, planilha) for mes_ano in novos]
+                ))
+                if intervalo is None or intervalo[0] != estado.total_linhas_resumo + 1:
+                    # A aba mudou de tamanho por fora do bot: relê a coluna A
+                    invalidar_mapa_resumo(planilha)
+                    mapa = _mapa_resumo(sheet, planilha)
+                else:
+                    for numero, mes_ano in enumerate(novos, start=intervalo[0]):
+                        mapa[mes_ano] = numero
+                    estado.total_linhas_resumo = intervalo[1]
+                # Formata como moeda só as linhas novas
+                linhas_novas = [mapa[mes_ano] for mes_ano in novos if mes_ano in mapa]
+                if linhas_novas:
+                    agendador_sheets.escrita(sheet.format, f'B{min(linhas_novas)}:D{max(linhas_novas)}', FORMATO_MOEDA)
+            
+            if existentes:
+                # Reescreve também o mês na coluna A, para a linha continuar coerente
+                agendador_sheets.escrita(sheet.batch_update, [
+                    {"range": f"A{mapa[mes_ano]}:D{mapa[mes_ano]}", "values": [_linha_resumo(mes_ano, planilha)]}
+                    for mes_ano in existentes
+                ])
         
         return True
     except Exception as e:
+        invalidar_mapa_resumo(planilha)
         print(f"❌ Erro ao atualizar resumo mensal: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def atualizar_resumo_mensal(valor, categoria, tipo, data=None, planilha=None):
+    """Atualiza o resumo mensal com uma nova transação já registrada."""
+    linha = montar_linha_transacao(valor, '', categoria, tipo, data)
+    return atualizar_resumo_com_linhas(tipo, [linha], planilha=planilha)
@@ -0,0 +1,189 @@
+import asyncio
+import calendar
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from telegram import Update
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+import config
+import metricas
+import planilhas
+import relatorios
+
+logger = logging.getLogger(__name__)
+
+GRAFICO_SEGUNDOS = metricas.registro.histograma(
+    "bot_grafico_renderizacao_segundos", "Tempo para renderizar um gráfico no pool de processos"
+)
+GRAFICO_CACHE = metricas.registro.contador(
+    "bot_grafico_cache_total", "Pedidos de gráfico atendidos pelo file_id em cache ou renderizados", ("resultado",)
+)
+
+def dados_do_grafico(tabela, quantidade_meses, hoje=None):
+    """Extrai da tabela de transações só o que o gráfico desenha (serializável e estável para o hash)."""
+    hoje = hoje or datetime.now()
+    mes = hoje.strftime("%Y-%m")
+    fim = date(hoje.year, hoje.month, calendar.monthrange(hoje.year, hoje.month)[1])
+    totais_por_mes = tabela.totais_por_mes()
+    meses = []
+    for _ in range(quantidade_meses):
+        totais = totais_por_mes.get(mes, {"receita": 0, "despesa": 0})
+        meses.append([relatorios.rotulo_do_mes(mes), totais["receita"], totais["despesa"]])
+        inicio = mes
+        mes = relatorios.mes_anterior(mes)
+    meses.reverse()
+    # Despesas por categoria somadas no intervalo todo de uma vez
+    despesas_por_categoria = tabela.filtrar(date.fromisoformat(f"{inicio}-01"), fim).por_categoria('despesa')
+    return {
+        "meses": meses,
+        "categorias": sorted(despesas_por_categoria.items(), key=lambda item: (-item[1], item[0])),
+    }
+
+def chave_do_grafico(dados):
+    """Hash dos dados desenhados: mesmos totais, mesma imagem."""
+    texto = json.dumps(dados, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def renderizar(dados):
+    """Desenha receitas x despesas por mês e a pizza de despesas por categoria; retorna o PNG.
+
+    Roda nos processos do pool, por isso importa o matplotlib aqui dentro.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rotulos = [mes for mes, _, _ in dados["meses"]]
+    receitas = [receita / 100 for _, receita, _ in dados["meses"]]
+    despesas = [despesa / 100 for _, _, despesa in dados["meses"]]
+
+    figura, (barras, pizza) = plt.subplots(1, 2, figsize=(12, 5))
+    try:
+        posicoes = range(len(rotulos))
+        barras.bar([p - 0.2 for p in posicoes], receitas, width=0.4, label="Receitas", color="#2e7d32")
+        barras.bar([p + 0.2 for p in posicoes], despesas, width=0.4, label="Despesas", color="#c62828")
+        barras.set_xticks(list(posicoes))
+        barras.set_xticklabels(rotulos, rotation=45, ha="right")
+        barras.set_ylabel("R$")
+        barras.set_title("Receitas x Despesas")
+        barras.legend()
+
+        categorias = dados["categorias"]
+        if len(categorias) > config.GRAFICO_MAXIMO_FATIAS:
+            # As menores viram uma fatia só, para a pizza continuar legível
+            resto = sum(centavos for _, centavos in categorias[config.GRAFICO_MAXIMO_FATIAS - 1:])
+            categorias = categorias[:config.GRAFICO_MAXIMO_FATIAS - 1] + [("Demais", resto)]
+        if categorias:
+            pizza.pie([centavos for _, centavos in categorias], labels=[nome for nome, _ in categorias],
+                      autopct="%1.0f%%", startangle=90, counterclock=False)
+        else:
+            pizza.text(0.5, 0.5, "Sem despesas no período", ha="center", va="center")
+            pizza.set_axis_off()
+        pizza.set_title("Despesas por categoria")
+
+        figura.tight_layout()
+        saida = io.BytesIO()
+        figura.savefig(saida, format="png", dpi=100)
+        return saida.getvalue()
+    finally:
+        plt.close(figura)
+
+class CacheArquivos:
+    """Últimos file_id enviados ao Telegram, por hash dos dados do gráfico (LRU)."""
+
+    def __init__(self, tamanho=config.GRAFICO_CACHE_TAMANHO):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            file_id = self._itens.get(chave)
+            if file_id is not None:
+                self._itens.move_to_end(chave)
+            return file_id
+
+    def guardar(self, chave, file_id):
+        with self._lock:
+            self._itens[chave] = file_id
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def descartar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+# file_id já enviados, compartilhados pelos chats do processo
+arquivos = CacheArquivos()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obter_pool():
+    """Cria o pool de renderização na primeira vez que um gráfico é pedido."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=config.GRAFICO_PROCESSOS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+async def gerar_png(dados):
+    """Renderiza no pool, sem ocupar o loop do asyncio."""
+    loop = asyncio.get_running_loop()
+    with metricas.cronometrar(GRAFICO_SEGUNDOS):
+        return await loop.run_in_executor(_obter_pool(), renderizar, dados)
+
+def encerrar():
+    """Fecha o pool de renderização (se chegou a ser criado)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+@metricas.medir_handler
+async def comando_grafico(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Gráfico de receitas x despesas e despesas por categoria: /grafico [meses]."""
+    try:
+        quantidade = int(context.args[0]) if context.args else config.RELATORIO_MESES
+        if not 1 <= quantidade <= config.RELATORIO_MAXIMO_MESES:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(f'❌ Use: /grafico ou /grafico <meses> (de 1 a {config.RELATORIO_MAXIMO_MESES})')
+        return
+
+    legenda = f'📈 Últimos {quantidade} mês(es)'
+    try:
+        tabela = await asyncio.to_thread(relatorios.cache.obter, planilhas.planilha_do_chat(update.effective_chat.id))
+        dados = dados_do_grafico(tabela, quantidade)
+        chave = chave_do_grafico(dados)
+
+        file_id = arquivos.obter(chave)
+        if file_id is not None:
+            try:
+                await update.message.reply_photo(photo=file_id, caption=legenda)
+                GRAFICO_CACHE.inc(resultado="cache")
+                return
+            except BadRequest:
+                # file_id não vale mais (ex.: outro bot token); desenha de novo
+                arquivos.descartar(chave)
+
+        await update.message.reply_text('⏳ Gerando gráfico...')
+        png = await gerar_png(dados)
+        mensagem = await update.message.reply_photo(photo=png, caption=legenda)
+        GRAFICO_CACHE.inc(resultado="renderizado")
+        if mensagem.photo:
+            arquivos.guardar(chave, mensagem.photo[-1].file_id)
+    except Exception as e:
+        logger.error(f"Erro ao gerar gráfico: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao gerar gráfico: {str(e)}')
@@ -0,0 +1,304 @@
+import asyncio
+import codecs
+import csv
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from telegram import Update
+from telegram.ext import ContextTypes
+import config
+import fila_registros
+import google_sheets
+import livro_caixa
+import metricas
+import orcamentos
+import planilhas
+from texto import normalizar
+
+logger = logging.getLogger(__name__)
+
+# Categoria usada quando o extrato não traz uma
+CATEGORIA_PADRAO = {'despesa': 'Outros', 'receita': 'Outros Ganhos'}
+
+# Nomes de coluna reconhecidos no cabeçalho do CSV (já normalizados)
+COLUNAS = {
+    'data': {'data', 'date', 'dt', 'data lancamento', 'data do lancamento', 'data movimento'},
+    'descricao': {'descricao', 'historico', 'lancamento', 'title', 'titulo', 'description', 'memo', 'estabelecimento'},
+    'valor': {'valor', 'amount', 'value', 'quantia', 'valor (r$)', 'valor r$'},
+    'categoria': {'categoria', 'category'},
+}
+
+FORMATOS_DATA = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%d.%m.%Y")
+
+# Tags do OFX (SGML ou XML): "<TAG>valor" com ou sem fechamento
+PADRAO_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+TAMANHO_BLOCO = 64 * 1024
+
+class LinhaInvalida(ValueError):
+    """Linha do extrato que não pôde ser convertida em transação."""
+
+def converter_valor_extrato(texto):
+    """Converte valores de extrato: R$ 1.234,56 / -1,234.56 / (50,00) / 1234."""
+    texto = texto.strip().replace("R$", "").replace(" ", "").replace("\xa0", "")
+    negativo = texto.startswith("(") and texto.endswith(")")
+    texto = texto.strip("()")
+    if "," in texto and "." in texto:
+        # O separador que aparece por último é o decimal
+        if texto.rfind(",") > texto.rfind("."):
+            texto = texto.replace(".", "").replace(",", ".")
+        else:
+            texto = texto.replace(",", "")
+    elif "," in texto:
+        texto = texto.replace(",", ".")
+    elif re.fullmatch(r"[+-]?\d{1,3}(?:\.\d{3})+", texto):
+        texto = texto.replace(".", "")
+    try:
+        valor = float(texto)
+    except ValueError:
+        raise LinhaInvalida(f"valor inválido: {texto!r}")
+    return -abs(valor) if negativo else valor
+
+def converter_data_extrato(texto):
+    texto = texto.strip()
+    if re.fullmatch(r"\d{8}.*", texto):
+        # OFX: AAAAMMDD[HHMMSS[.XXX][-3:BRT]]
+        texto = texto[:8]
+        return datetime.strptime(texto, "%Y%m%d")
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise LinhaInvalida(f"data inválida: {texto!r}")
+
+def _abrir_texto(caminho):
+    """Abre o arquivo como texto em streaming, detectando UTF-8 ou Windows-1252 pelo início."""
+    with open(caminho, "rb") as arquivo:
+        inicio = arquivo.read(TAMANHO_BLOCO)
+    try:
+        # Ignora um possível caractere cortado no fim do bloco
+        codecs.getincrementaldecoder("utf-8-sig")().decode(inicio, final=False)
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "cp1252"
+    return open(caminho, "r", encoding=codificacao, errors="replace", newline="")
+
+def ler_csv(caminho):
+    """Gera (data, descricao, valor, categoria, identificador) linha a linha de um CSV.
+
+    O delimitador é detectado no primeiro bloco. Sem cabeçalho reconhecido,
+    assume a ordem das abas: Data | Descrição | Valor | Categoria.
+    """
+    with _abrir_texto(caminho) as arquivo:
+        amostra = arquivo.read(TAMANHO_BLOCO)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t|")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(arquivo, dialeto)
+
+        primeira = next(leitor, None)
+        if primeira is None:
+            return
+        indices = {}
+        for indice, nome in enumerate(primeira):
+            nome = normalizar(nome.strip())
+            for campo, nomes in COLUNAS.items():
+                if nome in nomes and campo not in indices:
+                    indices[campo] = indice
+        if 'data' in indices and 'valor' in indices:
+            linhas = leitor
+        else:
+            indices = {'data': 0, 'descricao': 1, 'valor': 2, 'categoria': 3}
+            linhas = _com_primeira(primeira, leitor)
+
+        for numero, linha in enumerate(linhas, start=1):
+            if not any(celula.strip() for celula in linha):
+                continue
+            try:
+                yield (
+                    converter_data_extrato(_celula(linha, indices, 'data')),
+                    _celula(linha, indices, 'descricao'),
+                    converter_valor_extrato(_celula(linha, indices, 'valor')),
+                    _celula(linha, indices, 'categoria'),
+                    None
+                )
+            except LinhaInvalida as e:
+                yield LinhaInvalida(f"linha {numero}: {e}")
+
+def _com_primeira(primeira, leitor):
+    yield primeira
+    yield from leitor
+
+def _celula(linha, indices, campo):
+    indice = indices.get(campo)
+    return linha[indice].strip() if indice is not None and indice < len(linha) else ""
+
+def _tags_ofx(arquivo):
+    """Gera (fechamento, tag, texto) lendo o OFX em blocos, sem carregá-lo inteiro."""
+    resto = ""
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO)
+        resto += bloco
+        if not bloco:
+            for encontrado in PADRAO_TAG_OFX.finditer(resto):
+                yield encontrado.group(1) == "/", encontrado.group(2).upper(), encontrado.group(3).strip()
+            return
+        # Só processa até a última tag completa; o restante espera o próximo bloco
+        corte = resto.rfind("<")
+        if corte <= 0:
+            continue
+        for encontrado in PADRAO_TAG_OFX.finditer(resto, 0, corte):
+            yield encontrado.group(1) == "/", encontrado.group(2).upper(), encontrado.group(3).strip()
+        resto = resto[corte:]
+
+def ler_ofx(caminho):
+    """Gera (data, descricao, valor, categoria, identificador) de cada <STMTTRN> do OFX."""
+    with _abrir_texto(caminho) as arquivo:
+        atual = None
+        numero = 0
+        for fechamento, tag, texto in _tags_ofx(arquivo):
+            if tag == "STMTTRN":
+                if not fechamento:
+                    atual = {}
+                    continue
+                if atual is not None:
+                    numero += 1
+                    try:
+                        yield (
+                            converter_data_extrato(atual.get("DTPOSTED", "")),
+                            atual.get("MEMO") or atual.get("NAME", ""),
+                            converter_valor_extrato(atual.get("TRNAMT", "")),
+                            "",
+                            atual.get("FITID")
+                        )
+                    except LinhaInvalida as e:
+                        yield LinhaInvalida(f"transação {numero}: {e}")
+                atual = None
+            elif atual is not None and not fechamento and texto:
+                atual[tag] = texto
+
+def _hash_conteudo(data, descricao, valor_centavos, identificador, ocorrencia, planilha):
+    """Hash que identifica a linha em reimportações do mesmo extrato na mesma planilha.
+
+    O OFX traz um id por transação (FITID); no CSV, duas compras iguais no
+    mesmo dia se diferenciam pela ordem em que aparecem no arquivo.
+    """
+    # A planilha padrão mantém os hashes de antes do suporte a várias planilhas
+    prefixo = "" if planilha == config.SHEET_NAME else f"{planilha}|"
+    if identificador:
+        chave = f"{prefixo}ofx|{identificador}"
+    else:
+        chave = f"{prefixo}{data:%Y-%m-%d}|{normalizar(descricao)}|{valor_centavos}|{ocorrencia}"
+    return hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+def importar_arquivo(caminho, nome_arquivo, planilha=None, chat_id=None):
+    """Importa um extrato CSV/OFX para o livro-caixa em transações de tamanho fixo.
+
+    Retorna um dict com o total de linhas lidas (todas, inclusive as
+    inválidas), novas, duplicadas e inválidas (e as primeiras mensagens de
+    erro). A replicação para a planilha fica com a fila de registros, que
+    agrupa tudo em poucos append_rows.
+
+    A numeração das linhas repetidas de um CSV (mesma data, descrição e
+    valor) lembra só as IMPORTACAO_JANELA_REPETIDAS combinações mais
+    recentes, então a memória não cresce com o arquivo; num extrato em
+    ordem de data as repetições ficam sempre dentro da janela.
+    """
+    leitor = ler_ofx if nome_arquivo.lower().endswith((".ofx", ".qfx")) else ler_csv
+    # A planilha precisa ser importada antes para a marca d'água não pular as linhas novas
+    planilha = planilha or config.SHEET_NAME
+    google_sheets.garantir_livro_caixa_importado(planilha)
+
+    resultado = {"lidas": 0, "novas": 0, "duplicadas": 0, "invalidas": 0, "erros": []}
+    ocorrencias = OrderedDict()  # (data, descrição, centavos) -> repetições já vistas, em ordem de uso
+    linhas = leitor(caminho)
+    while True:
+        bloco = list(islice(linhas, config.IMPORTACAO_LINHAS_POR_TRANSACAO))
+        if not bloco:
+            break
+        resultado["lidas"] += len(bloco)
+        itens = []
+        for linha in bloco:
+            if isinstance(linha, LinhaInvalida):
+                resultado["invalidas"] += 1
+                if len(resultado["erros"]) < 5:
+                    resultado["erros"].append(str(linha))
+                continue
+            data, descricao, valor, categoria, identificador = linha
+            centavos = livro_caixa.para_centavos(valor)
+            if centavos == 0:
+                resultado["invalidas"] += 1
+                continue
+            tipo = 'receita' if centavos > 0 else 'despesa'
+            ocorrencia = None
+            if not identificador:
+                # O OFX já diferencia as repetidas pelo FITID; no CSV vale a ordem no arquivo
+                chave = (data, descricao, centavos)
+                ocorrencias[chave] = ocorrencia = ocorrencias.pop(chave, 0) + 1
+                if len(ocorrencias) > config.IMPORTACAO_JANELA_REPETIDAS:
+                    ocorrencias.popitem(last=False)
+            transacao = livro_caixa.nova_transacao(
+                abs(valor), descricao or "Importado", categoria or CATEGORIA_PADRAO[tipo], tipo, data, planilha, chat_id
+            )
+            itens.append((_hash_conteudo(data, descricao, centavos, identificador, ocorrencia, planilha), transacao))
+        novas = livro_caixa.inserir_importadas(itens)
+        resultado["novas"] += novas
+        resultado["duplicadas"] += len(itens) - novas
+    return resultado
+
+@metricas.medir_handler
+async def comando_importar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Explica como enviar o extrato."""
+    await update.message.reply_text(
+        '📥 Envie o extrato como documento (CSV, OFX ou QFX).\n\n'
+        'CSV: colunas Data, Descrição, Valor e Categoria (opcional); '
+        'valores negativos são despesas e positivos, receitas.\n'
+        'Linhas já importadas antes são ignoradas.'
+    )
+
+@metricas.medir_handler
+async def receber_extrato(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Baixa o extrato para um arquivo temporário, importa em streaming e replica na planilha."""
+    documento = update.message.document
+    await update.message.reply_text(f'⏳ Importando {documento.file_name}...')
+
+    descritor, caminho = tempfile.mkstemp(suffix=os.path.splitext(documento.file_name or "")[1])
+    os.close(descritor)
+    try:
+        arquivo = await documento.get_file()
+        await arquivo.download_to_drive(caminho)
+        resultado = await asyncio.to_thread(
+            importar_arquivo, caminho, documento.file_name or "", planilhas.planilha_do_chat(update.effective_chat.id),
+            update.effective_chat.id
+        )
+    except Exception as e:
+        logger.error(f"Erro ao importar {documento.file_name}: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao importar o extrato: {str(e)}')
+        return
+    finally:
+        os.remove(caminho)
+
+    mensagem = (
+        f'✅ Extrato importado!\n\n'
+        f'📄 Linhas lidas: {resultado["lidas"]}\n'
+        f'🆕 Novas: {resultado["novas"]}\n'
+        f'🔁 Já importadas: {resultado["duplicadas"]}\n'
+        f'⚠️ Inválidas: {resultado["invalidas"]}'
+    )
+    if resultado["erros"]:
+        mensagem += '\n\n' + '\n'.join(resultado["erros"])
+    await update.message.reply_text(mensagem)
+
+    if resultado["novas"]:
+        # Os gastos do chat usados pelos orçamentos são somados de novo, já com o extrato
+        orcamentos.orcamentos.invalidar(update.effective_chat.id)
+        # Replica agora, em lotes grandes, e recalcula o Resumo Mensal uma vez só
+        context.application.create_task(fila_registros.sincronizar(), update=update)
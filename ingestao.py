@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import deque
+from telegram import Update
+import config
+
+logger = logging.getLogger(__name__)
+
+class JanelaDeduplicacao:
+    """Guarda os últimos update_id recebidos para descartar reenvios do Telegram."""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._ordem = deque()
+        self._ids = set()
+
+    def __contains__(self, update_id):
+        return update_id in self._ids
+
+    def registrar(self, update_id):
+        """Registra o id e retorna False se ele já estava na janela."""
+        if update_id in self._ids:
+            return False
+        self._ids.add(update_id)
+        self._ordem.append(update_id)
+        if len(self._ordem) > self.tamanho:
+            self._ids.discard(self._ordem.popleft())
+        return True
+
+class Ingestao:
+    """Recebe as atualizações do webhook, confirma na hora e processa em um pool de workers.
+
+    O webhook só valida, deduplica e enfileira; o processamento (handlers,
+    livro-caixa, planilha) acontece depois, então a latência da resposta ao
+    Telegram não depende da latência do Google Sheets.
+    """
+
+    NOVA, DUPLICADA, CHEIA = 'nova', 'duplicada', 'cheia'
+
+    def __init__(self, application, workers=config.WEBHOOK_WORKERS, tamanho_fila=config.WEBHOOK_TAMANHO_FILA,
+                 tamanho_janela=config.WEBHOOK_JANELA_DEDUPLICACAO):
+        self.application = application
+        self.workers = workers
+        self._fila = asyncio.Queue(maxsize=tamanho_fila)
+        self._janela = JanelaDeduplicacao(tamanho_janela)
+        self._tarefas = []
+
+    def receber(self, dados):
+        """Enfileira o JSON de uma atualização e retorna NOVA, DUPLICADA ou CHEIA."""
+        update_id = dados.get("update_id")
+        if update_id is not None and update_id in self._janela:
+            return self.DUPLICADA
+        try:
+            self._fila.put_nowait(dados)
+        except asyncio.QueueFull:
+            # Sem registrar o id: o Telegram reenvia e a atualização é aceita depois
+            return self.CHEIA
+        if update_id is not None:
+            self._janela.registrar(update_id)
+        return self.NOVA
+
+    async def entregar(self, dados):
+        """Enfileira aguardando vaga; usado quando outro processo já deduplicou a atualização."""
+        await self._fila.put(dados)
+
+    def iniciar(self):
+        """Cria os workers no loop de eventos em execução."""
+        loop = asyncio.get_running_loop()
+        self._tarefas = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def encerrar(self):
+        """Processa o que já foi aceito e para os workers."""
+        await self._fila.join()
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    async def _worker(self):
+        while True:
+            dados = await self._fila.get()
+            try:
+                update = Update.de_json(dados, self.application.bot)
+                # Passa pelo update_processor para manter a ordem dentro de cada chat
+                await self.application.update_processor.process_update(update, self.application.process_update(update))
+            except Exception as e:
+                logger.error(f"Erro ao processar atualização {dados.get('update_id')}: {str(e)}", exc_info=True)
+            finally:
+                self._fila.task_done()
+
+    def tamanho_fila(self):
+        return self._fila.qsize()
@@ -0,0 +1,543 @@
+import sqlite3
+import threading
+import config
+from datetime import datetime, timedelta
+
+# Conexão de escrita do processo (sempre sob _lock); o SQLite serializa as escritas e o WAL libera as leituras
+_lock = threading.RLock()
+_conexao = None
+# Conexão de leitura de cada thread: só enxerga o que já foi confirmado (COMMIT), nunca uma escrita em andamento
+_leitores = threading.local()
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS transacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL,               -- AAAA-MM-DD, ordenável
+    descricao TEXT NOT NULL,
+    valor_centavos INTEGER NOT NULL,  -- Positivo para receitas, negativo para despesas
+    categoria TEXT NOT NULL,
+    tipo TEXT NOT NULL,               -- 'receita' ou 'despesa'
+    planilha TEXT NOT NULL,           -- ID da planilha (inquilino) onde a transação é replicada
+    chat_id INTEGER                   -- Chat que registrou ou importou (NULL para o que veio da planilha)
+);
+CREATE INDEX IF NOT EXISTS idx_transacoes_data ON transacoes (data);
+CREATE INDEX IF NOT EXISTS idx_transacoes_tipo_data ON transacoes (tipo, data);
+CREATE INDEX IF NOT EXISTS idx_transacoes_categoria_data ON transacoes (categoria, data);
+CREATE INDEX IF NOT EXISTS idx_transacoes_planilha_tipo ON transacoes (planilha, tipo);
+CREATE INDEX IF NOT EXISTS idx_transacoes_planilha_tipo_data ON transacoes (planilha, tipo, data);
+CREATE INDEX IF NOT EXISTS idx_transacoes_chat_tipo_data ON transacoes (chat_id, tipo, data);
+
+-- Marca d'água da sincronização: último id já replicado em cada aba de cada planilha
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    planilha TEXT NOT NULL,
+    aba TEXT NOT NULL,
+    ultimo_id INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (planilha, aba)
+);
+
+-- Planilha escolhida por cada chat com /planilha (os demais usam a planilha padrão)
+CREATE TABLE IF NOT EXISTS planilhas_chat (
+    chat_id INTEGER PRIMARY KEY,
+    planilha TEXT NOT NULL
+);
+
+-- Hash do conteúdo de cada linha importada de extrato, para não importar duas vezes
+CREATE TABLE IF NOT EXISTS importadas (
+    hash TEXT PRIMARY KEY,
+    transacao_id INTEGER NOT NULL
+);
+
+-- Orçamento mensal por categoria de cada chat (/orcamento); chave = categoria sem acentos e minúscula
+CREATE TABLE IF NOT EXISTS orcamentos (
+    chat_id INTEGER NOT NULL,
+    chave TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    valor_centavos INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, chave)
+);
+
+-- Índice de busca das descrições (/buscar): trigramas do texto sem acentos, rowid = id da transação
+CREATE VIRTUAL TABLE IF NOT EXISTS busca USING fts5(descricao, categoria, tokenize='trigram', content='');
+
+-- Buscas feitas com /buscar; os botões de página levam só o id (callback_data "buscar:<id>:<página>")
+CREATE TABLE IF NOT EXISTS buscas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    termo TEXT NOT NULL,
+    consulta TEXT NOT NULL,           -- Expressão MATCH do FTS5
+    inicio TEXT,                      -- AAAA-MM-DD ou NULL (sem limite)
+    fim TEXT,
+    planilha TEXT NOT NULL,
+    criada_em TEXT NOT NULL           -- AAAA-MM-DD HH:MM:SS, para descartar as antigas
+);
+CREATE INDEX IF NOT EXISTS idx_buscas_criada_em ON buscas (criada_em);
+
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+def _migrar(conexao):
+    """Adapta bancos criados antes do suporte a várias planilhas (tudo vai para a planilha padrão).
+
+    Também acrescenta o chat de cada transação; as já gravadas ficam sem chat.
+    """
+    colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(transacoes)")}
+    if colunas and "planilha" not in colunas:
+        conexao.execute("ALTER TABLE transacoes ADD COLUMN planilha TEXT")
+        conexao.execute("UPDATE transacoes SET planilha = ?", (config.SHEET_NAME,))
+    if colunas and "chat_id" not in colunas:
+        conexao.execute("ALTER TABLE transacoes ADD COLUMN chat_id INTEGER")
+    colunas = {linha[1] for linha in conexao.execute("PRAGMA table_info(sincronizacao)")}
+    if colunas and "planilha" not in colunas:
+        conexao.execute("ALTER TABLE sincronizacao RENAME TO sincronizacao_antiga")
+        conexao.execute(
+            "CREATE TABLE sincronizacao (planilha TEXT NOT NULL, aba TEXT NOT NULL, "
+            "ultimo_id INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (planilha, aba))"
+        )
+        conexao.execute(
+            "INSERT INTO sincronizacao (planilha, aba, ultimo_id) SELECT ?, aba, ultimo_id FROM sincronizacao_antiga",
+            (config.SHEET_NAME,)
+        )
+        conexao.execute("DROP TABLE sincronizacao_antiga")
+
+INSERIR_TRANSACAO = (
+    "INSERT INTO transacoes (data, descricao, valor_centavos, categoria, tipo, planilha, chat_id) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+def conectar():
+    """Abre (uma única vez) o banco local em modo WAL e cria o esquema."""
+    global _conexao
+    if _conexao is not None:
+        # Sem o lock: uma leitura não espera a escrita em andamento só para pegar a conexão
+        return _conexao
+    with _lock:
+        if _conexao is None:
+            conexao = sqlite3.connect(config.LIVRO_CAIXA_ARQUIVO, check_same_thread=False, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("BEGIN IMMEDIATE")
+            _migrar(conexao)
+            conexao.execute("COMMIT")
+            conexao.executescript(ESQUEMA)
+            _conexao = conexao
+        return _conexao
+
+def _leitura():
+    """Conexão de leitura da thread atual (aberta na primeira vez).
+
+    As escritas usam a conexão compartilhada sob `_lock`; ler por ela sem o
+    lock veria linhas de uma transação ainda aberta, que um ROLLBACK pode
+    desfazer. Cada thread lê pela própria conexão, em retratos do WAL.
+    """
+    conexao = getattr(_leitores, "conexao", None)
+    if conexao is None:
+        conectar()  # Garante o esquema antes de abrir a conexão própria
+        conexao = _leitores.conexao = sqlite3.connect(config.LIVRO_CAIXA_ARQUIVO, check_same_thread=False, isolation_level=None)
+    return conexao
+
+def para_centavos(valor):
+    """Converte um valor em reais para centavos inteiros."""
+    return int(round(float(valor) * 100))
+
+def nova_transacao(valor, descricao, categoria, tipo='despesa', data=None, planilha=None, chat_id=None):
+    """Monta a tupla gravada no livro-caixa (valor com sinal pelo tipo).
+
+    (data, descricao, valor_centavos, categoria, tipo, planilha, chat_id)
+    """
+    centavos = abs(para_centavos(valor))
+    data = data or datetime.now()
+    return (
+        data.strftime("%Y-%m-%d"), descricao, centavos if tipo == 'receita' else -centavos, categoria, tipo,
+        planilha or config.SHEET_NAME, chat_id
+    )
+
+def inserir_transacoes(transacoes, sincronizadas=False):
+    """Grava as transações em uma única transação SQLite e retorna os ids criados.
+
+    Com sincronizadas=True a marca d'água de cada aba avança até os ids
+    inseridos (usado ao importar linhas que já estão na planilha).
+    """
+    conexao = conectar()
+    with _lock:
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            ids = []
+            for transacao in transacoes:
+                cursor = conexao.execute(INSERIR_TRANSACAO, transacao)
+                ids.append(cursor.lastrowid)
+            if sincronizadas and ids:
+                for tipo, planilha in {(transacao[4], transacao[5]) for transacao in transacoes}:
+                    _marcar_sincronizado(conexao, planilha, _aba_do_tipo(tipo), ids[-1])
+            conexao.execute("COMMIT")
+            return ids
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+def importar_da_planilha(transacoes, chave_metadado):
+    """Grava as linhas que já estavam na planilha como sincronizadas e marca a importação como feita.
+
+    Tudo em uma única transação: se outro processo já tiver importado
+    (metadado presente), nada é gravado e retorna False.
+    """
+    conexao = conectar()
+    with _lock:
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            if conexao.execute("SELECT 1 FROM metadados WHERE chave = ?", (chave_metadado,)).fetchone():
+                conexao.execute("ROLLBACK")
+                return False
+            ultimo_id = {}
+            for transacao in transacoes:
+                ultimo_id[(transacao[5], transacao[4])] = conexao.execute(INSERIR_TRANSACAO, transacao).lastrowid
+            for (planilha, tipo), id_transacao in ultimo_id.items():
+                _marcar_sincronizado(conexao, planilha, _aba_do_tipo(tipo), id_transacao)
+            conexao.execute(
+                "INSERT INTO metadados (chave, valor) VALUES (?, ?)", (chave_metadado, datetime.now().isoformat())
+            )
+            conexao.execute("COMMIT")
+            return True
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+def inserir_importadas(itens):
+    """Grava pares (hash, transação) ignorando hashes já importados.
+
+    Tudo em uma única transação SQLite; retorna quantas transações eram novas.
+    """
+    conexao = conectar()
+    with _lock:
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            novas = 0
+            for hash_conteudo, transacao in itens:
+                if conexao.execute("SELECT 1 FROM importadas WHERE hash = ?", (hash_conteudo,)).fetchone():
+                    continue
+                cursor = conexao.execute(INSERIR_TRANSACAO, transacao)
+                conexao.execute("INSERT INTO importadas (hash, transacao_id) VALUES (?, ?)", (hash_conteudo, cursor.lastrowid))
+                novas += 1
+            conexao.execute("COMMIT")
+            return novas
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+def _aba_do_tipo(tipo):
+    return config.RECEITAS_SHEET_NAME if tipo == 'receita' else config.DESPESAS_SHEET_NAME
+
+def _marcar_sincronizado(conexao, planilha, aba, ultimo_id):
+    conexao.execute(
+        "INSERT INTO sincronizacao (planilha, aba, ultimo_id) VALUES (?, ?, ?) "
+        "ON CONFLICT (planilha, aba) DO UPDATE SET ultimo_id = MAX(ultimo_id, excluded.ultimo_id)",
+        (planilha, aba, ultimo_id)
+    )
+
+def marcar_sincronizado(aba, ultimo_id, planilha=None):
+    """Avança a marca d'água da aba após replicar as linhas na planilha."""
+    conexao = conectar()
+    with _lock:
+        _marcar_sincronizado(conexao, planilha or config.SHEET_NAME, aba, ultimo_id)
+
+def marca_dagua(aba, planilha=None):
+    """Retorna o último id já replicado na aba."""
+    linha = _leitura().execute(
+        "SELECT ultimo_id FROM sincronizacao WHERE planilha = ? AND aba = ?", (planilha or config.SHEET_NAME, aba)
+    ).fetchone()
+    return linha[0] if linha else 0
+
+def pendentes(tipo, limite, planilha=None):
+    """Retorna até `limite` transações do tipo ainda não replicadas na planilha."""
+    planilha = planilha or config.SHEET_NAME
+    return _leitura().execute(
+        "SELECT id, data, descricao, valor_centavos, categoria FROM transacoes "
+        "WHERE planilha = ? AND tipo = ? AND id > ? ORDER BY id LIMIT ?",
+        (planilha, tipo, marca_dagua(_aba_do_tipo(tipo), planilha), limite)
+    ).fetchall()
+
+def contar_pendentes(planilha=None):
+    """Retorna quantas transações ainda não foram replicadas na planilha."""
+    planilha = planilha or config.SHEET_NAME
+    conexao = _leitura()
+    # Uma contagem por aba: cada uma percorre só o trecho do índice (planilha, tipo) acima da marca d'água
+    return sum(
+        conexao.execute(
+            "SELECT COUNT(*) FROM transacoes WHERE planilha = ? AND tipo = ? AND id > ?",
+            (planilha, tipo, marca_dagua(_aba_do_tipo(tipo), planilha))
+        ).fetchone()[0]
+        for tipo in ('receita', 'despesa')
+    )
+
+def planilhas_conhecidas():
+    """Retorna a planilha padrão e as já replicadas ou vinculadas a algum chat."""
+    conexao = _leitura()
+    conhecidas = {config.SHEET_NAME}
+    conhecidas.update(linha[0] for linha in conexao.execute("SELECT DISTINCT planilha FROM sincronizacao"))
+    conhecidas.update(linha[0] for linha in conexao.execute("SELECT DISTINCT planilha FROM planilhas_chat"))
+    return sorted(conhecidas)
+
+def planilhas_com_resumo_pendente():
+    """Retorna as planilhas com o Resumo Mensal marcado para a reconciliação (metadado 'resumo_pendente:<planilha>')."""
+    return [
+        linha[0].split(":", 1)[1]
+        for linha in _leitura().execute("SELECT chave FROM metadados WHERE chave LIKE 'resumo_pendente:%' AND valor = '1'")
+    ]
+
+def planilhas_com_pendentes():
+    """Retorna as planilhas com transações ainda não replicadas.
+
+    Uma consulta pelo índice (planilha, tipo) por aba de cada planilha
+    conhecida, sem varrer a tabela de transações.
+    """
+    conexao = _leitura()
+    com_pendentes = []
+    for planilha in planilhas_conhecidas():
+        for tipo in ('receita', 'despesa'):
+            if conexao.execute(
+                "SELECT 1 FROM transacoes WHERE planilha = ? AND tipo = ? AND id > ? LIMIT 1",
+                (planilha, tipo, marca_dagua(_aba_do_tipo(tipo), planilha))
+            ).fetchone():
+                com_pendentes.append(planilha)
+                break
+    return com_pendentes
+
+def obter_planilha_do_chat(chat_id):
+    """Retorna o ID da planilha vinculada ao chat, ou None para a planilha padrão."""
+    linha = _leitura().execute("SELECT planilha FROM planilhas_chat WHERE chat_id = ?", (chat_id,)).fetchone()
+    return linha[0] if linha else None
+
+def definir_planilha_do_chat(chat_id, planilha):
+    conexao = conectar()
+    with _lock:
+        conexao.execute(
+            "INSERT INTO planilhas_chat (chat_id, planilha) VALUES (?, ?) "
+            "ON CONFLICT (chat_id) DO UPDATE SET planilha = excluded.planilha",
+            (chat_id, planilha)
+        )
+
+def orcamentos_do_chat(chat_id):
+    """Retorna [(chave, categoria, valor_centavos)] dos orçamentos do chat."""
+    return _leitura().execute(
+        "SELECT chave, categoria, valor_centavos FROM orcamentos WHERE chat_id = ?", (chat_id,)
+    ).fetchall()
+
+def definir_orcamento(chat_id, chave, categoria, valor_centavos):
+    conexao = conectar()
+    with _lock:
+        conexao.execute(
+            "INSERT INTO orcamentos (chat_id, chave, categoria, valor_centavos) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (chat_id, chave) DO UPDATE SET categoria = excluded.categoria, valor_centavos = excluded.valor_centavos",
+            (chat_id, chave, categoria, valor_centavos)
+        )
+
+def remover_orcamento(chat_id, chave):
+    conexao = conectar()
+    with _lock:
+        conexao.execute("DELETE FROM orcamentos WHERE chat_id = ? AND chave = ?", (chat_id, chave))
+
+def obter_metadado(chave):
+    linha = _leitura().execute("SELECT valor FROM metadados WHERE chave = ?", (chave,)).fetchone()
+    return linha[0] if linha else None
+
+def definir_metadado(chave, valor):
+    conexao = conectar()
+    with _lock:
+        conexao.execute(
+            "INSERT INTO metadados (chave, valor) VALUES (?, ?) "
+            "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+            (chave, valor)
+        )
+
+def colunas_para_agregacao(somente_sincronizadas=False, planilha=None):
+    """Retorna (data, valor_centavos, categoria) de todas as transações da planilha.
+
+    Com somente_sincronizadas=True considera apenas o que já está na planilha.
+    """
+    planilha = planilha or config.SHEET_NAME
+    filtro = ""
+    parametros = (planilha,)
+    if somente_sincronizadas:
+        filtro = "AND id <= CASE tipo WHEN 'receita' THEN ? ELSE ? END"
+        parametros += (marca_dagua(config.RECEITAS_SHEET_NAME, planilha), marca_dagua(config.DESPESAS_SHEET_NAME, planilha))
+    return _leitura().execute(
+        f"SELECT data, valor_centavos, categoria FROM transacoes WHERE planilha = ? {filtro}", parametros
+    ).fetchall()
+
+def iterar_transacoes(tipo, inicio=None, fim=None, tamanho_pagina=1000, planilha=None):
+    """Gera (data, id, descricao, valor_centavos, categoria, tipo) do tipo em ordem de data.
+
+    Usa uma conexão própria (um retrato consistente no WAL, sem segurar a
+    conexão compartilhada) e lê em páginas de tamanho fixo.
+    """
+    conexao = sqlite3.connect(config.LIVRO_CAIXA_ARQUIVO, check_same_thread=False)
+    try:
+        cursor = conexao.execute(
+            "SELECT data, id, descricao, valor_centavos, categoria, tipo FROM transacoes "
+            "WHERE planilha = ? AND tipo = ? AND data >= ? AND data <= ? ORDER BY data, id",
+            (planilha or config.SHEET_NAME, tipo, inicio or "0000-00-00", fim or "9999-99-99")
+        )
+        while True:
+            pagina = cursor.fetchmany(tamanho_pagina)
+            if not pagina:
+                return
+            yield from pagina
+    finally:
+        conexao.close()
+
+def colunas_novas(planilha=None, apos_id=0):
+    """Retorna (ultimo_id, [(data, valor_centavos, categoria)]) das transações com id > apos_id.
+
+    Tudo é lido no mesmo retrato do banco; com o ultimo_id devolvido, a
+    próxima chamada traz só o que entrou depois. Cada tipo é lido pelo
+    índice (planilha, tipo).
+    """
+    planilha = planilha or config.SHEET_NAME
+    conectar()  # Garante o esquema antes de abrir a conexão própria
+    conexao = sqlite3.connect(config.LIVRO_CAIXA_ARQUIVO, check_same_thread=False, isolation_level=None)
+    try:
+        conexao.execute("BEGIN")
+        ultimo_id = max(
+            conexao.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM transacoes WHERE planilha = ? AND tipo = ?", (planilha, tipo)
+            ).fetchone()[0]
+            for tipo in ('receita', 'despesa')
+        )
+        linhas = []
+        if ultimo_id > apos_id:
+            for tipo in ('receita', 'despesa'):
+                linhas.extend(conexao.execute(
+                    "SELECT data, valor_centavos, categoria FROM transacoes "
+                    "WHERE planilha = ? AND tipo = ? AND id > ? AND id <= ?",
+                    (planilha, tipo, apos_id, ultimo_id)
+                ))
+        conexao.execute("COMMIT")
+        return max(ultimo_id, apos_id), linhas
+    finally:
+        conexao.close()
+
+def despesas_do_chat(chat_id, mes):
+    """Retorna (ultimo_id, [(data, valor_centavos, categoria)]) das despesas do chat no mês AAAA-MM.
+
+    ultimo_id é o maior id do livro-caixa no mesmo retrato: as despesas
+    gravadas depois dele ainda não estão na lista.
+    """
+    leitura = _leitura()
+    leitura.execute("BEGIN")
+    try:
+        ultimo_id = leitura.execute("SELECT COALESCE(MAX(id), 0) FROM transacoes").fetchone()[0]
+        linhas = leitura.execute(
+            "SELECT data, valor_centavos, categoria FROM transacoes "
+            "WHERE chat_id = ? AND tipo = 'despesa' AND data >= ? AND data <= ? AND id <= ?",
+            (chat_id, f"{mes}-01", f"{mes}-31", ultimo_id)
+        ).fetchall()
+    finally:
+        leitura.execute("COMMIT")
+    return ultimo_id, linhas
+
+def indexar_busca(normalizar, tamanho_lote=config.BUSCA_TAMANHO_LOTE):
+    """Acrescenta ao índice de busca as transações com id acima da marca 'busca_ultimo_id'.
+
+    `normalizar` é aplicada à descrição e à categoria antes de indexar. A marca
+    é lida e avançada na mesma transação, então dois processos nunca indexam
+    a mesma linha. Retorna o número de transações indexadas.
+    """
+    leitura = _leitura()
+    marca = leitura.execute("SELECT valor FROM metadados WHERE chave = 'busca_ultimo_id'").fetchone()
+    if int(marca[0] if marca else 0) >= leitura.execute("SELECT COALESCE(MAX(id), 0) FROM transacoes").fetchone()[0]:
+        return 0
+    conexao = conectar()
+    total = 0
+    while True:
+        with _lock:
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                marca = conexao.execute("SELECT valor FROM metadados WHERE chave = 'busca_ultimo_id'").fetchone()
+                lote = conexao.execute(
+                    "SELECT id, descricao, categoria FROM transacoes WHERE id > ? ORDER BY id LIMIT ?",
+                    (int(marca[0] if marca else 0), tamanho_lote)
+                ).fetchall()
+                if lote:
+                    conexao.executemany(
+                        "INSERT INTO busca (rowid, descricao, categoria) VALUES (?, ?, ?)",
+                        [(id_transacao, normalizar(descricao), normalizar(categoria)) for id_transacao, descricao, categoria in lote]
+                    )
+                    conexao.execute(
+                        "INSERT INTO metadados (chave, valor) VALUES ('busca_ultimo_id', ?) "
+                        "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+                        (str(lote[-1][0]),)
+                    )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+        total += len(lote)
+        if len(lote) < tamanho_lote:
+            return total
+
+def buscar_transacoes(consulta, planilha=None, inicio=None, fim=None, limite=10, deslocamento=0):
+    """Busca pelo índice de descrições (`consulta` na sintaxe MATCH do FTS5).
+
+    Retorna (totais, pagina): totais = {tipo: (quantidade, centavos)} de tudo
+    o que casou no período e pagina = [(data, descricao, valor_centavos,
+    categoria, tipo)], das mais recentes para as mais antigas.
+    """
+    # CROSS JOIN fixa a ordem: primeiro o índice, depois só as transações que casaram
+    filtros = "busca MATCH ? AND t.planilha = ? AND t.data >= ? AND t.data <= ?"
+    parametros = (consulta, planilha or config.SHEET_NAME, inicio or "0000-00-00", fim or "9999-99-99")
+    conexao = _leitura()
+    # Totais e página do mesmo retrato do banco
+    conexao.execute("BEGIN")
+    try:
+        totais = {
+            tipo: (quantidade, centavos)
+            for tipo, quantidade, centavos in conexao.execute(
+                f"SELECT t.tipo, COUNT(*), SUM(t.valor_centavos) FROM busca CROSS JOIN transacoes t ON t.id = busca.rowid "
+                f"WHERE {filtros} GROUP BY t.tipo",
+                parametros
+            )
+        }
+        pagina = conexao.execute(
+            f"SELECT t.data, t.descricao, t.valor_centavos, t.categoria, t.tipo FROM busca CROSS JOIN transacoes t ON t.id = busca.rowid "
+            f"WHERE {filtros} ORDER BY t.data DESC, t.id DESC LIMIT ? OFFSET ?",
+            parametros + (limite, deslocamento)
+        ).fetchall()
+    finally:
+        conexao.execute("COMMIT")
+    return totais, pagina
+
+def salvar_busca(chat_id, termo, consulta, inicio, fim, planilha, validade_dias=config.BUSCA_VALIDADE_DIAS):
+    """Guarda a busca para os botões de página e retorna o id; descarta as de mais de `validade_dias`."""
+    agora = datetime.now()
+    conexao = conectar()
+    with _lock:
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            conexao.execute(
+                "DELETE FROM buscas WHERE criada_em < ?",
+                ((agora - timedelta(days=validade_dias)).strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+            busca_id = conexao.execute(
+                "INSERT INTO buscas (chat_id, termo, consulta, inicio, fim, planilha, criada_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chat_id, termo, consulta, inicio, fim, planilha or config.SHEET_NAME, agora.strftime("%Y-%m-%d %H:%M:%S"))
+            ).lastrowid
+            conexao.execute("COMMIT")
+            return busca_id
+        except Exception:
+            conexao.execute("ROLLBACK")
+            raise
+
+def obter_busca(busca_id, chat_id):
+    """Retorna (termo, consulta, inicio, fim, planilha) da busca do chat, ou None se não existe mais."""
+    return _leitura().execute(
+        "SELECT termo, consulta, inicio, fim, planilha FROM buscas WHERE id = ? AND chat_id = ?", (busca_id, chat_id)
+    ).fetchone()
+
+def total_despesas(planilha=None):
+    """Retorna o total de despesas registradas, em reais (positivo)."""
+    linha = _leitura().execute(
+        "SELECT COALESCE(SUM(-valor_centavos), 0) FROM transacoes WHERE planilha = ? AND tipo = 'despesa'",
+        (planilha or config.SHEET_NAME,)
+    ).fetchone()
+    return linha[0] / 100
@@ -0,0 +1,245 @@
+import bisect
+import contextlib
+import functools
+import threading
+import time
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LIMITES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Metrica:
+    """Base das métricas: nome, texto de ajuda, rótulos e um lock para as threads do Sheets."""
+
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._series = {}
+        self._externas = {}  # Origem (ex.: processo de trabalho) -> último retrato das séries dela
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+
+    def retrato(self):
+        """Cópia das séries deste processo, para somar às de outro processo."""
+        with self._lock:
+            return {chave: self._copiar(valor) for chave, valor in self._series.items()}
+
+    def incorporar(self, origem, series):
+        """Guarda o retrato mais recente de outra origem; ele é somado às séries locais na exportação."""
+        with self._lock:
+            self._externas[origem] = series
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            series = {chave: self._copiar(valor) for chave, valor in self._series.items()}
+            for externas in self._externas.values():
+                for chave, valor in externas.items():
+                    series[chave] = self._somar(series[chave], valor) if chave in series else self._copiar(valor)
+        for chave, valor in sorted(series.items()):
+            linhas.extend(self._linhas(chave, valor))
+        return linhas
+
+    @staticmethod
+    def _copiar(valor):
+        return valor
+
+    @staticmethod
+    def _somar(valor, outro):
+        return valor + outro
+
+class Contador(Metrica):
+    """Contador que só cresce (ex.: erros 429)."""
+
+    tipo = "counter"
+
+    def inc(self, quantidade=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0) + quantidade
+
+    def valor(self, **rotulos):
+        return self._series.get(self._chave(rotulos), 0)
+
+    def _linhas(self, chave, valor):
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_numero(valor)}"]
+
+class Histograma(Metrica):
+    """Histograma de latência com buckets fixos; observar custa um bisect e três somas."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # [contagens por bucket (+Inf no fim), soma, total]
+                serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @staticmethod
+    def _copiar(serie):
+        return [list(serie[0]), serie[1], serie[2]]
+
+    @staticmethod
+    def _somar(serie, outra):
+        return [[a + b for a, b in zip(serie[0], outra[0])], serie[1] + outra[1], serie[2] + outra[2]]
+
+    def _linhas(self, chave, serie):
+        contagens, soma, total = serie
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.limites + (float("inf"),), contagens):
+            acumulado += contagem
+            rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{_numero(limite)}"')
+            linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+        rotulos = _formatar_rotulos(self.rotulos, chave)
+        linhas.append(f"{self.nome}_sum{rotulos} {_numero(soma)}")
+        linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+class Medidor(Metrica):
+    """Valor instantâneo lido na hora da coleta (ex.: tamanho de uma fila)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, funcao):
+        super().__init__(nome, ajuda)
+        self.funcao = funcao
+
+    def retrato(self):
+        # Valores instantâneos são do processo que os lê; não se somam entre processos
+        return None
+
+    def exportar(self):
+        try:
+            valor = self.funcao()
+        except Exception:
+            return []
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}", f"{self.nome} {_numero(valor)}"]
+
+class Registro:
+    """Conjunto de métricas do processo, exportado no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, metrica):
+        with self._lock:
+            self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self.adicionar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        return self.adicionar(Histograma(nome, ajuda, rotulos, limites))
+
+    def medidor(self, nome, ajuda, funcao):
+        return self.adicionar(Medidor(nome, ajuda, funcao))
+
+    def retrato(self):
+        """Séries de contadores e histogramas do processo: {nome: {chave: valor}}."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        retrato = {}
+        for metrica in metricas:
+            series = metrica.retrato()
+            if series is not None:
+                retrato[metrica.nome] = series
+        return retrato
+
+    def incorporar(self, origem, retrato):
+        """Soma às próximas exportações o retrato de outro processo (substitui o anterior da mesma origem)."""
+        with self._lock:
+            metricas = {nome: self._metricas.get(nome) for nome in retrato}
+        for nome, series in retrato.items():
+            if metricas[nome] is not None:
+                metricas[nome].incorporar(origem, series)
+
+    def exportar(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+# Registro compartilhado pelo processo
+registro = Registro()
+
+WEBHOOK_SEGUNDOS = registro.histograma(
+    "bot_webhook_segundos", "Tempo para responder um POST do webhook", ("status",)
+)
+HANDLER_SEGUNDOS = registro.histograma(
+    "bot_handler_segundos", "Tempo de execução de cada handler do bot", ("handler",)
+)
+HANDLER_ERROS = registro.contador(
+    "bot_handler_erros_total", "Exceções não tratadas nos handlers do bot", ("handler",)
+)
+SHEETS_SEGUNDOS = registro.histograma(
+    "sheets_chamada_segundos", "Duração de cada chamada ao Google Sheets (sem a espera de cota)", ("operacao", "tipo")
+)
+SHEETS_ESPERA_COTA = registro.histograma(
+    "sheets_espera_cota_segundos", "Tempo esperando ficha de cota antes de uma chamada ao Sheets", ("tipo",)
+)
+SHEETS_ERROS = registro.contador(
+    "sheets_erros_total", "Falhas nas chamadas ao Google Sheets, por código HTTP", ("operacao", "status")
+)
+
+@contextlib.contextmanager
+def cronometrar(histograma, **rotulos):
+    """Observa no histograma o tempo do bloco `with`."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **rotulos)
+
+def medir_handler(funcao):
+    """Decorador para handlers assíncronos: mede a duração e conta as exceções."""
+    nome = funcao.__qualname__
+
+    @functools.wraps(funcao)
+    async def medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return await funcao(*args, **kwargs)
+        except Exception:
+            HANDLER_ERROS.inc(handler=nome)
+            raise
+        finally:
+            HANDLER_SEGUNDOS.observar(time.perf_counter() - inicio, handler=nome)
+
+    return medido
+
+def exportar():
+    """Texto de todas as métricas no formato de exposição do Prometheus."""
+    return registro.exportar()
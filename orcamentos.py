@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ContextTypes
+import agregacao
+import config
+import entrada_rapida
+import livro_caixa
+import metricas
+from texto import normalizar
+
+logger = logging.getLogger(__name__)
+
+class Orcamentos:
+    """Orçamento mensal por categoria de cada chat, conferido a cada despesa registrada.
+
+    Os limites de cada chat são lidos do livro-caixa uma vez e ficam em
+    memória. O gasto de cada (chat, mês, categoria) também: é somado do
+    livro-caixa na primeira despesa do chat no mês (só as transações
+    gravadas pelo próprio chat, nunca as de outros chats da mesma
+    planilha) e depois acrescido a cada despesa confirmada, então a
+    conferência é uma consulta a um dicionário. Para cada (chat, mês,
+    categoria) fica guardado o último gasto já conferido, então um
+    percentual cruzado por uma importação de extrato é avisado uma vez só,
+    na próxima despesa que o chat registrar na categoria.
+    """
+
+    def __init__(self, percentuais=config.ORCAMENTO_ALERTAS):
+        self.percentuais = sorted(percentuais)
+        self._lock = threading.Lock()
+        self._limites = {}  # chat_id -> {chave: (categoria, centavos)}
+        self._gastos = {}  # (chat_id, "AAAA-MM", chave) -> despesas do chat no mês, em centavos positivos
+        self._carregados = {}  # (chat_id, "AAAA-MM") -> maior id do livro-caixa já somado em _gastos
+        self._conferidos = {}  # (chat_id, "AAAA-MM", chave) -> gasto já conferido, em centavos
+        self._mes = None
+
+    def limites(self, chat_id):
+        """Orçamentos do chat: {chave da categoria: (categoria, centavos)}."""
+        with self._lock:
+            limites = self._limites.get(chat_id)
+        if limites is None:
+            carregados = {chave: (categoria, centavos) for chave, categoria, centavos in livro_caixa.orcamentos_do_chat(chat_id)}
+            with self._lock:
+                limites = self._limites.setdefault(chat_id, carregados)
+        return limites
+
+    def definir(self, chat_id, categoria, centavos):
+        """Define (ou remove, com 0) o orçamento mensal da categoria."""
+        chave = normalizar(categoria)
+        if centavos > 0:
+            livro_caixa.definir_orcamento(chat_id, chave, categoria, centavos)
+        else:
+            livro_caixa.remover_orcamento(chat_id, chave)
+        limites = self.limites(chat_id)
+        with self._lock:
+            if centavos > 0:
+                limites[chave] = (categoria, centavos)
+            else:
+                limites.pop(chave, None)
+
+    def _carregar(self, chat_id, mes):
+        """Soma uma vez, pela tabela de transações, as despesas do chat no mês."""
+        with self._lock:
+            if (chat_id, mes) in self._carregados:
+                return
+        ultimo_id, linhas = livro_caixa.despesas_do_chat(chat_id, mes)
+        gastos = {}
+        for categoria, centavos in agregacao.TabelaTransacoes.de_linhas(linhas).por_categoria('despesa').items():
+            chave = normalizar(categoria)
+            gastos[chave] = gastos.get(chave, 0) + centavos
+        with self._lock:
+            if (chat_id, mes) in self._carregados:
+                return
+            self._carregados[(chat_id, mes)] = ultimo_id
+            for chave, centavos in gastos.items():
+                self._gastos[(chat_id, mes, chave)] = centavos
+
+    def gasto(self, chat_id, mes, chave):
+        """Despesas do chat no mês na categoria (chave normalizada), em centavos."""
+        self._carregar(chat_id, mes)
+        with self._lock:
+            return self._gastos.get((chat_id, mes, chave), 0)
+
+    def invalidar(self, chat_id):
+        """Descarta os gastos somados do chat (ex.: depois de importar um extrato)."""
+        with self._lock:
+            self._carregados = {item: ultimo_id for item, ultimo_id in self._carregados.items() if item[0] != chat_id}
+            self._gastos = {item: gasto for item, gasto in self._gastos.items() if item[0] != chat_id}
+
+    def registrar(self, chat_id, transacao_id, transacao):
+        """Soma a despesa recém-gravada ao gasto do chat e retorna os alertas disparados.
+
+        Retorna [(categoria, percentual, gasto, limite)], em centavos, para cada
+        percentual de ORCAMENTO_ALERTAS cruzado desde a última conferência do chat.
+        """
+        data, _, centavos, categoria, tipo, _, _ = transacao
+        if tipo != 'despesa':
+            return []
+        limites = self.limites(chat_id)
+        chave_categoria = normalizar(categoria)
+        mes = data[:7]
+        if limites:
+            # Sem orçamento não há o que conferir: o gasto é somado do livro-caixa quando houver
+            self._carregar(chat_id, mes)
+
+        chave = (chat_id, mes, chave_categoria)
+        with self._lock:
+            if self._mes != mes and (self._mes is None or mes > self._mes):
+                # Virou o mês: os gastos dos meses anteriores não voltam a ser conferidos
+                self._gastos = {item: gasto for item, gasto in self._gastos.items() if item[1] >= mes}
+                self._carregados = {item: ultimo_id for item, ultimo_id in self._carregados.items() if item[1] >= mes}
+                self._conferidos = {item: gasto for item, gasto in self._conferidos.items() if item[1] >= mes}
+                self._mes = mes
+            somado_ate = self._carregados.get((chat_id, mes))
+            if somado_ate is not None and transacao_id > somado_ate:
+                # Gravada depois da soma inicial: entra agora (as anteriores já estão somadas)
+                self._gastos[chave] = self._gastos.get(chave, 0) - centavos
+            novo = self._gastos.get(chave, 0)
+            orcamento = limites.get(chave_categoria)
+            if orcamento is None:
+                return []
+            # Primeira conferência: só esta despesa é nova
+            anterior = self._conferidos.get(chave, novo + centavos)
+            self._conferidos[chave] = novo
+        nome, limite = orcamento
+        return [
+            (nome, percentual, novo, limite)
+            for percentual in self.percentuais
+            if anterior * 100 < limite * percentual <= novo * 100
+        ]
+
+# Orçamentos compartilhados pelos handlers do bot
+orcamentos = Orcamentos()
+
+def _reais(centavos):
+    return f"R$ {centavos / 100:.2f}"
+
+def texto_alerta(categoria, percentual, gasto, limite):
+    if percentual >= 100:
+        return f'🚨 Orçamento de {categoria} estourado: {_reais(gasto)} de {_reais(limite)} ({gasto * 100 // limite}%)'
+    return f'⚠️ Orçamento de {categoria}: {percentual}% usado ({_reais(gasto)} de {_reais(limite)})'
+
+async def avisar_orcamento(bot, chat_id, transacao_id, transacao):
+    """Confere a despesa recém-gravada contra o orçamento do chat e envia os avisos disparados."""
+    try:
+        alertas = await asyncio.to_thread(orcamentos.registrar, chat_id, transacao_id, transacao)
+    except Exception as e:
+        logger.error(f"Erro ao conferir o orçamento: {str(e)}", exc_info=True)
+        return
+    for alerta in alertas:
+        await bot.send_message(chat_id, texto_alerta(*alerta))
+
+def texto_orcamentos(chat_id, mes=None):
+    """Lista os orçamentos do chat com o gasto do mês em cada categoria."""
+    limites = orcamentos.limites(chat_id)
+    if not limites:
+        return '📭 Nenhum orçamento definido. Use: /orcamento <categoria> <valor>'
+    mes = mes or datetime.now().strftime("%Y-%m")
+    linhas = [f'🎯 Orçamentos de {mes[5:7]}/{mes[:4]}']
+    for chave, (categoria, limite) in sorted(limites.items(), key=lambda item: item[1][0]):
+        gasto = orcamentos.gasto(chat_id, mes, chave)
+        linhas.append(f'{categoria}: {_reais(gasto)} de {_reais(limite)} ({gasto * 100 // limite}%)')
+    return "\n".join(linhas)
+
+@metricas.medir_handler
+async def comando_orcamento(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Define ou lista orçamentos mensais: /orcamento [<categoria> <valor>]."""
+    chat_id = update.effective_chat.id
+    if not context.args:
+        texto = await asyncio.to_thread(texto_orcamentos, chat_id)
+        await update.message.reply_text(texto)
+        return
+
+    try:
+        if len(context.args) < 2:
+            raise ValueError
+        categoria = " ".join(context.args[:-1]).strip()
+        valor = entrada_rapida.converter_valor_brasileiro(context.args[-1].replace("R$", ""))
+        if valor < 0:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(
+            '❌ Use: /orcamento <categoria> <valor> (ex.: /orcamento Alimentação 800)\n'
+            '/orcamento <categoria> 0 remove o orçamento e /orcamento sozinho lista os atuais.'
+        )
+        return
+
+    try:
+        await asyncio.to_thread(orcamentos.definir, chat_id, categoria, livro_caixa.para_centavos(valor))
+    except Exception as e:
+        logger.error(f"Erro ao salvar orçamento: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao salvar orçamento: {str(e)}')
+        return
+    if valor == 0:
+        await update.message.reply_text(f'🗑️ Orçamento de {categoria} removido.')
+    else:
+        avisos = ", ".join(f"{percentual}%" for percentual in orcamentos.percentuais)
+        await update.message.reply_text(f'🎯 Orçamento de {categoria}: R$ {valor:.2f} por mês. Aviso ao atingir {avisos}.')
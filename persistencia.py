@@ -0,0 +1,162 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from telegram.ext import BasePersistence, PersistenceInput
+import config
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS conversas (
+    nome TEXT NOT NULL,
+    chave TEXT NOT NULL,  -- Chave do ConversationHandler em JSON, ex.: [chat_id, user_id]
+    estado TEXT NOT NULL, -- Estado em JSON
+    PRIMARY KEY (nome, chave)
+);
+CREATE TABLE IF NOT EXISTS dados_usuario (
+    user_id INTEGER PRIMARY KEY,
+    dados TEXT NOT NULL
+);
+"""
+
+class PersistenciaSQLite(BasePersistence):
+    """Persistência do estado das conversas e do user_data em um SQLite local.
+
+    As alterações que o Application entrega a cada `update_interval` ficam em
+    memória e são gravadas juntas, em uma única transação; no desligamento,
+    `flush` grava o que restar. O user_data de cada usuário só é lido do disco
+    no primeiro acesso (refresh_user_data), então a inicialização não carrega
+    o estado de todo mundo; quem já foi lido fica marcado em um LRU de até
+    PERSISTENCIA_USUARIOS_CARREGADOS usuários (relê-lo depois só custa uma
+    consulta, e o que estiver em memória prevalece); os estados das conversas ativas (um inteiro por
+    chat) são lidos de uma vez, pois o ConversationHandler precisa deles antes
+    do primeiro update.
+    """
+
+    def __init__(self, arquivo=config.PERSISTENCIA_ARQUIVO, update_interval=config.PERSISTENCIA_INTERVALO):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+        self._conexao = None
+        self._conversas_pendentes = {}  # (nome, chave) -> estado (None = apagar)
+        self._usuarios_pendentes = {}  # user_id -> dados (None = apagar)
+        self._usuarios_carregados = OrderedDict()  # user_id -> None, do menos para o mais recente
+        self._gravacao = None
+
+    def _conectar(self):
+        with self._lock:
+            if self._conexao is None:
+                conexao = sqlite3.connect(self.arquivo, check_same_thread=False, isolation_level=None)
+                conexao.execute("PRAGMA journal_mode=WAL")
+                conexao.execute("PRAGMA synchronous=NORMAL")
+                conexao.executescript(ESQUEMA)
+                self._conexao = conexao
+            return self._conexao
+
+    def _gravar(self, conversas, usuarios):
+        """Grava as alterações acumuladas em uma única transação."""
+        conexao = self._conectar()
+        with self._lock:
+            conexao.execute("BEGIN")
+            try:
+                for (nome, chave), estado in conversas.items():
+                    if estado is None:
+                        conexao.execute("DELETE FROM conversas WHERE nome = ? AND chave = ?", (nome, chave))
+                    else:
+                        conexao.execute(
+                            "INSERT OR REPLACE INTO conversas (nome, chave, estado) VALUES (?, ?, ?)",
+                            (nome, chave, json.dumps(estado))
+                        )
+                for user_id, dados in usuarios.items():
+                    if dados is None:
+                        conexao.execute("DELETE FROM dados_usuario WHERE user_id = ?", (user_id,))
+                    else:
+                        conexao.execute(
+                            "INSERT OR REPLACE INTO dados_usuario (user_id, dados) VALUES (?, ?)",
+                            (user_id, json.dumps(dados, ensure_ascii=False))
+                        )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+
+    async def _gravar_pendentes(self):
+        # O que chegar enquanto uma rodada é gravada vai na rodada seguinte desta mesma tarefa
+        while self._conversas_pendentes or self._usuarios_pendentes:
+            conversas, self._conversas_pendentes = self._conversas_pendentes, {}
+            usuarios, self._usuarios_pendentes = self._usuarios_pendentes, {}
+            await asyncio.to_thread(self._gravar, conversas, usuarios)
+
+    def _agendar_gravacao(self):
+        """Agenda uma gravação para depois que o Application entregar todas as alterações da rodada."""
+        if self._gravacao is None or self._gravacao.done():
+            self._gravacao = asyncio.get_running_loop().create_task(self._gravar_pendentes())
+
+    async def get_conversations(self, name):
+        linhas = self._conectar().execute("SELECT chave, estado FROM conversas WHERE nome = ?", (name,)).fetchall()
+        return {tuple(json.loads(chave)): json.loads(estado) for chave, estado in linhas}
+
+    async def update_conversation(self, name, key, new_state):
+        self._conversas_pendentes[(name, json.dumps(list(key)))] = new_state
+        self._agendar_gravacao()
+
+    async def get_user_data(self):
+        # Carregado sob demanda em refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._usuarios_carregados:
+            self._usuarios_carregados.move_to_end(user_id)
+            return
+        self._usuarios_carregados[user_id] = None
+        while len(self._usuarios_carregados) > config.PERSISTENCIA_USUARIOS_CARREGADOS:
+            self._usuarios_carregados.popitem(last=False)
+        linha = self._conectar().execute("SELECT dados FROM dados_usuario WHERE user_id = ?", (user_id,)).fetchone()
+        if linha:
+            for chave, valor in json.loads(linha[0]).items():
+                user_data.setdefault(chave, valor)
+
+    async def update_user_data(self, user_id, data):
+        self._usuarios_pendentes[user_id] = dict(data)
+        self._agendar_gravacao()
+
+    async def drop_user_data(self, user_id):
+        self._usuarios_carregados.pop(user_id, None)
+        self._usuarios_pendentes[user_id] = None
+        self._agendar_gravacao()
+
+    async def flush(self):
+        if self._gravacao is not None:
+            await self._gravacao
+        await self._gravar_pendentes()
+
+    # Dados que este bot não usa: nada a persistir
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import re
+from telegram import Update
+from telegram.ext import ContextTypes
+import google_sheets
+import livro_caixa
+import metricas
+
+logger = logging.getLogger(__name__)
+
+# Aceita o ID puro ou o link da planilha (https://docs.google.com/spreadsheets/d/<ID>/edit)
+PADRAO_ID = re.compile(r"(?:/spreadsheets/d/)?([A-Za-z0-9_-]{20,})")
+
+# chat_id -> ID da planilha (None = planilha padrão); o banco é lido uma vez por chat
+_planilhas_dos_chats = {}
+
+def extrair_id(texto):
+    """Extrai o ID da planilha de um ID ou link; None se não reconhecer."""
+    encontrado = PADRAO_ID.search(texto or "")
+    return encontrado.group(1) if encontrado else None
+
+def planilha_do_chat(chat_id):
+    """Retorna o ID da planilha do chat, ou None para usar a planilha padrão."""
+    if chat_id not in _planilhas_dos_chats:
+        _planilhas_dos_chats[chat_id] = livro_caixa.obter_planilha_do_chat(chat_id)
+    return _planilhas_dos_chats[chat_id]
+
+def vincular(chat_id, planilha):
+    livro_caixa.definir_planilha_do_chat(chat_id, planilha)
+    _planilhas_dos_chats[chat_id] = planilha
+
+@metricas.medir_handler
+async def comando_planilha(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Mostra ou troca a planilha do chat: /planilha [ID ou link]."""
+    chat_id = update.effective_chat.id
+    if not context.args:
+        atual = planilha_do_chat(chat_id)
+        email = await asyncio.to_thread(google_sheets.email_da_conta_de_servico)
+        await update.message.reply_text(
+            f'📊 Planilha deste chat: {atual or "padrão do bot"}\n\n'
+            'Para usar a sua, compartilhe-a como editor com '
+            f'{email or "a conta de serviço do bot"} e envie /planilha <ID ou link>.\n'
+            'Ela precisa ter as abas Receitas, Despesas e Resumo Mensal.'
+        )
+        return
+
+    planilha = extrair_id(context.args[0])
+    if planilha is None:
+        await update.message.reply_text('❌ ID de planilha inválido. Envie o ID ou o link da planilha.')
+        return
+
+    await update.message.reply_text('⏳ Verificando acesso à planilha...')
+    try:
+        faltando = await asyncio.to_thread(google_sheets.verificar_planilha, planilha)
+        if faltando:
+            await update.message.reply_text(
+                f'❌ Não consegui abrir as abas: {", ".join(faltando)}.\n'
+                'Confira se a planilha foi compartilhada com o bot e se as abas existem.'
+            )
+            return
+        # Traz para o livro-caixa o que já estiver na planilha antes do primeiro registro
+        await asyncio.to_thread(google_sheets.garantir_livro_caixa_importado, planilha, vinculando=True)
+    except Exception as e:
+        logger.error(f"Erro ao vincular a planilha {planilha}: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao acessar a planilha: {str(e)}')
+        return
+
+    vincular(chat_id, planilha)
+    await update.message.reply_text('✅ Planilha vinculada! Os próximos registros deste chat vão para ela.')
@@ -0,0 +1,41 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class ProcessadorPorChat(BaseUpdateProcessor):
+    """Processa chats diferentes em paralelo e as atualizações de um mesmo chat em ordem.
+
+    O ConversationHandler guarda o estado por chat, então duas mensagens do
+    mesmo usuário não podem correr juntas; já chats diferentes não dependem
+    um do outro e podem usar todo o limite de concorrência.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # chat_id -> [Lock, atualizações usando o lock]
+
+    async def process_update(self, update, coroutine):
+        chat_id = update.effective_chat.id if isinstance(update, Update) and update.effective_chat else None
+        if chat_id is None:
+            await super().process_update(update, coroutine)
+            return
+
+        # O lock do chat vem antes do semáforo para que um chat com fila não ocupe vagas à toa
+        entrada = self._locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entrada[1] += 1
+        try:
+            async with entrada[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del self._locks[chat_id]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ContextTypes
+import agregacao
+import config
+import livro_caixa
+import metricas
+import planilhas
+
+logger = logging.getLogger(__name__)
+
+class CacheRelatorios:
+    """Tabela de transações (agregacao.TabelaTransacoes) por planilha, mantida em memória para os relatórios.
+
+    A primeira leitura carrega as colunas do livro-caixa inteiro; as
+    seguintes só acrescentam as transações com id acima do último já visto
+    (duas consultas pelo índice quando nada mudou). Assim qualquer gravação,
+    seja pelo formulário, pela entrada rápida, por importação ou por outro
+    processo, entra no relatório seguinte sem recarregar tudo e sem ler a
+    planilha. Os totais saem dos agrupamentos vetorizados da tabela.
+    """
+
+    def __init__(self):
+        self._tabelas = {}  # planilha -> (ultimo_id, TabelaTransacoes)
+        self._lock = threading.Lock()
+
+    def obter(self, planilha=None):
+        """Retorna a tabela da planilha já com as transações mais recentes.
+
+        A tabela nunca muda depois de entregue (as novas transações geram
+        outra), então quem monta o relatório fora do lock lê um retrato estável.
+        """
+        planilha = planilha or config.SHEET_NAME
+        with self._lock:
+            ultimo_id, tabela = self._tabelas.get(planilha, (0, agregacao.TabelaTransacoes.vazia()))
+            ultimo_id, linhas = livro_caixa.colunas_novas(planilha, ultimo_id)
+            if linhas:
+                tabela = tabela.concatenar(agregacao.TabelaTransacoes.de_linhas(linhas))
+            self._tabelas[planilha] = (ultimo_id, tabela)
+            return tabela
+
+    def invalidar(self, planilha=None):
+        """Descarta a tabela (a próxima leitura carrega tudo de novo)."""
+        with self._lock:
+            self._tabelas.pop(planilha or config.SHEET_NAME, None)
+
+# Cache compartilhado pelos handlers do bot
+cache = CacheRelatorios()
+
+def _reais(centavos):
+    return f"R$ {centavos / 100:.2f}"
+
+def rotulo_do_mes(mes):
+    """AAAA-MM -> MM/AAAA, como na planilha."""
+    return f"{mes[5:7]}/{mes[:4]}"
+
+def mes_anterior(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    ano, numero = (ano - 1, 12) if numero == 1 else (ano, numero - 1)
+    return f"{ano:04d}-{numero:02d}"
+
+def texto_resumo(tabela, quantidade_meses, hoje=None):
+    """Saldo do mês atual e receitas/despesas/saldo dos últimos meses."""
+    mes = (hoje or datetime.now()).strftime("%Y-%m")
+    totais_por_mes = tabela.totais_por_mes()
+    atual = totais_por_mes.get(mes, {"receita": 0, "despesa": 0})
+    linhas = [
+        f'📊 Resumo de {rotulo_do_mes(mes)}\n',
+        f'💰 Receitas: {_reais(atual["receita"])}',
+        f'💸 Despesas: {_reais(atual["despesa"])}',
+        f'🧮 Saldo: {_reais(atual["receita"] - atual["despesa"])}',
+    ]
+    if quantidade_meses > 1:
+        linhas.append(f'\n📅 Últimos {quantidade_meses} meses (receitas / despesas / saldo):')
+        for _ in range(quantidade_meses):
+            totais = totais_por_mes.get(mes, {"receita": 0, "despesa": 0})
+            linhas.append(
+                f'{rotulo_do_mes(mes)}: {_reais(totais["receita"])} / {_reais(totais["despesa"])} / '
+                f'{_reais(totais["receita"] - totais["despesa"])}'
+            )
+            mes = mes_anterior(mes)
+    return "\n".join(linhas)
+
+def texto_categorias(tabela, mes):
+    """Despesas (e receitas) do mês por categoria, da maior para a menor."""
+    do_mes = tabela.do_mes(mes)
+    if len(do_mes) == 0:
+        return f'📭 Nenhuma transação em {rotulo_do_mes(mes)}.'
+    linhas = [f'📂 Categorias de {rotulo_do_mes(mes)}']
+    for tipo, titulo in (("despesa", "💸 Despesas"), ("receita", "💰 Receitas")):
+        por_categoria = do_mes.por_categoria(tipo)
+        if not por_categoria:
+            continue
+        total = sum(por_categoria.values())
+        linhas.append(f'\n{titulo}: {_reais(total)}')
+        for categoria, centavos in sorted(por_categoria.items(), key=lambda item: -item[1]):
+            linhas.append(f'{categoria}: {_reais(centavos)} ({centavos * 100 / total:.0f}%)')
+    return "\n".join(linhas)
+
+def _interpretar_mes(texto):
+    """MM/AAAA -> AAAA-MM; levanta ValueError se inválido."""
+    mes = datetime.strptime(texto.strip(), "%m/%Y")
+    return mes.strftime("%Y-%m")
+
+@metricas.medir_handler
+async def comando_resumo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Saldo do mês e os últimos meses: /resumo [meses]."""
+    try:
+        quantidade = int(context.args[0]) if context.args else config.RELATORIO_MESES
+        if not 1 <= quantidade <= config.RELATORIO_MAXIMO_MESES:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(f'❌ Use: /resumo ou /resumo <meses> (de 1 a {config.RELATORIO_MAXIMO_MESES})')
+        return
+    try:
+        tabela = await asyncio.to_thread(cache.obter, planilhas.planilha_do_chat(update.effective_chat.id))
+    except Exception as e:
+        logger.error(f"Erro ao montar o resumo: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao montar o resumo: {str(e)}')
+        return
+    await update.message.reply_text(texto_resumo(tabela, quantidade))
+
+@metricas.medir_handler
+async def comando_categorias(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Totais por categoria do mês: /categorias [MM/AAAA]."""
+    try:
+        mes = _interpretar_mes(context.args[0]) if context.args else datetime.now().strftime("%Y-%m")
+    except ValueError:
+        await update.message.reply_text('❌ Use: /categorias ou /categorias MM/AAAA (ex.: /categorias 10/2026)')
+        return
+    try:
+        tabela = await asyncio.to_thread(cache.obter, planilhas.planilha_do_chat(update.effective_chat.id))
+    except Exception as e:
+        logger.error(f"Erro ao montar o relatório por categoria: {str(e)}", exc_info=True)
+        await update.message.reply_text(f'❌ Erro ao montar o relatório: {str(e)}')
+        return
+    await update.message.reply_text(texto_categorias(tabela, mes))
@@ -1,6 +1,15 @@
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from google_sheets import registrar_gasto_telegram
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
+import fila_registros
+from persistencia import PersistenciaSQLite
+from entrada_rapida import EntradaRapida
+import importacao
+import exportacao
+import planilhas
+import relatorios
+import graficos
+import orcamentos
+import busca
 import os
 from dotenv import load_dotenv
 import logging
@@ -46,6 +55,9 @@ CATEGORIAS_RECEITAS = [
     ['🎁 Outros Ganhos']
 ]
 
+# Registro em uma mensagem só: "-50,90 almoço alimentação" ou "+3000 salário"
+entrada_rapida = EntradaRapida(CATEGORIAS_DESPESAS, CATEGORIAS_RECEITAS)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Inicia o bot e mostra os botões principais."""
     if update.message is None:
@@ -54,6 +66,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = ReplyKeyboardMarkup(BOTOES_INICIAIS, resize_keyboard=True)
     await update.message.reply_text(
         'Olá! 👋 Vou ajudar você a registrar suas finanças.\n\n'
+        'Dica: registre direto em uma mensagem, ex.: -50,90 almoço alimentação ou +3000 salário\n\n'
         'Escolha uma opção:',
         reply_markup=reply_markup
     )
@@ -81,6 +94,10 @@ async def escolher_tipo(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
+    elif entrada_rapida.padrao.match(escolha or ""):
+        # Entrada rápida no menu: registra e continua esperando a escolha
+        await entrada_rapida.registrar(update, context)
+        return ESCOLHA_TIPO
     else:
         reply_markup = ReplyKeyboardMarkup(BOTOES_INICIAIS, resize_keyboard=True)
         await update.message.reply_text(
@@ -153,21 +170,29 @@ async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['categoria'] = categoria_texto
     
-    # Registrar no Google Sheets
+    # Enfileirar o registro no Google Sheets sem bloquear o bot
     try:
-        registrar_gasto_telegram(
+        futuro = fila_registros.enfileirar(
             context.user_data['valor'],
             context.user_data['descricao'],
             context.user_data['categoria'],
-            context.user_data.get('tipo', 'despesa')  # Passa o tipo (receita ou despesa)
+            context.user_data.get('tipo', 'despesa'),  # Passa o tipo (receita ou despesa)
+            planilhas.planilha_do_chat(update.effective_chat.id),
+            update.effective_chat.id
         )
         
         tipo = '💰 Receita' if context.user_data.get('tipo') == 'receita' else '💸 Despesa'
         
-        # Mostrar mensagem de sucesso e menu final
+        # Avisar o resultado da gravação quando o lote for salvo
+        context.application.create_task(
+            fila_registros.confirmar_registro(futuro, context.bot, update.effective_chat.id, tipo),
+            update=update
+        )
+        
+        # Mostrar mensagem de confirmação e menu final
         reply_markup = ReplyKeyboardMarkup(BOTOES_FINAIS, resize_keyboard=True)
         await update.message.reply_text(
-            f'✅ {tipo} registrada com sucesso!\n\n'
+            f'⏳ {tipo} recebida! Salvando na planilha...\n\n'
             f'💰 Valor: R$ {context.user_data["valor"]:.2f}\n'
             f'📝 Descrição: {context.user_data["descricao"]}\n'
             f'📂 Categoria: {context.user_data["categoria"]}\n\n'
@@ -202,6 +227,10 @@ async def menu_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=ReplyKeyboardRemove()
         )
         return ConversationHandler.END
+    elif entrada_rapida.padrao.match(escolha or ""):
+        # Entrada rápida no menu final: registra e continua no menu
+        await entrada_rapida.registrar(update, context)
+        return MENU_FINAL
     else:
         reply_markup = ReplyKeyboardMarkup(BOTOES_FINAIS, resize_keyboard=True)
         await update.message.reply_text(
@@ -223,7 +252,14 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 def main():
     """Função principal para iniciar o bot."""
     # Criar o aplicativo
-    application = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN')).build()
+    application = (
+        Application.builder()
+        .token(os.getenv('TELEGRAM_BOT_TOKEN'))
+        .persistence(PersistenciaSQLite())  # Conversas em andamento sobrevivem a reinícios
+        .post_init(fila_registros.iniciar)  # Replica o que ficou pendente da última execução
+        .post_shutdown(fila_registros.encerrar)  # Grava o que restar na fila ao desligar
+        .build()
+    )
 
     # Adicionar handler de conversa
     conv_handler = ConversationHandler(
@@ -235,17 +271,34 @@ def main():
             CATEGORIA: [MessageHandler(filters.TEXT & ~filters.COMMAND, categoria)],
             MENU_FINAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, menu_final)],
         },
-        fallbacks=[CommandHandler('cancel', cancel)]
+        fallbacks=[CommandHandler('cancel', cancel)],
+        name='transacao',
+        persistent=True
     )
 
     # Adicionar handlers
     application.add_handler(conv_handler)
+    # Depois da conversa: nos passos de digitação a mensagem é a resposta do passo (ex.: a descrição "-10 desconto");
+    # nos menus (escolha do tipo e menu final) é a própria conversa que repassa a entrada rápida
+    application.add_handler(MessageHandler(filters.Regex(entrada_rapida.padrao) & ~filters.COMMAND, entrada_rapida.registrar))
+    application.add_handler(CommandHandler('importar', importacao.comando_importar))
+    application.add_handler(CommandHandler('exportar', exportacao.comando_exportar))
+    application.add_handler(CommandHandler('planilha', planilhas.comando_planilha))
+    application.add_handler(CommandHandler('resumo', relatorios.comando_resumo))
+    application.add_handler(CommandHandler('categorias', relatorios.comando_categorias))
+    application.add_handler(CommandHandler('grafico', graficos.comando_grafico))
+    application.add_handler(CommandHandler('orcamento', orcamentos.comando_orcamento))
+    application.add_handler(CommandHandler('buscar', busca.comando_buscar))
+    application.add_handler(CallbackQueryHandler(busca.paginar_busca, pattern=r'^buscar:\d+:\d+$'))
+    extratos = filters.Document.FileExtension('csv') | filters.Document.FileExtension('ofx') | filters.Document.FileExtension('qfx')
+    application.add_handler(MessageHandler(extratos, importacao.receber_extrato))
 
     # Iniciar o bot
     print('🤖 Bot iniciado!')
     
     # Usar polling em vez de webhook
     application.run_polling(allowed_updates=Update.ALL_TYPES)
+    graficos.encerrar()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
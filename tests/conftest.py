@@ -0,0 +1,17 @@
+import threading
+import pytest
+import config
+import livro_caixa
+
+@pytest.fixture
+def livro(tmp_path, monkeypatch):
+    """Livro-caixa vazio em um arquivo temporário, com conexões novas."""
+    monkeypatch.setattr(config, "LIVRO_CAIXA_ARQUIVO", str(tmp_path / "livro_caixa.db"))
+    monkeypatch.setattr(livro_caixa, "_conexao", None)
+    monkeypatch.setattr(livro_caixa, "_leitores", threading.local())
+    yield livro_caixa
+    if livro_caixa._conexao is not None:
+        livro_caixa._conexao.close()
+    conexao = getattr(livro_caixa._leitores, "conexao", None)
+    if conexao is not None:
+        conexao.close()
@@ -0,0 +1,69 @@
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+from agregacao import TabelaTransacoes
+
+CATEGORIAS = ["Alimentação", "Transporte", "Lazer", "Salário"]
+
+def _linhas(quantidade, semente):
+    gerador = random.Random(semente)
+    inicio = date(2024, 1, 1)
+    return [
+        (
+            (inicio + timedelta(days=gerador.randrange(900))).isoformat(),
+            gerador.choice([-1, 1]) * gerador.randrange(1, 500_000),
+            gerador.choice(CATEGORIAS),
+        )
+        for _ in range(quantidade)
+    ]
+
+def _por_mes_ingenuo(linhas):
+    totais = defaultdict(lambda: {"receitas": 0, "despesas": 0})
+    for data, centavos, _ in linhas:
+        rotulo = f"{data[5:7]}/{data[:4]}"
+        totais[rotulo]["receitas" if centavos > 0 else "despesas"] += abs(centavos)
+    return {
+        rotulo: {"receitas": round(valores["receitas"] / 100, 2), "despesas": round(valores["despesas"] / 100, 2)}
+        for rotulo, valores in totais.items()
+    }
+
+def test_por_mes_bate_com_a_soma_ingenua():
+    linhas = _linhas(5000, semente=1)
+    assert TabelaTransacoes.de_linhas(linhas).por_mes() == _por_mes_ingenuo(linhas)
+
+def test_por_mes_categoria_bate_com_a_soma_ingenua():
+    linhas = _linhas(2000, semente=2)
+    esperado = defaultdict(lambda: defaultdict(int))
+    for data, centavos, categoria in linhas:
+        if centavos < 0:
+            esperado[data[:7]][categoria] -= centavos
+    assert TabelaTransacoes.de_linhas(linhas).por_mes_categoria("despesa") == {
+        mes: dict(categorias) for mes, categorias in esperado.items()
+    }
+
+def test_concatenar_recodifica_as_categorias():
+    linhas = _linhas(1000, semente=3)
+    # Uma categoria só aparece na segunda parte
+    linhas.append(("2025-03-10", -1234, "Presentes"))
+    juntas = TabelaTransacoes.de_linhas(linhas[:400]).concatenar(TabelaTransacoes.de_linhas(linhas[400:]))
+    inteira = TabelaTransacoes.de_linhas(linhas)
+    assert juntas.nomes_categorias == inteira.nomes_categorias
+    assert np.array_equal(juntas.categorias, inteira.categorias)
+    assert juntas.por_categoria("despesa") == inteira.por_categoria("despesa")
+
+def test_filtrar_e_do_mes():
+    tabela = TabelaTransacoes.de_linhas([
+        ("2026-09-30", -100, "Lazer"),
+        ("2026-10-01", -200, "Lazer"),
+        ("2026-10-31", 300, "Salário"),
+        ("2026-11-01", -400, "Lazer"),
+    ])
+    assert len(tabela.filtrar(date(2026, 10, 1), date(2026, 10, 31))) == 2
+    assert tabela.do_mes("2026-10").totais_por_mes() == {"2026-10": {"receita": 300, "despesa": 200}}
+
+def test_tabela_vazia():
+    vazia = TabelaTransacoes.de_linhas([])
+    assert len(vazia) == 0
+    assert vazia.por_mes() == {}
+    assert vazia.por_categoria() == {}
@@ -0,0 +1,19 @@
+import pytest
+from busca import montar_consulta
+
+def test_palavras_curtas_ficam_de_fora():
+    assert montar_consulta("pão de queijo") == 'descricao : "pao" AND descricao : "queijo"'
+
+def test_acentos_e_maiusculas_sao_normalizados():
+    assert montar_consulta("FARMÁCIA") == 'descricao : "farmacia"'
+
+def test_categoria_entra_como_mais_uma_condicao():
+    assert montar_consulta("uber", "Transporte") == 'descricao : "uber" AND categoria : "transporte"'
+
+def test_aspas_sao_escapadas():
+    assert montar_consulta('bar "do zé"') == 'descricao : "bar" AND descricao : """do" AND descricao : "ze"""'
+
+@pytest.mark.parametrize("termo, categoria", [("de", None), ("", None), ("uber", "tv")])
+def test_termo_ou_categoria_curtos_demais(termo, categoria):
+    with pytest.raises(ValueError):
+        montar_consulta(termo, categoria)
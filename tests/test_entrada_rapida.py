@@ -0,0 +1,64 @@
+import pytest
+from entrada_rapida import EntradaRapida, converter_valor_brasileiro
+
+# Mesmos teclados do bot
+CATEGORIAS_DESPESAS = [
+    ['🍽️ Alimentação', '🚗 Transporte'],
+    ['💊 Saúde', '🏠 Moradia'],
+    ['🎓 Educação', '🎭 Lazer'],
+    ['👕 Vestuário', '💡 Utilidades'],
+    ['💰 Outros']
+]
+CATEGORIAS_RECEITAS = [
+    ['💼 Salário'],
+    ['💵 Renda Extra'],
+    ['🎁 Outros Ganhos']
+]
+
+@pytest.fixture
+def entrada():
+    return EntradaRapida(CATEGORIAS_DESPESAS, CATEGORIAS_RECEITAS)
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("1.234,56", 1234.56),
+    ("1234,56", 1234.56),
+    ("1234.56", 1234.56),
+    ("1.234", 1234.0),
+    ("50", 50.0),
+])
+def test_converter_valor_brasileiro(texto, esperado):
+    assert converter_valor_brasileiro(texto) == esperado
+
+def test_despesa_com_descricao_e_categoria(entrada):
+    assert entrada.interpretar("-50,90 almoço alimentação") == {
+        "valor": 50.9, "descricao": "almoço", "categoria": "Alimentação", "tipo": "despesa"
+    }
+
+def test_receita_so_com_a_categoria(entrada):
+    assert entrada.interpretar("+3000 salário") == {
+        "valor": 3000.0, "descricao": "salário", "categoria": "Salário", "tipo": "receita"
+    }
+
+def test_valor_com_milhar_e_real(entrada):
+    resultado = entrada.interpretar("- R$ 1.234,56 aluguel moradia")
+    assert (resultado["valor"], resultado["descricao"], resultado["categoria"]) == (1234.56, "aluguel", "Moradia")
+
+def test_categoria_de_varias_palavras_sem_acento(entrada):
+    resultado = entrada.interpretar("+200 freela renda extra")
+    assert (resultado["descricao"], resultado["categoria"]) == ("freela", "Renda Extra")
+
+def test_prefixo_unico_da_categoria(entrada):
+    assert entrada.interpretar("-12 lanche alim")["categoria"] == "Alimentação"
+
+def test_sem_categoria_usa_a_ultima_do_teclado(entrada):
+    despesa = entrada.interpretar("-10 presente da Ana")
+    assert (despesa["descricao"], despesa["categoria"]) == ("presente da Ana", "Outros")
+    assert entrada.interpretar("+10 reembolso")["categoria"] == "Outros Ganhos"
+
+@pytest.mark.parametrize("texto", ["almoço 50", "50 almoço", "-50", "-abc almoço", "", None])
+def test_mensagem_fora_do_formato(entrada, texto):
+    assert entrada.interpretar(texto) is None
+
+def test_valor_zerado_levanta_erro(entrada):
+    with pytest.raises(ValueError):
+        entrada.interpretar("-0,00 almoço")
@@ -0,0 +1,72 @@
+import pytest
+import config
+import google_sheets
+import importacao
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261001120000[-3:BRT]<TRNAMT>-25.00<FITID>A1<MEMO>Padaria</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261001120000[-3:BRT]<TRNAMT>-25.00<FITID>A2<MEMO>Padaria</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20261005<TRNAMT>3000.00<FITID>A3<NAME>Salario</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+CSV = """Data;Descrição;Valor;Categoria
+01/10/2026;Padaria;-25,00;Alimentação
+01/10/2026;Padaria;-25,00;Alimentação
+05/10/2026;Salário;3.000,00;
+32/10/2026;Data errada;-1,00;
+06/10/2026;Valor errado;abc;
+"""
+
+@pytest.fixture
+def importado(livro):
+    # A planilha já foi copiada para o livro-caixa: a importação não lê o Google Sheets
+    livro.definir_metadado(google_sheets._chave_importacao(None), "sim")
+    return livro
+
+@pytest.fixture
+def extrato(tmp_path):
+    def escrever(nome, conteudo):
+        caminho = tmp_path / nome
+        caminho.write_text(conteudo, encoding="utf-8")
+        return str(caminho)
+    return escrever
+
+def test_qfx_usa_o_fitid_e_nao_duplica(importado, extrato):
+    caminho = extrato("extrato.qfx", OFX)
+    primeira = importacao.importar_arquivo(caminho, "extrato.qfx")
+    assert (primeira["lidas"], primeira["novas"], primeira["duplicadas"]) == (3, 3, 0)
+
+    segunda = importacao.importar_arquivo(caminho, "extrato.qfx")
+    assert (segunda["novas"], segunda["duplicadas"]) == (0, 3)
+    assert importado.contar_pendentes() == 3
+    assert sorted(importado.colunas_para_agregacao()) == [
+        ("2026-10-01", -2500, "Outros"),
+        ("2026-10-01", -2500, "Outros"),
+        ("2026-10-05", 300000, "Outros Ganhos"),
+    ]
+
+def test_csv_mantem_repetidas_e_conta_invalidas(importado, extrato):
+    caminho = extrato("extrato.csv", CSV)
+    primeira = importacao.importar_arquivo(caminho, "extrato.csv")
+    assert (primeira["lidas"], primeira["novas"], primeira["duplicadas"], primeira["invalidas"]) == (5, 3, 0, 2)
+    assert len(primeira["erros"]) == 2
+
+    segunda = importacao.importar_arquivo(caminho, "extrato.csv")
+    assert (segunda["novas"], segunda["duplicadas"]) == (0, 3)
+
+def test_janela_de_repetidas_pequena(importado, extrato, monkeypatch):
+    # Com a janela cheia a numeração recomeça, mas o mesmo arquivo continua sem duplicar
+    monkeypatch.setattr(config, "IMPORTACAO_JANELA_REPETIDAS", 1)
+    caminho = extrato("extrato.csv", CSV)
+    primeira = importacao.importar_arquivo(caminho, "extrato.csv")
+    segunda = importacao.importar_arquivo(caminho, "extrato.csv")
+    assert primeira["novas"] == 3
+    assert segunda["novas"] == 0
+
+def test_planilha_nao_importada_levanta_erro(livro, extrato, monkeypatch):
+    monkeypatch.setattr(google_sheets, "_importar_no_primeiro_uso", False)
+    monkeypatch.setattr(google_sheets, "_estados", {})
+    with pytest.raises(Exception, match="ainda não foi importada"):
+        importacao.importar_arquivo(extrato("extrato.csv", CSV), "extrato.csv")
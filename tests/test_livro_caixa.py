@@ -0,0 +1,74 @@
+from datetime import datetime
+import agregacao
+import config
+import relatorios
+
+def _despesa(valor, dia=1, categoria="Alimentação", chat_id=None):
+    return (valor, "Mercado", categoria, "despesa", datetime(2026, 10, dia), None, chat_id)
+
+def test_inserir_grava_centavos_com_sinal_pelo_tipo(livro):
+    ids = livro.inserir_transacoes([
+        livro.nova_transacao(50.9, "Mercado", "Alimentação", "despesa", datetime(2026, 10, 3)),
+        livro.nova_transacao(3000, "Salário", "Salário", "receita", datetime(2026, 10, 5)),
+    ])
+    assert ids == [1, 2]
+    assert sorted(livro.colunas_para_agregacao()) == [
+        ("2026-10-03", -5090, "Alimentação"),
+        ("2026-10-05", 300000, "Salário"),
+    ]
+
+def test_marca_dagua_separa_pendentes_do_ja_replicado(livro):
+    ids = livro.inserir_transacoes([livro.nova_transacao(*_despesa(valor)) for valor in (10, 20, 30)])
+    assert livro.marca_dagua(config.DESPESAS_SHEET_NAME) == 0
+    assert livro.contar_pendentes() == 3
+
+    livro.marcar_sincronizado(config.DESPESAS_SHEET_NAME, ids[1])
+    assert livro.marca_dagua(config.DESPESAS_SHEET_NAME) == ids[1]
+    assert [linha[0] for linha in livro.pendentes("despesa", 10)] == [ids[2]]
+    assert livro.planilhas_com_pendentes() == [config.SHEET_NAME]
+
+    livro.marcar_sincronizado(config.DESPESAS_SHEET_NAME, ids[2])
+    assert livro.contar_pendentes() == 0
+    assert livro.planilhas_com_pendentes() == []
+
+def test_inserir_sincronizadas_avanca_a_marca_dagua(livro):
+    ids = livro.inserir_transacoes([livro.nova_transacao(*_despesa(10))], sincronizadas=True)
+    assert livro.marca_dagua(config.DESPESAS_SHEET_NAME) == ids[-1]
+    assert livro.contar_pendentes() == 0
+
+def test_colunas_novas_traz_so_o_que_entrou_depois(livro):
+    livro.inserir_transacoes([livro.nova_transacao(*_despesa(valor)) for valor in (10, 20)])
+    ultimo_id, linhas = livro.colunas_novas()
+    assert (ultimo_id, len(linhas)) == (2, 2)
+
+    assert livro.colunas_novas(apos_id=ultimo_id) == (ultimo_id, [])
+
+    livro.inserir_transacoes([livro.nova_transacao(*_despesa(5, categoria="Lazer"))])
+    assert livro.colunas_novas(apos_id=ultimo_id) == (3, [("2026-10-01", -500, "Lazer")])
+
+def test_cache_de_relatorios_alcanca_o_livro_caixa(livro):
+    cache = relatorios.CacheRelatorios()
+    livro.inserir_transacoes([livro.nova_transacao(*_despesa(10))])
+    primeira = cache.obter()
+    livro.inserir_transacoes([
+        livro.nova_transacao(*_despesa(5, dia=2, categoria="Lazer")),
+        livro.nova_transacao(100, "Salário", "Salário", "receita", datetime(2026, 11, 5)),
+    ])
+    atual = cache.obter()
+
+    # A tabela já entregue não muda; a nova bate com uma carga completa
+    assert len(primeira) == 1
+    completa = agregacao.TabelaTransacoes.do_livro_caixa()
+    assert atual.totais_por_mes() == completa.totais_por_mes()
+    assert atual.por_mes_categoria("despesa") == completa.por_mes_categoria("despesa")
+    assert atual.do_mes("2026-10").por_categoria("despesa") == {"Alimentação": 1000, "Lazer": 500}
+
+def test_despesas_do_chat_ignoram_outros_chats(livro):
+    livro.inserir_transacoes([
+        livro.nova_transacao(*_despesa(10, chat_id=1)),
+        livro.nova_transacao(*_despesa(20, chat_id=2)),
+        livro.nova_transacao(30, "Mercado", "Alimentação", "despesa", datetime(2026, 9, 30), None, 1),
+    ])
+    ultimo_id, linhas = livro.despesas_do_chat(1, "2026-10")
+    assert ultimo_id == 3
+    assert linhas == [("2026-10-01", -1000, "Alimentação")]
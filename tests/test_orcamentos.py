@@ -0,0 +1,44 @@
+from datetime import datetime
+from orcamentos import Orcamentos
+
+def _registrar(livro, orcamentos, chat_id, valor, categoria="Alimentação"):
+    transacao = livro.nova_transacao(valor, "Mercado", categoria, "despesa", datetime(2026, 10, 10), None, chat_id)
+    transacao_id, = livro.inserir_transacoes([transacao])
+    return orcamentos.registrar(chat_id, transacao_id, transacao)
+
+def test_avisa_cada_percentual_uma_vez(livro):
+    orcamentos = Orcamentos(percentuais=[80, 100])
+    orcamentos.definir(1, "Alimentação", 100_00)
+
+    assert _registrar(livro, orcamentos, 1, 50) == []
+    assert _registrar(livro, orcamentos, 1, 30) == [("Alimentação", 80, 80_00, 100_00)]
+    assert _registrar(livro, orcamentos, 1, 10) == []
+    assert _registrar(livro, orcamentos, 1, 20) == [("Alimentação", 100, 110_00, 100_00)]
+    assert _registrar(livro, orcamentos, 1, 5) == []
+
+def test_uma_despesa_cruza_os_dois_percentuais(livro):
+    orcamentos = Orcamentos(percentuais=[80, 100])
+    orcamentos.definir(1, "Lazer", 100_00)
+    assert [alerta[1] for alerta in _registrar(livro, orcamentos, 1, 150, "Lazer")] == [80, 100]
+
+def test_gasto_anterior_vem_do_livro_caixa(livro):
+    # Despesas gravadas antes do primeiro orçamento do chat entram na soma
+    orcamentos = Orcamentos(percentuais=[80, 100])
+    livro.inserir_transacoes([
+        livro.nova_transacao(70, "Mercado", "Alimentação", "despesa", datetime(2026, 10, 1), None, 1)
+    ])
+    orcamentos.definir(1, "Alimentação", 100_00)
+    assert _registrar(livro, orcamentos, 1, 15) == [("Alimentação", 80, 85_00, 100_00)]
+
+def test_gastos_de_outro_chat_nao_contam(livro):
+    orcamentos = Orcamentos(percentuais=[80, 100])
+    orcamentos.definir(1, "Alimentação", 100_00)
+    orcamentos.definir(2, "Alimentação", 100_00)
+
+    assert _registrar(livro, orcamentos, 2, 90) == [("Alimentação", 80, 90_00, 100_00)]
+    assert _registrar(livro, orcamentos, 1, 10) == []
+    assert orcamentos.gasto(1, "2026-10", "alimentacao") == 10_00
+
+def test_sem_orcamento_nao_avisa(livro):
+    orcamentos = Orcamentos(percentuais=[80, 100])
+    assert _registrar(livro, orcamentos, 1, 500) == []
@@ -0,0 +1,6 @@
+import unicodedata
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, para comparar categorias digitadas de qualquer jeito."""
+    sem_acentos = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(caractere for caractere in sem_acentos if not unicodedata.combining(caractere))
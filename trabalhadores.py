@@ -0,0 +1,169 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import queue
+import signal
+import config
+import fila_registros
+import google_sheets
+import metricas
+from ingestao import Ingestao, JanelaDeduplicacao
+
+logger = logging.getLogger(__name__)
+
+# Atualizações cujo objeto principal traz um chat
+CAMPOS_COM_CHAT = (
+    'message', 'edited_message', 'channel_post', 'edited_channel_post',
+    'my_chat_member', 'chat_member', 'chat_join_request',
+)
+
+# Atualizações que só trazem o usuário (inline, pagamentos, enquetes)
+CAMPOS_COM_USUARIO = (
+    'inline_query', 'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'poll_answer',
+)
+
+def chave_de_roteamento(dados):
+    """Retorna o número que decide o processo da atualização: o id do chat, se houver.
+
+    Todas as atualizações de um chat vão para o mesmo processo, então a
+    ordem por chat e o estado da conversa continuam valendo como com um
+    processo só.
+    """
+    for campo in CAMPOS_COM_CHAT:
+        objeto = dados.get(campo)
+        if objeto and objeto.get('chat'):
+            return objeto['chat']['id']
+    consulta = dados.get('callback_query')
+    if consulta:
+        mensagem = consulta.get('message') or {}
+        if mensagem.get('chat'):
+            return mensagem['chat']['id']
+        return consulta['from']['id']
+    for campo in CAMPOS_COM_USUARIO:
+        objeto = dados.get(campo)
+        if objeto:
+            usuario = objeto.get('from') or objeto.get('user') or {}
+            if 'id' in usuario:
+                return usuario['id']
+    return dados.get('update_id', 0)
+
+class Roteador:
+    """Recebe as atualizações no processo do webhook e distribui entre processos de trabalho.
+
+    Cada processo tem o seu Application, sua fila de ingestão e seus workers;
+    o chat decide o processo (chat_id % processos). Só o processo do webhook
+    importa e replica as planilhas: os de trabalho gravam no livro-caixa e
+    acendem `pendente` para avisá-lo. Eles também mandam pela fila
+    `metricas`, a cada METRICAS_INTERVALO_PROCESSOS segundos, o retrato dos
+    seus contadores e histogramas, somados no /metrics deste processo.
+    """
+
+    def __init__(self, processos=config.WEBHOOK_PROCESSOS, tamanho_fila=config.WEBHOOK_TAMANHO_FILA,
+                 tamanho_janela=config.WEBHOOK_JANELA_DEDUPLICACAO):
+        contexto = multiprocessing.get_context('spawn')
+        self.processos = processos
+        self._filas = [contexto.Queue(maxsize=tamanho_fila) for _ in range(processos)]
+        self.pendente = contexto.Event()
+        self.metricas = contexto.Queue()
+        self._janela = JanelaDeduplicacao(tamanho_janela)
+        self._processos = [
+            contexto.Process(target=executar_trabalhador, args=(indice, self._filas[indice], self.pendente, self.metricas),
+                             name=f'trabalhador-{indice}')
+            for indice in range(processos)
+        ]
+
+    def receber(self, dados):
+        """Encaminha o JSON de uma atualização e retorna Ingestao.NOVA, DUPLICADA ou CHEIA."""
+        update_id = dados.get("update_id")
+        if update_id is not None and update_id in self._janela:
+            return Ingestao.DUPLICADA
+        try:
+            self._filas[chave_de_roteamento(dados) % self.processos].put_nowait(dados)
+        except queue.Full:
+            # Sem registrar o id: o Telegram reenvia e a atualização é aceita depois
+            return Ingestao.CHEIA
+        if update_id is not None:
+            self._janela.registrar(update_id)
+        return Ingestao.NOVA
+
+    def iniciar(self):
+        for processo in self._processos:
+            processo.start()
+        logger.info(f"{self.processos} processo(s) de trabalho iniciados")
+
+    async def encerrar(self):
+        """Pede para cada processo terminar o que já recebeu e aguarda a saída."""
+        for fila in self._filas:
+            fila.put(None)
+        for processo in self._processos:
+            await asyncio.to_thread(processo.join)
+
+    def tamanho_fila(self):
+        return sum(fila.qsize() for fila in self._filas)
+
+async def repassar_avisos(roteador):
+    """No processo do webhook, repassa à fila de registros os avisos dos processos de trabalho."""
+    while True:
+        if await asyncio.to_thread(roteador.pendente.wait, config.FILA_INTERVALO_RETENTATIVA):
+            roteador.pendente.clear()
+            fila_registros.avisar_pendente()
+
+async def receber_metricas(roteador):
+    """No processo do webhook, soma ao /metrics os retratos enviados pelos processos de trabalho."""
+    while True:
+        try:
+            indice, retrato = await asyncio.to_thread(roteador.metricas.get, True, config.METRICAS_INTERVALO_PROCESSOS)
+        except queue.Empty:
+            continue
+        metricas.registro.incorporar(f"trabalhador-{indice}", retrato)
+
+async def _enviar_metricas(indice, fila_metricas):
+    """Manda periodicamente ao processo do webhook o retrato das métricas deste processo."""
+    while True:
+        await asyncio.sleep(config.METRICAS_INTERVALO_PROCESSOS)
+        fila_metricas.put((indice, metricas.registro.retrato()))
+
+def _executar_inicializador():
+    """Chama o WEBHOOK_INICIALIZADOR ("modulo:funcao"), se configurado."""
+    if not config.WEBHOOK_INICIALIZADOR:
+        return
+    modulo, funcao = config.WEBHOOK_INICIALIZADOR.split(":", 1)
+    getattr(importlib.import_module(modulo), funcao)()
+
+def executar_trabalhador(indice, fila, pendente, fila_metricas):
+    """Ponto de entrada de um processo de trabalho."""
+    # O Ctrl+C chega a todo o grupo; quem coordena o encerramento é o processo do webhook
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _executar_inicializador()
+    asyncio.run(_trabalhador(indice, fila, pendente, fila_metricas))
+
+async def _trabalhador(indice, fila, pendente, fila_metricas):
+    # Importado aqui: no processo filho o módulo do bot é carregado do zero
+    import bot_server
+    import graficos
+
+    fila_registros.configurar_sem_replicacao(pendente.set)
+    google_sheets.configurar_sem_importacao()
+    bot_server.registrar_handlers()
+    await bot_server.application.initialize()
+    await fila_registros.iniciar()
+    await bot_server.application.start()
+    bot_server.ingestao.iniciar()
+    envio_metricas = asyncio.create_task(_enviar_metricas(indice, fila_metricas))
+    logger.info(f'🤖 Processo de trabalho {indice} iniciado')
+    try:
+        while True:
+            dados = await asyncio.to_thread(fila.get)
+            if dados is None:
+                break
+            await bot_server.ingestao.entregar(dados)
+    finally:
+        await bot_server.ingestao.encerrar()
+        await bot_server.application.stop()
+        await fila_registros.encerrar()
+        await bot_server.application.shutdown()
+        graficos.encerrar()
+        envio_metricas.cancel()
+        # Último retrato, com o que foi processado no encerramento
+        fila_metricas.put((indice, metricas.registro.retrato()))